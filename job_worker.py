@@ -0,0 +1,50 @@
+"""
+Worker des jobs de rapprochement soumis par l'interface (BACKGROUND_JOBS=True).
+
+    python job_worker.py              # tourne jusqu'à SIGINT / SIGTERM
+    python job_worker.py --once       # traite les jobs en attente puis s'arrête (cron)
+
+Plusieurs workers peuvent tourner en même temps sur la même base (storage/jobs.sqlite3).
+"""
+import sys
+import os
+import signal
+import logging
+import argparse
+
+# Récupérer le répertoire courant et l'ajouter au chemin Python, comme main.py
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.append(current_dir)
+
+from src.server.api.job_worker import JobWorker
+from src.server.config.settings import JOB_BATCH_SIZE, JOB_POLL_SECONDS
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Traite les jobs de rapprochement en arrière-plan.")
+    parser.add_argument('--batch-size', type=int, default=JOB_BATCH_SIZE,
+                        help="Factures réservées à chaque tour (plus petit = partage plus fin entre utilisateurs)")
+    parser.add_argument('--poll', type=float, default=JOB_POLL_SECONDS, help="Attente (s) quand la file est vide")
+    parser.add_argument('--once', action='store_true', help="S'arrêter quand la file est vide")
+    parser.add_argument('--log-level', default='INFO', help="Niveau de log (DEBUG, INFO, WARNING...)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.INFO),
+                        format='%(asctime)s - %(levelname)s - %(name)s - %(message)s', force=True)
+
+    worker = JobWorker(batch_size=args.batch_size, poll_seconds=args.poll)
+    if args.once:
+        while worker.run_once():
+            pass
+        return 0
+
+    # Finir le lot en cours avant de s'arrêter
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+    worker.run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+Rapprochement factures / relevé bancaire en ligne de commande, sans Streamlit.
+
+Exemple (cron, toutes les nuits à 2h) :
+    0 2 * * * cd /opt/inovert && python reconcile.py releve.csv factures/ -o resultats/$(date +\%F).csv --log-file logs/reconcile.log
+
+Chaque facture traitée est enregistrée (storage/jobs.sqlite3) : relancer la même commande après
+une interruption ne traite que les factures en échec ou restantes (--restart pour tout refaire).
+
+Codes de retour : 0 si toutes les factures ont été traitées, 2 si certaines ont échoué
+(extraction ou matching) ou sont encore réservées par une exécution interrompue, 1 en cas
+d'erreur bloquante (relevé introuvable, aucune facture...).
+"""
+import sys
+import os
+import json
+import time
+import hashlib
+import logging
+import itertools
+import argparse
+
+# Récupérer le répertoire courant et l'ajouter au chemin Python, comme main.py
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.append(current_dir)
+
+from src.server.api.main import APIService
+from src.server.api.reconciliation import ResultWriter
+from src.server.config.paths import CSV_DIR
+from src.server.config.settings import (
+    EXTRACTION_CONCURRENCY,
+    PIPELINE_QUEUE_SIZE,
+    PIPELINE_LOAD_WORKERS,
+    PIPELINE_MATCH_WORKERS
+)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tif', '.tiff')
+
+EXIT_OK = 0
+EXIT_FATAL = 1
+EXIT_PARTIAL = 2
+
+logger = logging.getLogger('reconcile')
+
+
+def find_invoices(invoice_dir, recursive=False):
+    """Invoice images of a directory, sorted by path."""
+    if recursive:
+        paths = [os.path.join(root, name) for root, _, names in os.walk(invoice_dir) for name in names]
+    else:
+        paths = [os.path.join(invoice_dir, name) for name in os.listdir(invoice_dir)]
+    return sorted(path for path in paths if path.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(path))
+
+
+def file_sha256(path):
+    """SHA-256 of a file, read by blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def statement_upload_path(statement):
+    """
+    Where to upload the statement: CSV_DIR/<name>, unless a statement with another content (e.g.
+    uploaded from the UI) already has that name, in which case <name>-<content hash> is used.
+    """
+    name = os.path.basename(statement)
+    path = os.path.join(CSV_DIR, name)
+    if not os.path.exists(path):
+        return path
+    content_hash = file_sha256(statement)
+    if file_sha256(path) == content_hash:
+        return path
+    stem, extension = os.path.splitext(name)
+    return os.path.join(CSV_DIR, f"{stem}-{content_hash[:12]}{extension}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rapproche un dossier de factures d'un relevé bancaire CSV.")
+    parser.add_argument('statement', help="Relevé bancaire CSV")
+    parser.add_argument('invoice_dir', help="Dossier contenant les images de factures")
+    parser.add_argument('-o', '--output', default='reconciliation.csv',
+                        help="Fichier de résultats, écrit au fil de l'eau (.csv ou .jsonl, défaut : reconciliation.csv)")
+    parser.add_argument('--format', choices=ResultWriter.FORMATS,
+                        help="Format de sortie (déduit de l'extension par défaut)")
+    parser.add_argument('--summary', help="Fichier JSON recevant les métriques globales")
+    parser.add_argument('-t', '--threshold', type=int, default=70, help="Score minimal de similarité des vendeurs")
+    parser.add_argument('-j', '--concurrency', type=int, default=EXTRACTION_CONCURRENCY,
+                        help="Nombre d'extractions simultanées")
+    parser.add_argument('--load-workers', type=int, default=PIPELINE_LOAD_WORKERS,
+                        help="Nombre de workers de lecture des images")
+    parser.add_argument('--match-workers', type=int, default=PIPELINE_MATCH_WORKERS,
+                        help="Nombre de workers de matching et d'évaluation")
+    parser.add_argument('--queue-size', type=int, default=PIPELINE_QUEUE_SIZE,
+                        help="Nombre maximal de factures en attente entre deux étapes")
+    parser.add_argument('--backend', help="Backend d'extraction (mistral, tesseract ; EXTRACTION_BACKEND par défaut)")
+    parser.add_argument('--no-cache', action='store_true', help="Ne pas lire ni écrire le cache d'extraction")
+    parser.add_argument('--restart', action='store_true',
+                        help="Recommencer de zéro au lieu de reprendre l'exécution interrompue du même lot")
+    parser.add_argument('--columnar', action='store_true',
+                        help="Écrire le fichier colonnaire du relevé (relectures plus rapides des gros relevés)")
+    parser.add_argument('-r', '--recursive', action='store_true', help="Chercher les factures dans les sous-dossiers")
+    parser.add_argument('--log-level', default='INFO', help="Niveau de log (DEBUG, INFO, WARNING...)")
+    parser.add_argument('--log-file', help="Écrire les logs dans ce fichier plutôt que sur la sortie d'erreur")
+    return parser.parse_args(argv)
+
+
+def configure_logging(level, log_file=None):
+    handler = logging.FileHandler(log_file, encoding='utf-8') if log_file else logging.StreamHandler(sys.stderr)
+    logging.basicConfig(level=getattr(logging, level.upper(), logging.INFO),
+                        format='%(asctime)s - %(levelname)s - %(name)s - %(message)s', handlers=[handler], force=True)
+
+
+def run(args):
+    """Upload, extraction, matching and evaluation of every invoice; returns the exit code."""
+    if not os.path.isfile(args.statement):
+        logger.error(f"Statement not found: {args.statement}")
+        return EXIT_FATAL
+    if not os.path.isdir(args.invoice_dir):
+        logger.error(f"Invoice directory not found: {args.invoice_dir}")
+        return EXIT_FATAL
+    invoice_paths = find_invoices(args.invoice_dir, args.recursive)
+    if not invoice_paths:
+        logger.error(f"No invoice image found in {args.invoice_dir}")
+        return EXIT_FATAL
+
+    service = APIService()
+
+    # Upload the statement like the home page does (never over another statement of the same name);
+    # its columnar sidecar is only written on request
+    statement_path = statement_upload_path(args.statement)
+    with open(args.statement, 'rb') as f:
+        upload = service.upload_file(statement_path, f.read(), ingest=args.columnar)
+    if not upload['success']:
+        logger.error(f"Statement upload failed: {upload['error']}")
+        return EXIT_FATAL
+
+    # Each invoice is checkpointed: the interrupted run of the same batch is resumed
+    checkpoint = service.open_checkpoint('cli', statement_path, invoice_paths, args.threshold, backend=args.backend,
+                                         use_cache=not args.no_cache, resume=not args.restart)
+    completed = checkpoint['completed']
+    if checkpoint['resumed']:
+        logger.info(f"Resuming job {checkpoint['job_id']}: {len(completed)} invoices already done")
+    leased = checkpoint['leased']['items']
+    if leased:
+        logger.warning(f"{leased} invoices are still leased by the interrupted run and are skipped; "
+                       f"run again in {checkpoint['leased']['expires_in']:.0f}s to process them")
+
+    logger.info(f"Reconciling {len(invoice_paths) - len(completed)} invoices against {args.statement} "
+                f"({args.concurrency} workers, cache {'off' if args.no_cache else 'on'})")
+    started = time.perf_counter()
+    confusion_results = []
+    statuses = {}
+    processed = 0
+
+    # Reading, extraction and matching overlap; each record arrives once its invoice is matched
+    pipeline = service.reconciliation_pipeline(
+        statement_path, args.threshold, backend=args.backend, use_cache=not args.no_cache,
+        load_workers=args.load_workers, extraction_workers=args.concurrency,
+        match_workers=args.match_workers, queue_size=args.queue_size
+    )
+    with ResultWriter(args.output, args.format) as writer:
+        records = itertools.chain(completed, service.run_checkpoint(checkpoint['job_id'], pipeline))
+        for done, record in enumerate(records, start=1):
+            processed = max(0, done - len(completed))
+            writer.write(record)
+            confusion_results.append(record['confusion'])
+            statuses[record['status']] = statuses.get(record['status'], 0) + 1
+            logger.info(f"[{done}/{len(invoice_paths)}] {record['invoice']}: {record['status']}")
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        'statement': args.statement,
+        'job_id': checkpoint['job_id'],
+        'resumed': checkpoint['resumed'],
+        'invoices': len(invoice_paths),
+        'from_checkpoint': len(completed),
+        'processed': processed,
+        'leased': leased,
+        'statuses': statuses,
+        'seconds': elapsed,
+        # Only the invoices processed by this run, not those restored from the checkpoint
+        'invoices_per_second': processed / elapsed if elapsed else None,
+        'global': service.combine_confusion_matrices(confusion_results),
+        'pipeline': pipeline.stats(),
+        'output': args.output,
+    }
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    logger.info(f"Done in {elapsed:.1f}s: {statuses}; results in {args.output}")
+    logger.info(f"Pipeline bottleneck: {summary['pipeline'].get('bottleneck')}")
+    print(json.dumps(summary))
+
+    failed = statuses.get('extraction_failed', 0) + statuses.get('matching_failed', 0)
+    # Leased invoices were not processed: the run is incomplete
+    return EXIT_PARTIAL if failed or leased else EXIT_OK
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_logging(args.log_level, args.log_file)
+    try:
+        return run(args)
+    except Exception as e:
+        logger.error(f"Reconciliation failed: {e}", exc_info=True)
+        return EXIT_FATAL
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -24,7 +24,7 @@ def main():
                 'df':  pd.read_csv(BytesIO(predicted_file.read()), sep=',', encoding='utf-8')
             }
     else:
-        st.dataframe(st.session_state.result_list, use_container_width=True)
+        st.dataframe(st.session_state.result_list.to_dataframe(), use_container_width=True)
     
     st.subheader("2. Relevé Bancaire et label pour faire le test de comparaison")
     target_file = st.file_uploader("Relevé bancaire (CSV) et Label", type=['csv'], key="target_bank_uploader_widget")
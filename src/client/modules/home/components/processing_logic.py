@@ -2,51 +2,12 @@ import streamlit as st
 import os
 import time
 import logging
+import itertools
 from src.client.modules.home.components.results_display import display_results, create_confusion_matrix_plot
-import pandas as pd
 from src.server.config.paths import CSV_DIR, IMAGES_DIR
-import numpy as np
-
-def combine_confusion_matrices(matrices_list):
-    """Combine multiple confusion matrices into one global matrix"""
-    if not matrices_list:
-        return None
-    
-    # Initialize the global matrix with zeros
-    global_matrix = np.zeros((2, 2), dtype=int)
-    
-    # Sum all individual matrices
-    for matrix in matrices_list:
-        if matrix is not None:
-            global_matrix += np.array(matrix["confusion_matrix"])
-    
-    # Calculate global metrics
-    TP = global_matrix[1, 1]
-    FP = global_matrix[0, 1]
-    TN = global_matrix[0, 0]
-    FN = global_matrix[1, 0]
-    
-    total = TP + FP + TN + FN
-    accuracy = (TP + TN) / total if total > 0 else 0
-    precision = TP / (TP + FP) if (TP + FP) > 0 else 0
-    recall = TP / (TP + FN) if (TP + FN) > 0 else 0
-    f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
-    
-    return {
-        "confusion_matrix": global_matrix.tolist(),
-        "metrics": {
-            "accuracy": accuracy * 100,
-            "precision": precision * 100,
-            "recall": recall * 100,
-            "f1_score": f1 * 100
-        },
-        "counts": {
-            "true_positive": int(TP),
-            "false_positive": int(FP),
-            "true_negative": int(TN),
-            "false_negative": int(FN)
-        }
-    }
+from src.server.config.settings import BACKGROUND_JOBS, JOB_POLL_SECONDS
+from src.server.api.reconciliation import combine_confusion_matrices, false_negative_confusion, best_matches
+from src.server.api.result_store import ResultStore
 
 def process_upload_and_extraction(bank_statement, invoices):
     """Process the upload and extraction of data from invoices"""
@@ -85,66 +46,75 @@ def process_upload_and_extraction(bank_statement, invoices):
                 st.session_state.list_view = []
                 progress_bar.progress(10)
                 
-                # Process each invoice sequentially
-                for i, invoice_file in enumerate(st.session_state.preview_invoices):
-                    # Add a separator between invoices
-                    if i > 0:
-                        st.markdown("---")
-                    
-                    # Display invoice number
-                    st.subheader(f"Facture {i+1}/{num_invoices}")
-                    
-                    # Upload invoice
-                    invoice_name = invoice_file.get('name')
-                    invoice_path = os.path.join(IMAGES_DIR, invoice_name)
+                # Upload all invoices first
+                invoice_paths = []
+                for invoice_file in st.session_state.preview_invoices:
+                    invoice_path = os.path.join(IMAGES_DIR, invoice_file.get('name'))
                     st.session_state.server_service.upload_file(invoice_path, invoice_file.get('read'))
-                    
-                    # Extract data
-                    status_placeholder.info(f"🔄 Processing invoice {i+1}/{num_invoices}...")
-                    result = st.session_state.server_service.get_extracted_data(invoice_path)
-                    extracted_data = {}
-                    if result and result['success']:
-                        extracted_data = result['data']
-                        raw_text = extracted_data.get('raw_text', '')
-                        extracted_json = extracted_data.get('json', {})
-                    else:
-                        logging.error(f"Extraction failed for {invoice_path}: {result.get('error', 'Unknown error')}")
-                        extracted_json = {}
-                        raw_text = 'Extraction Failed'
-
-                    # Store extracted data
-                    st.session_state.extracted_data[invoice_path] = {
-                        'json': extracted_json,
-                        'raw_text': raw_text,
-                        'error': result.get('error', None)
-                    }
-
-                    st.session_state.invoices_list = [*st.session_state.invoices_list, [invoice_path, extracted_data]]
+                    invoice_paths.append(invoice_path)
 
-                    # Process matching for this invoice
-                    matching_results, confusion_results = process_matching(invoice_path, invoice_name, extracted_json)
-                    
-                    # Store confusion matrix for global calculation
-                    if confusion_results:
-                        st.session_state.confusion_matrices.append(confusion_results)
+                # Flag near-duplicate receipts for the user; they are still extracted on their own
+                duplicates = st.session_state.server_service.find_duplicate_invoices(invoice_paths)
+                for invoice_path, duplicate in zip(invoice_paths, duplicates):
+                    if duplicate:
+                        origin = "ce lot" if duplicate['source'] == 'batch' else "l'historique"
+                        st.info(f"🔁 {os.path.basename(invoice_path)} semble être un doublon de {duplicate['duplicate_of']} ({origin}).")
+
+                if BACKGROUND_JOBS:
+                    # Processed by job_worker.py; the page only polls the job (see render_job)
+                    submit_background_job(invoice_paths)
+                    return
+
+                # Each invoice is checkpointed: after an interruption, the same upload resumes the run
+                # and only the failed or remaining invoices go through the pipeline again
+                checkpoint = st.session_state.server_service.open_checkpoint(
+                    st.session_state.job_owner,
+                    st.session_state.bank_statement_path,
+                    invoice_paths,
+                    threshold=st.session_state.treshold
+                )
+                if checkpoint['resumed']:
+                    st.info(f"♻️ Reprise du traitement interrompu : {len(checkpoint['completed'])}/{num_invoices} factures déjà traitées.")
+                leased = checkpoint['leased']
+                if leased['items']:
+                    # Still claimed by the interrupted run: they are only handed out again once its lease expires
+                    st.warning(f"⏳ {leased['items']} facture(s) encore réservée(s) par le traitement interrompu : "
+                               f"relancez dans {int(leased['expires_in']) + 1} s pour les traiter.")
+                st.session_state.extracted_data = {}
+                st.session_state.invoices_list = []
+                st.session_state.result_list = ResultStore()
+
+                # Staged pipeline: invoices are read, extracted and matched concurrently, with bounded
+                # queues between the stages; each one is displayed as soon as it is matched
+                status_placeholder.info(f"🔄 Processing {num_invoices} invoices...")
+                pipeline = st.session_state.server_service.reconciliation_pipeline(
+                    st.session_state.bank_statement_path,
+                    threshold=st.session_state.treshold
+                )
+                records = itertools.chain(
+                    checkpoint['completed'],
+                    st.session_state.server_service.run_checkpoint(checkpoint['job_id'], pipeline)
+                )
+                for i, record in enumerate(records):
+                    status_placeholder.info(f"🔄 Processed invoice {i+1}/{num_invoices}...")
+                    handle_record(i, record, num_invoices)
                     
                     # Update progress
                     progress = 10 + int(90 * (i + 1) / num_invoices)
                     progress_bar.progress(progress)
 
-                    st.button(f"Path: {invoice_path}")
-                    
-                    st.session_state.list_view = [*st.session_state.list_view, [invoice_path, extracted_data, matching_results]]
-                    
-                    # Display individual results without confusion matrix
-                    if not st.session_state.is_slider_changed:
-                        display_results(st, invoice_path, extracted_data, matching_results, None)
+                logging.info(f"Pipeline stats: {pipeline.stats()}")
 
             else:
+                # Threshold change: the score vectors are cached server-side, so this only re-filters them.
+                # Results are rebuilt from scratch for the new threshold.
                 st.session_state.invoices_list_slider = st.session_state.invoices_list
+                st.session_state.result_list = ResultStore()
                 for invoice in st.session_state.invoices_list_slider:
                     # Process matching for this invoice
-                    matching_results, _ = process_matching(invoice[0], os.path.basename(invoice[0]), invoice[1].get('json'))
+                    matching_results, confusion_results = process_matching(invoice[0], os.path.basename(invoice[0]), invoice[1].get('json'))
+                    if confusion_results:
+                        st.session_state.confusion_matrices.append(confusion_results)
                     display_results(st, invoice[0], invoice[1], matching_results, None)
             
             # All invoices processed
@@ -159,91 +129,204 @@ def process_upload_and_extraction(bank_statement, invoices):
         
         # Add the results section with global confusion matrix at the end
         if not is_processing:
-            st.divider()
-            st.header("Résultats Globaux:")
-            
-            # Calculate and display global confusion matrix
-            global_conf_matrix = combine_confusion_matrices(st.session_state.confusion_matrices)
-            
-            if global_conf_matrix:
-                col1, col2 = st.columns([1, 1])
-                
-                with col1:
-                    st.markdown("### 📊 Matrice de Confusion Globale")
-                    st.markdown("""
-                    - **TP (True Positive)** : Factures correctement matchées
-                    - **TN (True Negative)** : Absence de match correctement identifiée
-                    - **FP (False Positive)** : Match incorrect proposé
-                    - **FN (False Negative)** : Match manqué
-                    """)
-                    
-                    fig = create_confusion_matrix_plot(global_conf_matrix["confusion_matrix"])
-                    st.plotly_chart(fig, use_container_width=True, key="global_matrix")
-                
-                with col2:
-                    st.markdown("### 📈 Métriques de Performance")
-                    metrics = global_conf_matrix["metrics"]
-                    counts = global_conf_matrix["counts"]
-                    
-                    # Display counts
-                    st.markdown("#### Décompte:")
-                    c1, c2, c3, c4 = st.columns(4)
-                    with c1:
-                        st.metric("True Positives", counts["true_positive"])
-                    with c2:
-                        st.metric("False Positives", counts["false_positive"])
-                    with c3:
-                        st.metric("True Negatives", counts["true_negative"])
-                    with c4:
-                        st.metric("False Negatives", counts["false_negative"])
-                    
-                    # Display performance metrics
-                    st.markdown("#### Métriques:")
-                    m1, m2, m3, m4 = st.columns(4)
-                    with m1:
-                        st.metric("Accuracy", f"{metrics['accuracy']:.1f}%")
-                    with m2:
-                        st.metric("Precision", f"{metrics['precision']:.1f}%")
-                    with m3:
-                        st.metric("Recall", f"{metrics['recall']:.1f}%")
-                    with m4:
-                        st.metric("F1-Score", f"{metrics['f1_score']:.1f}%")
-            
-            # Display individual results table
-            st.header("Résultats Détaillés:")
-            if not st.session_state.result_list.empty:
-                st.dataframe(st.session_state.result_list, use_container_width=True)
-                
-                file_type = st.sidebar.selectbox("Select the download file type", ["CSV", "XLS"])
-                converted_data = st.session_state.server_service.download_file(st.session_state.result_list)
-                if file_type == 'CSV':
-                    st.download_button(
-                        label="Download CSV",
-                        data=converted_data,
-                        file_name="matching_results.csv",
-                        mime="text/csv",
-                    )
-                else:
-                    st.download_button(
-                        label="Download Excel",
-                        data=converted_data,
-                        file_name="matching_results.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    )  
-            else:
-                st.markdown(f"### Aucun résultat trouvé pour les {num_invoices} factures avec ce relevé bancaire.")
-            
-            st.button("🧹 Recommencer et éffectuez un nouveau payment ?", key="clear_button", on_click=handle_clear_service)
-            
+            render_global_results(num_invoices)
 
     except Exception as e:
         logging.error(f"Upload/Extraction Error: {e}", exc_info=True)
         st.error(f"An error occurred during upload/extraction: {e}")
         st.session_state.uploading = False
-        st.session_state.extracted_data = {}
         st.session_state.matching_results = {}
-        st.session_state.invoices_list = []
-        st.session_state.bank_statement_path = None
+        # The processed invoices are checkpointed: uploading the same files again resumes the run
+        if not BACKGROUND_JOBS and st.session_state.preview_invoices:
+            st.button("🔁 Reprendre le traitement", key="resume_button", on_click=handle_resume)
+
+def handle_resume():
+    """Run the interrupted upload again: its checkpoint skips the invoices already processed"""
+    st.session_state.uploading = True
+    st.session_state.is_service_cleared = False
+
+def handle_record(i, record, num_invoices):
+    """Store and display one reconciled invoice (a reconcile_invoice record)"""
+    invoice_path = record['invoice_path']
+    invoice_name = record['invoice']
+
+    # Add a separator between invoices
+    if i > 0:
+        st.markdown("---")
+    
+    # Display invoice number
+    st.subheader(f"Facture {i+1}/{num_invoices}")
+
+    extracted_data = {}
+    if record['status'] == 'extraction_failed':
+        logging.error(f"Extraction failed for {invoice_path}: {record['error']}")
+        st.warning(f"📋 Extraction échouée pour {invoice_name}. Considéré comme un Faux Négatif.")
+        extracted_json = {}
+        raw_text = 'Extraction Failed'
+    else:
+        extracted_json = record['extracted']
+        raw_text = record['raw_text']
+        extracted_data = {'json': extracted_json, 'raw_text': raw_text}
+        if record['status'] == 'matching_failed':
+            st.error(f"An error occurred during matching for {invoice_path}: {record['error']}")
+
+    # Store extracted data
+    st.session_state.extracted_data[invoice_path] = {
+        'json': extracted_json,
+        'raw_text': raw_text,
+        'error': record['error']
+    }
+
+    st.session_state.invoices_list.append([invoice_path, extracted_data])
+
+    matching_results = record['matches']
+    add_best_matches(record['best_matches'], invoice_name)
+    
+    # Store confusion matrix for global calculation
+    if record['confusion']:
+        st.session_state.confusion_matrices.append(record['confusion'])
+
+    st.button(f"Path: {invoice_path}")
+    
+    st.session_state.list_view.append([invoice_path, extracted_data, matching_results])
+    
+    # Display individual results without confusion matrix
+    if not st.session_state.is_slider_changed:
+        display_results(st, invoice_path, extracted_data, matching_results, None)
+
+def submit_background_job(invoice_paths):
+    """Queue the uploaded batch for the job worker and switch the page to the job view"""
+    job_id = st.session_state.server_service.submit_job(
+        st.session_state.job_owner,
+        st.session_state.bank_statement_path,
+        invoice_paths,
+        threshold=st.session_state.treshold
+    )
+    st.session_state.job_id = job_id
+    # Keep the job in the URL so a page reload finds it again
+    st.query_params['job'] = job_id
+    st.session_state.uploading = False
+    st.rerun()
+
+def render_job(job_id):
+    """Progress and partial results of a background job, refreshed every JOB_POLL_SECONDS while it runs"""
+    server_service = st.session_state.server_service
+    job = server_service.get_job(job_id)
+    if job is None:
+        st.error(f"Job {job_id} introuvable.")
+        st.session_state.job_id = None
+        st.query_params.clear()
+        return
+
+    num_invoices = job['total']
+    st.header("📊 Analyse des Factures")
+    st.caption(f"Job {job_id} · seuil {job['params'].get('threshold', 70)} · {job['status']}")
+    st.progress(job['done'] / num_invoices if num_invoices else 1.0)
+    if job['status'] == 'queued':
+        st.info(f"⏳ En attente d'un worker ({job.get('queue_position', 0)} job(s) avant celui-ci)...")
+    elif job['status'] == 'running':
+        st.info(f"🔄 {job['done']}/{num_invoices} factures traitées ({job['failed']} en échec)...")
+
+    # Results are rebuilt from the job at each refresh (the job, not the session, holds them)
+    st.session_state.bank_statement_path = job['statement_path']
+    st.session_state.confusion_matrices = []
+    st.session_state.result_list = ResultStore()
+    st.session_state.invoices_list = []
+    st.session_state.list_view = []
+    records = server_service.get_job_results(job_id)
+    with st.container(height=600):
+        for i, record in enumerate(records):
+            handle_record(i, record, num_invoices)
+
+    if job['status'] in ('queued', 'running'):
+        st.button("⏹️ Annuler le job", key="cancel_job", on_click=server_service.cancel_job, args=(job_id,))
+        time.sleep(JOB_POLL_SECONDS)
+        st.rerun()
+    else:
+        if job['failed'] or job['status'] == 'cancelled':
+            # Requeue only the failed or unprocessed invoices; the others keep their results
+            st.button("🔁 Relancer les factures en échec", key="resume_job",
+                      on_click=server_service.resume_job, args=(job_id,))
+        render_global_results(num_invoices)
+
+def render_global_results(num_invoices):
+    """Global confusion matrix, metrics and the detailed results table with its download"""
+    st.divider()
+    st.header("Résultats Globaux:")
+
+    # Calculate and display global confusion matrix
+    global_conf_matrix = combine_confusion_matrices(st.session_state.confusion_matrices)
+
+    if global_conf_matrix:
+        col1, col2 = st.columns([1, 1])
+
+        with col1:
+            st.markdown("### 📊 Matrice de Confusion Globale")
+            st.markdown("""
+            - **TP (True Positive)** : Factures correctement matchées
+            - **TN (True Negative)** : Absence de match correctement identifiée
+            - **FP (False Positive)** : Match incorrect proposé
+            - **FN (False Negative)** : Match manqué
+            """)
+
+            fig = create_confusion_matrix_plot(global_conf_matrix["confusion_matrix"])
+            st.plotly_chart(fig, use_container_width=True, key="global_matrix")
+
+        with col2:
+            st.markdown("### 📈 Métriques de Performance")
+            metrics = global_conf_matrix["metrics"]
+            counts = global_conf_matrix["counts"]
+
+            # Display counts
+            st.markdown("#### Décompte:")
+            c1, c2, c3, c4 = st.columns(4)
+            with c1:
+                st.metric("True Positives", counts["true_positive"])
+            with c2:
+                st.metric("False Positives", counts["false_positive"])
+            with c3:
+                st.metric("True Negatives", counts["true_negative"])
+            with c4:
+                st.metric("False Negatives", counts["false_negative"])
+
+            # Display performance metrics
+            st.markdown("#### Métriques:")
+            m1, m2, m3, m4 = st.columns(4)
+            with m1:
+                st.metric("Accuracy", f"{metrics['accuracy']:.1f}%")
+            with m2:
+                st.metric("Precision", f"{metrics['precision']:.1f}%")
+            with m3:
+                st.metric("Recall", f"{metrics['recall']:.1f}%")
+            with m4:
+                st.metric("F1-Score", f"{metrics['f1_score']:.1f}%")
+
+    # Display individual results table
+    st.header("Résultats Détaillés:")
+    if not st.session_state.result_list.empty:
+        st.dataframe(st.session_state.result_list.to_dataframe(), use_container_width=True)
+        logging.debug(f"Result store memory: {st.session_state.result_list.memory_usage()}")
+
+        file_type = st.sidebar.selectbox("Select the download file type", ["CSV", "XLS"])
+        converted_data = st.session_state.server_service.download_file(st.session_state.result_list)
+        if file_type == 'CSV':
+            st.download_button(
+                label="Download CSV",
+                data=converted_data,
+                file_name="matching_results.csv",
+                mime="text/csv",
+            )
+        else:
+            st.download_button(
+                label="Download Excel",
+                data=converted_data,
+                file_name="matching_results.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            )  
+    else:
+        st.markdown(f"### Aucun résultat trouvé pour les {num_invoices} factures avec ce relevé bancaire.")
+
+    st.button("🧹 Recommencer et éffectuez un nouveau payment ?", key="clear_button", on_click=handle_clear_service)
 
 def handle_clear_service():
     """Reset all session state variables and delete files."""
@@ -272,7 +355,7 @@ def handle_clear_service():
     st.session_state.results_ready = False
     st.session_state.total_amount = 0
     st.session_state.confusion_matrices = []
-    st.session_state.result_list = pd.DataFrame()
+    st.session_state.result_list = ResultStore()
     st.session_state.can_upload = True
     st.session_state.is_slider_changed = False
     st.session_state.invoices_list_slider = []
@@ -280,10 +363,26 @@ def handle_clear_service():
     st.session_state.preview_bank_statement = None
     st.session_state.preview_invoices = []
     st.session_state.treshold = 70
+    st.session_state.job_id = None
+    st.query_params.clear()
     
     logging.info("State cleared by user.")
     st.success("Result cleared. You can upload new files.")
 
+def add_best_matches(best_rows, invoice_name):
+    """Add the best-scored match(es) of an invoice to result_list, with the invoice as source."""
+    if not best_rows:
+        return
+    
+    # Initialiser result_list si nécessaire
+    if not hasattr(st.session_state, 'result_list'):
+        st.session_state.result_list = ResultStore()
+    
+    # Ajout en O(1) amorti (un pd.concat recopiait toutes les lignes précédentes à chaque facture)
+    for row in best_rows:
+        # Ajouter une colonne source
+        st.session_state.result_list.append({**row, 'source': invoice_name})
+
 def process_matching(invoice_path, invoice_name, invoice_data):
     """Process matching for a single invoice"""
     try:
@@ -299,21 +398,7 @@ def process_matching(invoice_path, invoice_name, invoice_data):
             st.warning(f"📋 Extraction échouée pour {os.path.basename(invoice_path)}. Considéré comme un Faux Négatif.")
             
             # Créer une matrice de confusion manuelle pour FN
-            confusion_results = {
-                "confusion_matrix": [[0, 0], [1, 0]],  # [TN, FP], [FN, TP]
-                "metrics": {
-                    "accuracy": 0.0,
-                    "precision": 0.0,
-                    "recall": 0.0,
-                    "f1_score": 0.0
-                },
-                "counts": {
-                    "true_positive": 0,
-                    "false_positive": 0,
-                    "true_negative": 0,
-                    "false_negative": 1
-                }
-            }
+            confusion_results = false_negative_confusion()
             
             return [], confusion_results
 
@@ -336,27 +421,7 @@ def process_matching(invoice_path, invoice_name, invoice_data):
                 )
                 
                 # Si une correspondance est trouvée, l'ajouter à result_list
-                if match_list and len(match_list) > 0:
-                    match_df = pd.DataFrame(match_list)
-                    
-                    if 'match_score' in match_df.columns:
-                        # Trouver le score maximal
-                        max_score = match_df['match_score'].max()
-                        
-                        # Obtenir la(les) ligne(s) avec le score maximal
-                        row_with_max_score = match_df[match_df['match_score'] == max_score].copy()
-                        # Ajouter une colonne source
-                        row_with_max_score['source'] = invoice_name
-                        
-                        # Initialiser result_list si nécessaire
-                        if not hasattr(st.session_state, 'result_list'):
-                            st.session_state.result_list = pd.DataFrame()
-                        
-                        # Ajouter à result_list s'il n'est pas vide
-                        if not st.session_state.result_list.empty:
-                            st.session_state.result_list = pd.concat([st.session_state.result_list, row_with_max_score], ignore_index=True)
-                        else:
-                            st.session_state.result_list = row_with_max_score
+                add_best_matches(best_matches(match_list), invoice_name)
 
             return match_list, confusion_results
         
@@ -365,21 +430,7 @@ def process_matching(invoice_path, invoice_name, invoice_data):
             st.error(f"An error occurred during matching for {invoice_path}: {e}")
             
             # En cas d'erreur de matching, considérer comme un Faux Négatif également
-            confusion_results = {
-                "confusion_matrix": [[0, 0], [1, 0]],  # [TN, FP], [FN, TP]
-                "metrics": {
-                    "accuracy": 0.0,
-                    "precision": 0.0,
-                    "recall": 0.0,
-                    "f1_score": 0.0
-                },
-                "counts": {
-                    "true_positive": 0,
-                    "false_positive": 0,
-                    "true_negative": 0,
-                    "false_negative": 1
-                }
-            }
+            confusion_results = false_negative_confusion()
             
             return [], confusion_results
 
@@ -17,7 +17,10 @@ def main():
     control_buttons.render_control_buttons(bank_statement, invoices)
 
     # Handle processing based on state
-    if st.session_state.uploading:
+    if st.session_state.job_id:
+        # Batch processed in the background: follow the job
+        processing_logic.render_job(st.session_state.job_id)
+    elif st.session_state.uploading:
         st.write("Uploading...")
         processing_logic.process_upload_and_extraction(bank_statement, invoices)
 
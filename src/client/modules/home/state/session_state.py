@@ -1,5 +1,7 @@
+import uuid
 import streamlit as st
 from src.server import APIService
+from src.server.api.result_store import ResultStore
 import pandas as pd
 
 def initialize_session_state():
@@ -41,6 +43,12 @@ def initialize_session_state():
     if 'is_service_cleared' not in st.session_state:
         st.session_state.is_service_cleared = False
     if 'result_list' not in st.session_state:
-        st.session_state.result_list = pd.DataFrame()
+        st.session_state.result_list = ResultStore()
+    if 'job_owner' not in st.session_state:
+        # Unit of fair scheduling between users in the background job queue
+        st.session_state.job_owner = uuid.uuid4().hex
+    if 'job_id' not in st.session_state:
+        # A background job survives page reloads through the URL
+        st.session_state.job_id = st.query_params.get('job')
 
 
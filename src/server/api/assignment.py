@@ -0,0 +1,128 @@
+import logging
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from src.server.api.matching import match_candidates_cache, build_match
+from src.server.api.statement_cache import load_statement
+
+logger = logging.getLogger(__name__)
+
+
+def build_score_matrix(statement, invoices, threshold=70):
+    """
+    Builds the sparse invoice x transaction score matrix for a whole batch.
+
+    Only the candidates returned by the date/amount indexes with a score above the
+    threshold are stored, so the matrix stays small even for thousands of invoices.
+
+    Returns:
+        scipy.sparse.csr_matrix: shape (len(invoices), statement rows), value = score + 1
+            (the offset keeps a zero score distinguishable from a missing edge)
+    """
+    rows, cols, weights = [], [], []
+    for invoice_id, invoice_data in enumerate(invoices):
+        if not invoice_data:
+            continue
+        try:
+            candidate_ids, scores = match_candidates_cache.get(statement, invoice_data)
+        except Exception as e:
+            logger.error(f"Could not score invoice {invoice_id}: {e}", exc_info=True)
+            continue
+        keep = scores >= threshold
+        rows.extend([invoice_id] * int(keep.sum()))
+        cols.extend(candidate_ids[keep].tolist())
+        weights.extend((scores[keep] + 1).tolist())
+
+    shape = (len(invoices), len(statement.df))
+    return coo_matrix((weights, (rows, cols)), shape=shape, dtype=np.float64).tocsr()
+
+
+def solve_assignment(score_matrix):
+    """
+    Maximum-weight one-to-one assignment between invoices (rows) and transactions (columns).
+
+    The bipartite graph is split into connected components and each component is solved
+    on its own dense sub-matrix, which keeps the problem size bounded by the conflicts
+    actually present in the batch.
+
+    Returns:
+        dict: invoice index -> transaction row id
+    """
+    invoice_count, transaction_count = score_matrix.shape
+    if score_matrix.nnz == 0:
+        return {}
+
+    # Bipartite adjacency: invoices are nodes [0, n), transactions are nodes [n, n + m)
+    edges = score_matrix.tocoo()
+    graph = coo_matrix(
+        (np.ones(edges.nnz), (edges.row, edges.col + invoice_count)),
+        shape=(invoice_count + transaction_count, invoice_count + transaction_count),
+    )
+    _, labels = connected_components(graph, directed=False)
+
+    # Group the edges by component
+    order = np.argsort(labels[edges.row], kind='stable')
+    edge_rows, edge_cols = edges.row[order], edges.col[order]
+    _, starts = np.unique(labels[edge_rows], return_index=True)
+    stops = np.append(starts[1:], len(order))
+
+    assignment = {}
+    for start, stop in zip(starts, stops):
+        component_rows = np.unique(edge_rows[start:stop])
+        component_cols = np.unique(edge_cols[start:stop])
+
+        sub_matrix = score_matrix[component_rows][:, component_cols].toarray()
+        if len(component_rows) == 1 or len(component_cols) == 1:
+            # No conflict to arbitrate: the single best edge wins
+            row, col = np.unravel_index(np.argmax(sub_matrix), sub_matrix.shape)
+            assignment[int(component_rows[row])] = int(component_cols[col])
+            continue
+
+        assigned_rows, assigned_cols = linear_sum_assignment(sub_matrix, maximize=True)
+        for row, col in zip(assigned_rows, assigned_cols):
+            if sub_matrix[row, col] > 0:
+                assignment[int(component_rows[row])] = int(component_cols[col])
+
+    return assignment
+
+
+def match_batch(file_path, invoices, threshold=70):
+    """
+    Matches a whole batch of invoices against the statement with a global one-to-one assignment,
+    so a bank transaction is never returned as the match of two different invoices.
+
+    Args:
+        file_path (str): Path to the statement CSV file
+        invoices (list): Extracted invoice data dicts (an empty dict for a failed extraction)
+        threshold (int): Minimum vendor similarity score
+
+    Returns:
+        list: For each invoice, in input order, a list with its assigned match (or an empty list)
+    """
+    logger.info(f"Batch matching {len(invoices)} invoices against: {file_path}")
+    try:
+        statement = load_statement(file_path)
+        if statement.df.empty:
+            logger.warning("DataFrame is empty or None, cannot find matches.")
+            return [[] for _ in invoices]
+
+        score_matrix = build_score_matrix(statement, invoices, threshold)
+        assignment = solve_assignment(score_matrix)
+        logger.info(f"Batch matching assigned {len(assignment)}/{len(invoices)} invoices ({score_matrix.nnz} candidate pairs)")
+
+        results = []
+        for invoice_id in range(len(invoices)):
+            row_id = assignment.get(invoice_id)
+            if row_id is None:
+                results.append([])
+            else:
+                score = score_matrix[invoice_id, row_id] - 1
+                results.append([build_match(statement.df, row_id, score)])
+        return results
+
+    except Exception as e:
+        logger.error(f"Error in match_batch: {str(e)}", exc_info=True)
+        return [[] for _ in invoices]
@@ -4,6 +4,14 @@ import os
 import logging
 import time
 
+from src.server.api.statement_cache import load_statement
+from src.server.api.extract_data import get_extracted_data
+from src.server.api.extraction_backends import list_backends
+from src.server.api.image_preprocessing import prepare_image_payload
+from src.server.api.vendor import normalize_vendor, vendor_similarity
+from src.server.api.receipt_parser import parse_receipt_text
+from src.server.config.settings import HEURISTIC_CONFIDENCE_THRESHOLD
+
 # Configuration du logger
 logger = logging.getLogger(__name__)
 
@@ -121,9 +129,9 @@ def evaluate_matching_performance(csv_path, matching_results, image_filename):
             
         logger.info(f"Chargement du fichier CSV: {csv_path}")
         
-        # Charger les données du CSV avec gestion des erreurs
+        # Charger les données du CSV (sidecar colonnaire mappé en mémoire) avec gestion des erreurs
         try:
-            csv_data = pd.read_csv(csv_path)
+            csv_data = load_statement(csv_path).df
             if csv_data.empty:
                 logger.warning("Le fichier CSV est vide")
                 return None
@@ -216,4 +224,264 @@ def benchmark(df, df_predicted):
             
     except Exception as e:
         logger.error(f"Erreur lors du benchmark: {str(e)}", exc_info=True)
+        return None
+
+# Champs comparés par le benchmark d'extraction et score minimal de similarité des vendeurs
+EXTRACTION_FIELDS = ['date', 'amount', 'currency', 'vendor']
+VENDOR_MATCH_SCORE = 80
+
+def _same_field(field, expected, actual):
+    """Compare une valeur extraite à la valeur attendue, avec la même tolérance que le matching."""
+    if expected is None or actual is None:
+        return expected is None and actual is None
+    try:
+        if field == 'date':
+            return pd.to_datetime(expected).date() == pd.to_datetime(actual).date()
+        if field == 'amount':
+            return abs(float(expected) - float(actual)) < 0.01
+        if field == 'currency':
+            return str(expected).strip().upper() == str(actual).strip().upper()
+        return vendor_similarity(normalize_vendor(str(expected)), normalize_vendor(str(actual))) >= VENDOR_MATCH_SCORE
+    except (ValueError, TypeError):
+        return False
+
+def benchmark_match_scoring(csv_path, invoices, repeat=3):
+    """
+    Compare le scoring ligne par ligne (calculate_match_score via df.apply) et le scoring vectorisé
+    (calculate_match_scores) sur un relevé : temps par facture, accélération et scores différents.
+
+    Args:
+        csv_path (str): Relevé bancaire
+        invoices (list): Données extraites des factures (date, amount, currency, vendor)
+        repeat (int): Mesures par facture et par variante (la meilleure est retenue)
+
+    Returns:
+        dict: Lignes, factures, secondes par facture de chaque variante, accélération et nombre de
+            scores différents (0 attendu)
+    """
+    # Import local : matching importe ce module
+    from src.server.api.matching import calculate_match_score, calculate_match_scores
+
+    try:
+        df = load_statement(csv_path).df
+        logger.info(f"Benchmark du scoring sur {len(df)} lignes et {len(invoices)} factures")
+        timings = {'row_wise': 0.0, 'vectorized': 0.0}
+        mismatches = 0
+        scorers = {
+            'row_wise': lambda invoice: df.apply(lambda row: calculate_match_score(row, invoice, date_tolerance_days=1), axis=1),
+            'vectorized': lambda invoice: calculate_match_scores(df, invoice, date_tolerance_days=1),
+        }
+        for invoice in invoices:
+            scores = {}
+            for name, scorer in scorers.items():
+                best = float('inf')
+                for _ in range(max(1, repeat)):
+                    started = time.perf_counter()
+                    scores[name] = scorer(invoice)
+                    best = min(best, time.perf_counter() - started)
+                timings[name] += best
+            mismatches += int((scores['row_wise'].to_numpy() != scores['vectorized'].to_numpy()).sum())
+
+        count = len(invoices)
+        results = {
+            'rows': len(df),
+            'invoices': count,
+            'row_wise_seconds': timings['row_wise'] / count if count else 0.0,
+            'vectorized_seconds': timings['vectorized'] / count if count else 0.0,
+            'speedup': timings['row_wise'] / timings['vectorized'] if timings['vectorized'] else None,
+            'mismatches': mismatches,
+        }
+        logger.info(f"Scoring: {results['row_wise_seconds']:.3f}s ligne par ligne, {results['vectorized_seconds']:.4f}s "
+                    f"vectorisé par facture (x{results['speedup']}), {mismatches} scores différents")
+        return results
+
+    except Exception as e:
+        logger.error(f"Erreur lors du benchmark du scoring: {str(e)}", exc_info=True)
+        return None
+
+def benchmark_image_preprocessing(image_paths, csv_path=None):
+    """
+    Compare l'extraction avec et sans prétraitement des images (taille envoyée, latence, précision).
+
+    Chaque image est extraite deux fois, sans passer par le cache d'extraction. Les champs extraits
+    sont comparés à la ligne du relevé dont la source correspond à l'image quand csv_path est fourni,
+    sinon à l'extraction de l'image originale.
+
+    Args:
+        image_paths (list): Chemins des images de factures
+        csv_path (str): Relevé avec une colonne 'source' servant de vérité terrain (optionnel)
+
+    Returns:
+        dict: Statistiques par variante ('raw', 'preprocessed') et détail par image
+    """
+    logger.info(f"Benchmark du prétraitement sur {len(image_paths)} images")
+    try:
+        truth = None
+        if csv_path:
+            truth = pd.read_csv(csv_path).drop_duplicates('source').set_index('source')
+
+        variants = {'raw': False, 'preprocessed': True}
+        summary = {name: {'payload_bytes': 0, 'seconds': 0.0, 'successes': 0, 'fields_correct': 0, 'fields_total': 0}
+                   for name in variants}
+        details = []
+
+        for image_path in image_paths:
+            with open(image_path, 'rb') as f:
+                image_bytes = f.read()
+            image_result = {'image': os.path.basename(image_path), 'original_bytes': len(image_bytes)}
+
+            extracted = {}
+            for name, preprocess in variants.items():
+                payload, mime_type = prepare_image_payload(image_bytes, image_path, preprocess)
+                started = time.perf_counter()
+                result = get_extracted_data(image_path, preprocess=preprocess, use_cache=False)
+                elapsed = time.perf_counter() - started
+
+                extracted[name] = result['data']['json'] if result.get('success') else None
+                summary[name]['payload_bytes'] += len(payload)
+                summary[name]['seconds'] += elapsed
+                summary[name]['successes'] += int(extracted[name] is not None)
+                image_result[name] = {'payload_bytes': len(payload), 'mime_type': mime_type, 'seconds': elapsed, 'json': extracted[name]}
+
+            expected_source = f"{os.path.basename(image_path)}.json"
+            if truth is not None and expected_source in truth.index:
+                reference = truth.loc[expected_source, EXTRACTION_FIELDS].to_dict()
+            elif truth is None:
+                reference = extracted['raw']
+            else:
+                reference = None
+            image_result['reference'] = reference
+
+            if reference is not None:
+                for name in variants:
+                    actual = extracted[name] or {}
+                    correct = sum(_same_field(field, reference.get(field), actual.get(field)) for field in EXTRACTION_FIELDS)
+                    summary[name]['fields_correct'] += correct
+                    summary[name]['fields_total'] += len(EXTRACTION_FIELDS)
+                    image_result[name]['fields_correct'] = correct
+            details.append(image_result)
+
+        for name, stats in summary.items():
+            stats['mean_seconds'] = stats['seconds'] / len(image_paths) if image_paths else 0.0
+            stats['field_accuracy'] = stats['fields_correct'] / stats['fields_total'] * 100 if stats['fields_total'] else None
+            logger.info(f"Prétraitement '{name}': {stats['payload_bytes']} octets, {stats['mean_seconds']:.2f}s/image, "
+                        f"précision des champs: {stats['field_accuracy']}")
+
+        return {**summary, 'images': details}
+
+    except Exception as e:
+        logger.error(f"Erreur lors du benchmark du prétraitement: {str(e)}", exc_info=True)
+        return None
+
+def benchmark_extraction_backends(image_paths, csv_path=None, backends=None):
+    """
+    Compare les backends d'extraction (précision des champs, latence et débit) sur les mêmes images.
+
+    Les extractions ne passent pas par le cache. Les champs sont comparés à la ligne du relevé dont
+    la source correspond à l'image quand csv_path est fourni, sinon à l'extraction du premier backend.
+
+    Args:
+        image_paths (list): Chemins des images de factures
+        csv_path (str): Relevé avec une colonne 'source' servant de vérité terrain (optionnel)
+        backends (list): Noms des backends à comparer (par défaut tous ceux disponibles ici)
+
+    Returns:
+        dict: Statistiques par backend et détail par image
+    """
+    try:
+        if backends is None:
+            backends = [name for name, available in list_backends().items() if available]
+        logger.info(f"Benchmark des backends {backends} sur {len(image_paths)} images")
+        truth = None
+        if csv_path:
+            truth = pd.read_csv(csv_path).drop_duplicates('source').set_index('source')
+
+        summary = {name: {'seconds': 0.0, 'successes': 0, 'fields_correct': 0, 'fields_total': 0} for name in backends}
+        details = []
+
+        for image_path in image_paths:
+            image_result = {'image': os.path.basename(image_path)}
+            extracted = {}
+            for name in backends:
+                started = time.perf_counter()
+                result = get_extracted_data(image_path, use_cache=False, backend=name)
+                elapsed = time.perf_counter() - started
+
+                extracted[name] = result['data']['json'] if result.get('success') else None
+                summary[name]['seconds'] += elapsed
+                summary[name]['successes'] += int(extracted[name] is not None)
+                image_result[name] = {'seconds': elapsed, 'json': extracted[name], 'error': result.get('error')}
+
+            expected_source = f"{os.path.basename(image_path)}.json"
+            if truth is not None and expected_source in truth.index:
+                reference = truth.loc[expected_source, EXTRACTION_FIELDS].to_dict()
+            elif truth is None and backends:
+                reference = extracted[backends[0]]
+            else:
+                reference = None
+            image_result['reference'] = reference
+
+            if reference is not None:
+                for name in backends:
+                    actual = extracted[name] or {}
+                    correct = sum(_same_field(field, reference.get(field), actual.get(field)) for field in EXTRACTION_FIELDS)
+                    summary[name]['fields_correct'] += correct
+                    summary[name]['fields_total'] += len(EXTRACTION_FIELDS)
+                    image_result[name]['fields_correct'] = correct
+            details.append(image_result)
+
+        for name, stats in summary.items():
+            stats['mean_seconds'] = stats['seconds'] / len(image_paths) if image_paths else 0.0
+            stats['images_per_second'] = len(image_paths) / stats['seconds'] if stats['seconds'] else None
+            stats['field_accuracy'] = stats['fields_correct'] / stats['fields_total'] * 100 if stats['fields_total'] else None
+            logger.info(f"Backend '{name}': {stats['mean_seconds']:.2f}s/image, {stats['images_per_second']} images/s, "
+                        f"précision des champs: {stats['field_accuracy']}")
+
+        return {**summary, 'images': details}
+
+    except Exception as e:
+        logger.error(f"Erreur lors du benchmark des backends: {str(e)}", exc_info=True)
+        return None
+
+def benchmark_heuristic_parser(samples, threshold=HEURISTIC_CONFIDENCE_THRESHOLD):
+    """
+    Mesure la précision de l'analyse heuristique du texte brut sur un jeu étiqueté.
+
+    Args:
+        samples (list): Dictionnaires {"raw_text": ..., "expected": {date, amount, currency, vendor}},
+            par exemple les extractions LLM déjà faites (raw_text et json)
+        threshold (float): Seuil de confiance au-dessus duquel l'appel LLM d'analyse est évité
+
+    Returns:
+        dict: Appels LLM évités et précision des champs, sur les reçus acceptés et sur tous les reçus
+    """
+    logger.info(f"Benchmark de l'analyse heuristique sur {len(samples)} reçus (seuil {threshold})")
+    try:
+        accepted = 0
+        per_field = {field: {'accepted_correct': 0, 'all_correct': 0} for field in EXTRACTION_FIELDS}
+        for sample in samples:
+            fields, confidence = parse_receipt_text(sample.get('raw_text', ''))
+            expected = sample.get('expected') or {}
+            is_accepted = confidence >= threshold
+            accepted += int(is_accepted)
+            for field in EXTRACTION_FIELDS:
+                correct = _same_field(field, expected.get(field), fields.get(field))
+                per_field[field]['all_correct'] += int(correct)
+                per_field[field]['accepted_correct'] += int(correct and is_accepted)
+
+        total = len(samples)
+        results = {
+            'samples': total,
+            'llm_calls_saved': accepted,
+            'saved_rate': accepted / total * 100 if total else 0.0,
+            'accuracy_accepted': {field: counts['accepted_correct'] / accepted * 100 if accepted else None
+                                  for field, counts in per_field.items()},
+            'accuracy_all': {field: counts['all_correct'] / total * 100 if total else None
+                             for field, counts in per_field.items()},
+        }
+        logger.info(f"Analyse heuristique: {accepted}/{total} appels évités, précision (acceptés): {results['accuracy_accepted']}")
+        return results
+
+    except Exception as e:
+        logger.error(f"Erreur lors du benchmark de l'analyse heuristique: {str(e)}", exc_info=True)
         return None
\ No newline at end of file
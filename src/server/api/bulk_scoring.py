@@ -0,0 +1,244 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from src.server.api.matching import MATCH_WEIGHTS, parse_invoice_date, _clean_invoice_field
+from src.server.api.statement_cache import load_statement
+from src.server.api.statement_index import MISSING_CENTS, amount_to_cents
+from src.server.api.vendor import normalize_vendor, vendor_similarity
+from src.server.config.settings import AMOUNT_TOLERANCE_CENTS, BULK_SCORING_MEMORY_BYTES
+
+logger = logging.getLogger(__name__)
+
+NAT_NS = np.iinfo(np.int64).min
+NANOSECONDS_PER_DAY = 86400 * 10**9
+
+# Approximate bytes held per (row, invoice) cell while a tile is scored: partial score, weight,
+# bound, final score, selection keys and masks
+BYTES_PER_CELL = 64
+
+INVOICE_DTYPE = np.dtype([
+    ('date_ns', np.int64),        # NAT_NS when missing
+    ('amount_cents', np.int64),   # MISSING_CENTS when missing
+    ('currency', object),         # upper-cased, stripped; None when missing
+    ('vendor_norm', object),      # normalized vendor; '' when missing
+])
+
+
+def build_invoice_array(invoices):
+    """
+    Converts extracted invoice dicts to the structured array consumed by the bulk kernel.
+    The invoice side is parsed and normalized once here, exactly as calculate_match_score does.
+    """
+    array = np.empty(len(invoices), dtype=INVOICE_DTYPE)
+    for i, invoice_data in enumerate(invoices):
+        invoice_data = invoice_data or {}
+        invoice_date = parse_invoice_date(invoice_data.get('date'))
+        array[i]['date_ns'] = pd.Timestamp(invoice_date).value if invoice_date is not None else NAT_NS
+
+        invoice_cents = amount_to_cents(invoice_data.get('amount'))
+        array[i]['amount_cents'] = invoice_cents if invoice_cents is not None else MISSING_CENTS
+
+        invoice_currency = _clean_invoice_field(invoice_data.get('currency'))
+        array[i]['currency'] = invoice_currency.upper().strip() if invoice_currency is not None else None
+
+        invoice_vendor = _clean_invoice_field(invoice_data.get('vendor'))
+        array[i]['vendor_norm'] = normalize_vendor(invoice_vendor) if invoice_vendor is not None else ''
+    return array
+
+
+class _StatementColumns:
+    """Statement columns encoded once for the kernel: int64 dates and cents, currency and vendor codes."""
+
+    def __init__(self, df):
+        self.size = len(df)
+
+        if 'date' in df.columns:
+            self.date_ns = df['date'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        else:
+            self.date_ns = np.full(self.size, NAT_NS, dtype=np.int64)
+        self.date_valid = self.date_ns != NAT_NS
+
+        if 'amount_cents' in df.columns:
+            self.amount_cents = df['amount_cents'].to_numpy()
+        else:
+            self.amount_cents = np.full(self.size, MISSING_CENTS, dtype=np.int64)
+        self.amount_valid = self.amount_cents != MISSING_CENTS
+
+        if 'currency' in df.columns:
+            csv_upper = df['currency'].astype(str).str.upper()
+            self.currency_valid = (df['currency'].notna() & (csv_upper != 'N/A')).to_numpy()
+            self.currency_codes, currencies = pd.factorize(csv_upper.str.strip())
+            self.currency_lookup = {currency: code for code, currency in enumerate(currencies)}
+        else:
+            self.currency_valid = np.zeros(self.size, dtype=bool)
+            self.currency_codes = np.full(self.size, -1)
+            self.currency_lookup = {}
+
+        if 'vendor_norm' in df.columns:
+            self.vendor_codes, self.vendors = pd.factorize(df['vendor_norm'])
+        else:
+            self.vendor_codes = np.full(self.size, -1)
+            self.vendors = []
+        self.vendor_valid = self.vendor_codes >= 0
+        self.vendor_valid[self.vendor_valid] = np.array([bool(self.vendors[code]) for code in self.vendor_codes[self.vendor_valid]])
+
+
+def _finalize(score, total_weight):
+    has_weight = total_weight > 0
+    final_scores = np.minimum(100.0, score / np.where(has_weight, total_weight, 1.0))
+    return np.where(has_weight, np.round(final_scores), 0).astype(np.int64)
+
+
+def _tile_shape(row_count, invoice_count, memory_budget_bytes):
+    cells = max(1, memory_budget_bytes // BYTES_PER_CELL)
+    invoice_tile = max(1, min(invoice_count, 512, cells))
+    row_tile = max(1, min(row_count, cells // invoice_tile))
+    return row_tile, invoice_tile
+
+
+def score_matrix_topk(statement, invoices, top_k=5, date_tolerance_days=1, memory_budget_bytes=BULK_SCORING_MEMORY_BYTES):
+    """
+    Scores every invoice against every statement row with the weights of calculate_match_score,
+    tile by tile, keeping only the top_k rows per invoice.
+
+    Tiles are sized so a tile never holds more than memory_budget_bytes of intermediate arrays.
+    Date, amount and currency sub-scores are computed as array broadcasts; the fuzzy vendor score
+    is only computed for cells whose best possible score can still enter the invoice's top_k.
+
+    Args:
+        statement (ParsedStatement): Cached statement
+        invoices (np.ndarray): Structured array built by build_invoice_array
+        top_k (int): Number of rows kept per invoice
+        date_tolerance_days (int): Same tolerance as calculate_match_score
+        memory_budget_bytes (int): Peak memory allowed for one tile
+
+    Returns:
+        list: For each invoice, a tuple (row ids, scores) sorted by score descending, then row order
+    """
+    columns = _StatementColumns(statement.df)
+    row_count, invoice_count = columns.size, len(invoices)
+    if row_count == 0 or invoice_count == 0:
+        return [(np.array([], dtype=np.int64), np.array([], dtype=np.int64)) for _ in range(invoice_count)]
+
+    # Invoice side, encoded against the statement codes
+    invoice_date_ns = invoices['date_ns']
+    invoice_date_valid = invoice_date_ns != NAT_NS
+    invoice_cents = invoices['amount_cents']
+    invoice_amount_valid = invoice_cents != MISSING_CENTS
+    invoice_currency_valid = np.array([currency is not None for currency in invoices['currency']], dtype=bool)
+    invoice_currency_codes = np.array([columns.currency_lookup.get(currency, -2) for currency in invoices['currency']])
+    invoice_vendor_codes, invoice_vendors = pd.factorize(invoices['vendor_norm'])
+    invoice_vendor_valid = np.array([bool(vendor) for vendor in invoices['vendor_norm']], dtype=bool)
+
+    tolerance_ns = date_tolerance_days * NANOSECONDS_PER_DAY
+    use_amount = 'amount' in MATCH_WEIGHTS
+    vendor_weight = MATCH_WEIGHTS['vendor']
+
+    # Top-K state; the selection key orders by score, then by row order (earlier rows first)
+    key_base = row_count + 1
+    best_keys = np.full((top_k, invoice_count), -1, dtype=np.int64)
+
+    row_tile, invoice_tile = _tile_shape(row_count, invoice_count, memory_budget_bytes)
+    logger.info(f"Bulk scoring {invoice_count} invoices x {row_count} rows in tiles of {row_tile} x {invoice_tile}")
+    vendor_pairs_scored = 0
+
+    for col_start in range(0, invoice_count, invoice_tile):
+        cols = slice(col_start, min(col_start + invoice_tile, invoice_count))
+        for row_start in range(0, row_count, row_tile):
+            rows = slice(row_start, min(row_start + row_tile, row_count))
+            row_ids = np.arange(rows.start, rows.stop)
+
+            score = np.zeros((rows.stop - rows.start, cols.stop - cols.start), dtype=np.float64)
+            total_weight = np.zeros_like(score)
+
+            # --- Date ---
+            valid = columns.date_valid[rows, None] & invoice_date_valid[None, cols]
+            within = np.abs(columns.date_ns[rows, None] - invoice_date_ns[None, cols]) <= tolerance_ns
+            score += np.where(valid, np.where(within, 100, 0) * MATCH_WEIGHTS['date'], 0.0)
+            total_weight += np.where(valid, MATCH_WEIGHTS['date'], 0.0)
+
+            # --- Amount (only when enabled in MATCH_WEIGHTS) ---
+            if use_amount:
+                valid = columns.amount_valid[rows, None] & invoice_amount_valid[None, cols]
+                matched = np.abs(columns.amount_cents[rows, None] - invoice_cents[None, cols]) <= AMOUNT_TOLERANCE_CENTS
+                score += np.where(valid, np.where(matched, 100, 0) * MATCH_WEIGHTS['amount'], 0.0)
+                total_weight += np.where(valid, MATCH_WEIGHTS['amount'], 0.0)
+
+            # --- Currency ---
+            valid = columns.currency_valid[rows, None] & invoice_currency_valid[None, cols]
+            same = columns.currency_codes[rows, None] == invoice_currency_codes[None, cols]
+            score += np.where(valid, np.where(same, 100, 0) * MATCH_WEIGHTS['currency'], 0.0)
+            total_weight += np.where(valid, MATCH_WEIGHTS['currency'], 0.0)
+
+            # --- Vendor: bound first, fuzzy score only where the cell can still enter the top-K ---
+            vendor_ok = columns.vendor_valid[rows, None] & invoice_vendor_valid[None, cols]
+            final_scores = _finalize(score, total_weight)
+            bound = np.where(vendor_ok, _finalize(score + 100 * vendor_weight, total_weight + vendor_weight), final_scores)
+            cutoff = best_keys[0, cols] // key_base  # current k-th best score (-1 while the top-K is not full)
+            needed = vendor_ok & (bound >= cutoff[None, :])
+
+            if needed.any():
+                needed_rows, needed_cols = np.nonzero(needed)
+                statement_codes = columns.vendor_codes[rows][needed_rows]
+                invoice_codes = invoice_vendor_codes[cols][needed_cols]
+                pairs, pair_ids = np.unique(statement_codes * len(invoice_vendors) + invoice_codes, return_inverse=True)
+                pair_scores = np.array([
+                    vendor_similarity(columns.vendors[pair // len(invoice_vendors)], invoice_vendors[pair % len(invoice_vendors)])
+                    for pair in pairs
+                ], dtype=np.float64)
+                vendor_pairs_scored += len(pairs)
+                vendor_scores = pair_scores[pair_ids.ravel()]
+                final_scores[needed_rows, needed_cols] = _finalize(
+                    score[needed_rows, needed_cols] + vendor_scores * vendor_weight,
+                    total_weight[needed_rows, needed_cols] + vendor_weight,
+                )
+
+            # Cells pruned by the bound cannot enter the top-K
+            keys = final_scores * key_base + (row_count - row_ids)[:, None]
+            keys[vendor_ok & ~needed] = -1
+
+            # Merge the tile into the running top-K
+            merged = np.concatenate([best_keys[:, cols], keys], axis=0)
+            if merged.shape[0] > top_k:
+                merged = np.partition(merged, merged.shape[0] - top_k, axis=0)[-top_k:]
+            best_keys[:, cols] = np.sort(merged, axis=0)[-top_k:]
+
+    logger.info(f"Bulk scoring computed {vendor_pairs_scored} vendor similarities")
+
+    results = []
+    for invoice_id in range(invoice_count):
+        keys = best_keys[::-1, invoice_id]
+        keys = keys[keys >= 0]
+        results.append((row_count - keys % key_base, keys // key_base))
+    return results
+
+
+def score_invoices_topk(file_path, invoices, top_k=5, memory_budget_bytes=BULK_SCORING_MEMORY_BYTES):
+    """
+    Bulk reconciliation entry point: top_k best statement rows for each invoice dict.
+
+    Returns:
+        list: For each invoice, the list of its top_k rows as match dicts, best first
+    """
+    logger.info(f"Bulk scoring {len(invoices)} invoices against: {file_path}")
+    try:
+        statement = load_statement(file_path)
+        invoice_array = build_invoice_array(invoices)
+        ranked = score_matrix_topk(statement, invoice_array, top_k=top_k, memory_budget_bytes=memory_budget_bytes)
+
+        df = statement.df
+        results = []
+        for row_ids, scores in ranked:
+            matches = df.iloc[row_ids][['date', 'amount', 'currency', 'vendor']].copy()
+            matches['date'] = matches['date'].dt.strftime('%Y-%m-%d')
+            if 'source' in df.columns:
+                matches['source'] = df['source'].iloc[row_ids].to_numpy()
+            matches['match_score'] = scores
+            results.append(matches.to_dict('records'))
+        return results
+
+    except Exception as e:
+        logger.error(f"Error in score_invoices_topk: {str(e)}", exc_info=True)
+        return [[] for _ in invoices]
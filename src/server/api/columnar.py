@@ -0,0 +1,191 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from src.server.config.paths import COLUMNAR_DIR
+
+logger = logging.getLogger(__name__)
+
+# Bump when clean_statement or the derived columns change, so old sidecars are rebuilt
+SIDECAR_VERSION = 1
+
+META_FILE = 'meta.json'
+
+
+def sidecar_dir(csv_path):
+    """Directory holding the columnar sidecar of a statement CSV."""
+    path = os.path.abspath(csv_path)
+    digest = hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(COLUMNAR_DIR, f"{digest}-{os.path.basename(path)}")
+
+
+def _signature(csv_path):
+    stat = os.stat(csv_path)
+    return {"source_mtime_ns": stat.st_mtime_ns, "source_size": stat.st_size}
+
+
+def _save_array(directory, name, array):
+    """Writes one .npy file atomically (temporary file + rename)."""
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        np.save(f, np.ascontiguousarray(array), allow_pickle=False)
+    os.replace(tmp_path, os.path.join(directory, f"{name}.npy"))
+
+
+def write_statement_sidecar(csv_path, df):
+    """
+    Writes a cleaned statement as a set of .npy files next to a meta.json.
+
+    Dates are stored as int64 nanoseconds, numeric columns as-is, and every other column as
+    categorical codes plus its categories. meta.json is written last and carries the source
+    file signature, so a reader never sees a half-written or stale sidecar as valid.
+
+    Args:
+        csv_path (str): Path to the source statement CSV
+        df (pd.DataFrame): The statement as returned by clean_statement
+    """
+    directory = sidecar_dir(csv_path)
+    os.makedirs(directory, exist_ok=True)
+
+    columns = []
+    for position, name in enumerate(df.columns):
+        series = df[name]
+        file_name = f"col{position}"
+        if pd.api.types.is_datetime64_dtype(series):
+            _save_array(directory, file_name, series.to_numpy(dtype='datetime64[ns]').view(np.int64))
+            kind = 'datetime'
+        elif pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+            _save_array(directory, file_name, series.to_numpy())
+            kind = 'numeric'
+        else:
+            codes, uniques = pd.factorize(series)
+            categorical = pd.Categorical.from_codes(codes, categories=pd.Index([str(value) for value in uniques]))
+            _save_array(directory, file_name, categorical.codes)
+            _save_array(directory, f"{file_name}.categories", np.array(categorical.categories, dtype=str))
+            kind = 'category'
+        columns.append({"name": name, "file": file_name, "kind": kind})
+
+    meta = {"version": SIDECAR_VERSION, "rows": len(df), "columns": columns, **_signature(csv_path)}
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(directory, META_FILE))
+    logger.info(f"Columnar sidecar written for {csv_path}: {directory}")
+
+
+def _read_meta(csv_path):
+    """Returns the sidecar metadata, or None when it is missing, from another format version, or stale."""
+    meta_path = os.path.join(sidecar_dir(csv_path), META_FILE)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    signature = _signature(csv_path)
+    if meta.get("version") != SIDECAR_VERSION or any(meta.get(key) != value for key, value in signature.items()):
+        logger.debug(f"Columnar sidecar is stale for {csv_path}")
+        return None
+    return meta
+
+
+def _map_columns(csv_path, meta, mmap_categories=False):
+    directory = sidecar_dir(csv_path)
+    for column in meta["columns"]:
+        array = np.load(os.path.join(directory, f"{column['file']}.npy"), mmap_mode='r')
+        categories = None
+        if column["kind"] == 'category':
+            categories = np.load(os.path.join(directory, f"{column['file']}.categories.npy"), mmap_mode='r' if mmap_categories else None)
+        yield column, array, categories
+
+
+def _mapped_categorical(codes, categories):
+    """
+    Categorical over memory-mapped codes, without copying them: the codes are stored with the
+    dtype from_codes would use, and they were validated when the sidecar was written.
+    """
+    dtype = pd.CategoricalDtype(pd.Index(categories.astype(object)))
+    try:
+        return pd.Categorical.from_codes(codes, dtype=dtype, validate=False)
+    except TypeError:
+        # pandas < 2.1 has no validate argument: the codes are still not copied, but scanned once
+        return pd.Categorical.from_codes(codes, dtype=dtype)
+
+
+def has_statement_sidecar(csv_path):
+    """True when the statement has a sidecar that is up to date with the CSV file."""
+    return _read_meta(csv_path) is not None
+
+
+def load_statement_sidecar(csv_path):
+    """
+    Loads a statement from its columnar sidecar with memory-mapped arrays.
+
+    Numeric and date columns are views on the mapped files, so every session working on the
+    same statement shares the same OS page-cache pages. Text columns are categoricals whose
+    codes are mapped as well; only the distinct values are held in memory.
+
+    Returns:
+        pd.DataFrame or None: None when the sidecar is missing, from another format version,
+            or older than the CSV file
+    """
+    meta = _read_meta(csv_path)
+    if meta is None:
+        return None
+
+    data = {}
+    for column, array, categories in _map_columns(csv_path, meta):
+        if column["kind"] == 'datetime':
+            data[column["name"]] = pd.Series(array.view('datetime64[ns]'), copy=False)
+        elif column["kind"] == 'numeric':
+            data[column["name"]] = pd.Series(array, copy=False)
+        else:
+            data[column["name"]] = _mapped_categorical(array, categories)
+    return pd.DataFrame(data, copy=False)
+
+
+def iter_sidecar_chunks(csv_path, chunksize):
+    """
+    Iterates over a statement sidecar in chunks of rows, mapping the categories as well, so
+    only the pages touched by the current chunk are read whatever the size of the statement.
+
+    Returns:
+        generator or None: yields (first row id, pd.DataFrame) tuples; None when the sidecar is not usable
+    """
+    meta = _read_meta(csv_path)
+    if meta is None:
+        return None
+    mapped = list(_map_columns(csv_path, meta, mmap_categories=True))
+
+    def chunks():
+        for start in range(0, meta["rows"], chunksize):
+            stop = min(start + chunksize, meta["rows"])
+            data = {}
+            for column, array, categories in mapped:
+                values = array[start:stop]
+                if column["kind"] == 'datetime':
+                    data[column["name"]] = values.view('datetime64[ns]')
+                elif column["kind"] == 'numeric':
+                    data[column["name"]] = values
+                else:
+                    decoded = categories[np.maximum(values, 0)].astype(object)
+                    decoded[values < 0] = np.nan
+                    data[column["name"]] = decoded
+            yield start, pd.DataFrame(data)
+
+    return chunks()
+
+
+def delete_statement_sidecar(csv_path):
+    """Removes the sidecar files of a statement, if any."""
+    directory = sidecar_dir(csv_path)
+    if not os.path.isdir(directory):
+        return
+    for file_name in os.listdir(directory):
+        os.remove(os.path.join(directory, file_name))
+    os.rmdir(directory)
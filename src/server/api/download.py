@@ -1,6 +1,9 @@
 import streamlit as st
 import pandas as pd
 import io
+import csv
+
+from src.server.api.result_store import ResultStore
 
 # Function to convert DataFrame to CSV string
 def convert_df_to_csv(df):
@@ -10,6 +13,14 @@ def convert_df_to_csv(df):
     csv_buffer.seek(0)  # Go to the beginning of the buffer
     return csv_buffer.getvalue()
 
+# A ResultStore is written row by row, without building a DataFrame first
+def convert_store_to_csv(store):
+    csv_buffer = io.StringIO()
+    writer = csv.DictWriter(csv_buffer, fieldnames=store.columns, lineterminator='\n')
+    writer.writeheader()
+    writer.writerows(store.rows())
+    return csv_buffer.getvalue()
+
 # You can also offer download as an Excel file:
 def convert_df_to_excel(df):
     excel_buffer = io.BytesIO()
@@ -21,8 +32,8 @@ def convert_df_to_excel(df):
 def download_file(df, type='csv'):
     converted_data = None
     if type == 'csv':
-        converted_data = convert_df_to_csv(df)
+        converted_data = convert_store_to_csv(df) if isinstance(df, ResultStore) else convert_df_to_csv(df)
     else:
-        converted_data = convert_df_to_excel(df)
+        converted_data = convert_df_to_excel(df.to_dataframe() if isinstance(df, ResultStore) else df)
         
     return converted_data
\ No newline at end of file
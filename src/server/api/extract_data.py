@@ -1,10 +1,14 @@
 import json
 import logging
 import base64
+import copy
+import hashlib
 import os
 import requests
+import threading
 import time
-from typing import Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Iterator, Tuple
 import os
 from dotenv import load_dotenv
 import pandas as pd
@@ -16,8 +20,23 @@ from src.server.config.settings import (
     MAX_RETRIES,
     REQUEST_TIMEOUT,
     MAX_TOKENS,
-    TEMPERATURE
+    TEMPERATURE,
+    EXTRACTION_CONCURRENCY,
+    EXTRACTION_MODE,
+    IMAGE_PREPROCESSING,
+    HEURISTIC_PARSER,
+    HEURISTIC_CONFIDENCE_THRESHOLD,
+    PHASH_DEDUP
 )
+from src.server.api.extraction_cache import extraction_cache, extraction_key
+from src.server.api.rate_limit import mistral_rate_limiter
+from src.server.api.http_transport import HTTPTransport, TRANSPORT_ERRORS
+from src.server.api.retry_policy import RetryPolicy, CircuitBreaker, SERVER_ERROR_STATUSES, hedged_call
+from src.server.api.image_preprocessing import prepare_image_payload, preprocessing_signature
+from src.server.api.receipt_parser import parse_receipt_text, heuristic_parser_stats, PARSER_VERSION
+from src.server.api.single_flight import SingleFlight
+from src.server.api.perceptual_hash import dhash, perceptual_index
+from src.server.api.extraction_backends import ExtractionBackend, register_backend, get_backend
 
 logger = logging.getLogger('ExtractData')
 """
@@ -35,7 +54,8 @@ TEMPERATURE = float(os.getenv("TEMPERATURE", 0.7))  # Valeur par défaut 0.7
 logger = logging.getLogger('ExtractData')
 """
 class MistralClient:
-    def __init__(self, api_key: str = MISTRAL_API_KEY):
+    def __init__(self, api_key: str = MISTRAL_API_KEY, transport: HTTPTransport = None,
+                 retry_policy: RetryPolicy = None, circuit_breaker: CircuitBreaker = None):
         self.api_key = api_key
         self.base_url = MISTRAL_API_BASE_URL
         self.headers = {
@@ -43,159 +63,489 @@ class MistralClient:
             "Content-Type": "application/json",
             "Accept": "application/json"
         }
+        # Pooled keep-alive connections, shared by all the threads using this client
+        self.transport = transport or HTTPTransport()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self._stats_lock = threading.Lock()
+        self.retries = 0
+        self.hedges = 0
 
-    def _make_request_with_retry(self, messages: List[Dict[str, Any]], max_attempts=3):
-        """Make API request with retry logic."""
+    def _post(self, payload: Dict[str, Any]):
+        """One HTTP attempt, hedged when the retry policy sets a hedge delay."""
+        def call():
+            # Quota partagé par tous les appels en cours
+            mistral_rate_limiter.acquire()
+            return self.transport.post(
+                f"{self.base_url}/chat/completions",
+                headers=self.headers,
+                json=payload
+            )
+
+        if self.retry_policy.hedge_delay <= 0:
+            return call()
+        response, hedges = hedged_call(call, self.retry_policy.hedge_delay)
+        if hedges:
+            with self._stats_lock:
+                self.hedges += hedges
+        return response
+
+    def _make_request_with_retry(self, messages: List[Dict[str, Any]], max_attempts: int = None, response_format: Dict[str, Any] = None):
+        """
+        Make API request with retry logic.
+
+        Retries transport errors, 429 and 5xx answers up to max_attempts (MAX_RETRIES by default)
+        with the delays of self.retry_policy (Retry-After first, decorrelated jitter otherwise),
+        within its deadline budget. The circuit breaker rejects the call at once while the API
+        is down.
+        """
+        policy = self.retry_policy
+        max_attempts = max_attempts or policy.max_attempts
+        deadline = policy.deadline(time.monotonic())
+        delay = policy.base_delay
         attempt = 0
+        payload = {
+            "model": MISTRAL_MODEL,
+            "messages": messages,
+            "temperature": TEMPERATURE,
+            "max_tokens": MAX_TOKENS
+        }
+        if response_format is not None:
+            payload["response_format"] = response_format
         
-        while attempt < max_attempts:
+        while True:
+            attempt += 1
+            self.circuit_breaker.before_call()
+            logging.info(f"Tentative {attempt}/{max_attempts} d'appel à l'API Mistral")
+            retry_after = None
+
             try:
-                attempt += 1
-                logging.info(f"Tentative {attempt}/{max_attempts} d'appel à l'API Mistral")
-                
-                response = requests.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=self.headers,
-                    json={
-                        "model": MISTRAL_MODEL,
-                        "messages": messages,
-                        "temperature": TEMPERATURE,
-                        "max_tokens": MAX_TOKENS
-                    },
-                    timeout=REQUEST_TIMEOUT
-                )
-                
+                response = self._post(payload)
+            except TRANSPORT_ERRORS as e:
+                logging.error(f"Erreur de connexion à l'API (tentative {attempt}): {e}")
+                self.circuit_breaker.record_failure()
+                error = e
+            else:
                 if response.status_code == 200:
+                    self.circuit_breaker.record_success()
                     logging.info("Réponse reçue de l'API Mistral")
                     logging.info(f"Réponse: {response.text}")
                     return response.json()
+
+                logging.error(f"Erreur lors de l'appel à l'API (tentative {attempt}): Status: {response.status_code}. Message: {response.text}")
+                error = Exception(f"Status: {response.status_code}. Message: {response.text}")
+                if response.status_code in SERVER_ERROR_STATUSES:
+                    self.circuit_breaker.record_failure()
                 else:
-                    logging.error(f"Erreur API: {response.status_code} - {response.text}")
-                    
-                    # Traiter spécifiquement les erreurs de rate limit
-                    if response.status_code == 429:
-                        wait_time = 5 * (2 ** attempt)  # Attente exponentielle: 5, 10, 20 secondes
-                        logging.error(f"Erreur lors de l'appel à l'API (tentative {attempt}): Status: {response.status_code}. Message: {response.text}")
-                        
-                        if attempt < max_attempts:
-                            logging.info(f"Attente de {wait_time} secondes avant la prochaine tentative")
-                            time.sleep(wait_time)
-                        else:
-                            logging.error("Nombre maximum de tentatives atteint")
-                            raise Exception(f"Status: {response.status_code}. Message: {response.text}")
-                    else:
-                        logging.error(f"Erreur lors de l'appel à l'API: Status: {response.status_code}. Message: {response.text}")
-                        raise Exception(f"Status: {response.status_code}. Message: {response.text}")
-            
-            except requests.exceptions.RequestException as e:
-                logging.error(f"Erreur de connexion à l'API (tentative {attempt}): {e}")
-                
-                if attempt < max_attempts:
-                    wait_time = 2 ** attempt
-                    logging.info(f"Attente de {wait_time} secondes avant la prochaine tentative")
-                    time.sleep(wait_time)
-                else:
-                    logging.error("Nombre maximum de tentatives atteint")
-                    raise e
-        
-        raise Exception("Nombre maximum de tentatives atteint sans succès")
+                    # L'API répond : un 4xx (y compris 429) ne signale pas une panne
+                    self.circuit_breaker.record_success()
+                if not policy.is_retryable(response.status_code):
+                    raise error
+                retry_after = policy.retry_after(response)
+
+            if attempt >= max_attempts:
+                logging.error("Nombre maximum de tentatives atteint")
+                raise error
+
+            delay = retry_after if retry_after is not None else policy.next_delay(delay)
+            if deadline is not None and time.monotonic() + delay > deadline:
+                logging.error(f"Budget de temps épuisé, abandon après {attempt} tentatives")
+                raise error
+
+            with self._stats_lock:
+                self.retries += 1
+            logging.info(f"Attente de {delay:.1f} secondes avant la prochaine tentative")
+            time.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """Retries, hedged requests and circuit breaker state of this client."""
+        with self._stats_lock:
+            counters = {"retries": self.retries, "hedges": self.hedges}
+        return {**counters, "circuit_breaker": self.circuit_breaker.stats()}
 
-    def send_message(self, messages: List[Dict[str, Any]]) -> str:
+    def send_message(self, messages: List[Dict[str, Any]], response_format: Dict[str, Any] = None) -> str:
         """
         Envoie un message à l'API et retourne la réponse
+        (response_format, ex. {"type": "json_object"}, force le format de la réponse)
         """
-        response = self._make_request_with_retry(messages)
+        response = self._make_request_with_retry(messages, response_format=response_format)
         return response['choices'][0]['message']['content']
 
-def load_prompt() -> str:
+_mistral_client = None
+_mistral_client_lock = threading.Lock()
+# Connections of the shared client's pool: at least the number of extraction workers in use
+_mistral_pool_size = EXTRACTION_CONCURRENCY
+
+def get_mistral_client() -> MistralClient:
+    """Process-wide MistralClient, so every extraction reuses the same connection pool."""
+    global _mistral_client
+    with _mistral_client_lock:
+        if _mistral_client is None:
+            # Seul le backend 'mistral' a besoin de la clé : elle est vérifiée ici et non à l'import
+            if not MISTRAL_API_KEY:
+                raise ValueError("MISTRAL_API_KEY n'est pas définie dans le fichier .env")
+            _mistral_client = MistralClient(api_key=MISTRAL_API_KEY, transport=HTTPTransport(pool_size=_mistral_pool_size))
+        return _mistral_client
+
+def reserve_mistral_connections(workers: int):
+    """
+    Sizes the connection pool of the shared client for workers concurrent extractions, whether
+    the client already exists or not (it is only created, and the key checked, on the first call).
+    """
+    global _mistral_pool_size
+    with _mistral_client_lock:
+        _mistral_pool_size = max(_mistral_pool_size, workers)
+        if _mistral_client is not None:
+            _mistral_client.transport.reserve(workers)
+
+TEXT_PROMPT = """Extract all text from this invoice image. Return only the raw text, without any formatting or analysis."""
+
+PROMPT_FILE = 'invoice_extraction.txt'
+SINGLE_CALL_PROMPT_FILE = 'invoice_extraction_single.txt'
+
+# Fields a single-call answer must contain to be used without falling back to two_step
+INVOICE_FIELDS = {'date', 'amount', 'currency', 'vendor'}
+
+def load_prompt(file_name: str = PROMPT_FILE) -> str:
     """Load the invoice extraction prompt from file."""
-    prompt_path = os.path.join('./src/server/prompts', 'invoice_extraction.txt')
+    prompt_path = os.path.join('./src/server/prompts', file_name)
     with open(prompt_path, 'r', encoding='utf-8') as f:
         return f.read()
 
-def get_extracted_data(image_path: str) -> Dict[str, Any]:
-    """Extract data from an image using Mistral Vision API."""
-    try:
-        # Initialize Mistral client
-        mistral_client = MistralClient(api_key=MISTRAL_API_KEY)
-        
-        # Read and encode the image
-        with open(image_path, 'rb') as image_file:
-            image_content = image_file.read()
-            image_base64 = base64.b64encode(image_content).decode('utf-8')
-
-        # First, get the raw text from the image
-        text_prompt = """Extract all text from this invoice image. Return only the raw text, without any formatting or analysis."""
-
-        text_messages = [
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": text_prompt
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{image_base64}"
-                        }
-                    }
-                ]
-            }
-        ]
+def get_prompt_version(mode: str = EXTRACTION_MODE) -> str:
+    """Short hash of the mode and its prompts, so editing a prompt invalidates the cached extractions."""
+    digest = hashlib.sha256(mode.encode('utf-8'))
+    digest.update(TEXT_PROMPT.encode('utf-8'))
+    digest.update(load_prompt().encode('utf-8'))
+    if mode == 'single_call':
+        digest.update(load_prompt(SINGLE_CALL_PROMPT_FILE).encode('utf-8'))
+    if HEURISTIC_PARSER:
+        digest.update(f"heuristic={PARSER_VERSION}@{HEURISTIC_CONFIDENCE_THRESHOLD}".encode('utf-8'))
+    return digest.hexdigest()[:16]
 
-        logger.info(f"Extracting text from: {image_path}")
-        raw_text = mistral_client.send_message(text_messages)
-        
-        if not raw_text:
-            logger.warning(f"Mistral returned empty text for {image_path}")
-            return {"success": False, "error": "Pixtral returned no text", "data": None}
+class ExtractionModeStats:
+    """Latency and success rate of each extraction mode, to choose EXTRACTION_MODE from data."""
 
-        logger.debug(f"\n🔹 Raw extracted text:\n{raw_text}")
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._modes = {}
+        self.fallbacks = 0
 
-        # Now, analyze the text using the invoice extraction prompt
-        analysis_prompt = load_prompt().format(invoice_text=raw_text)
-        
-        analysis_messages = [
-            {
-                "role": "user",
-                "content": analysis_prompt
-            }
-        ]
+    def record(self, mode: str, elapsed: float, success: bool):
+        with self._lock:
+            stats = self._modes.setdefault(mode, {"calls": 0, "successes": 0, "total_seconds": 0.0})
+            stats["calls"] += 1
+            stats["successes"] += int(success)
+            stats["total_seconds"] += elapsed
 
-        logger.info("Analyzing extracted text...")
-        analysis_result = mistral_client.send_message(analysis_messages)
-        
-        try:
-            # Clean up the response to ensure it's valid JSON
-            analysis_result = analysis_result.strip()
-            if analysis_result.startswith('```json'):
-                analysis_result = analysis_result[7:]
-            if analysis_result.endswith('```'):
-                analysis_result = analysis_result[:-3]
-            analysis_result = analysis_result.strip()
-            
-            extracted_data = json.loads(analysis_result)
-            logger.info("\n🔹 Extracted Information:")
-            logger.info(json.dumps(extracted_data, indent=2))
+    def record_fallback(self):
+        with self._lock:
+            self.fallbacks += 1
 
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            report = {"fallbacks": self.fallbacks}
+            for mode, stats in self._modes.items():
+                report[mode] = {
+                    **stats,
+                    "success_rate": stats["successes"] / stats["calls"] if stats["calls"] else 0.0,
+                    "mean_seconds": stats["total_seconds"] / stats["calls"] if stats["calls"] else 0.0,
+                }
+            return report
+
+extraction_mode_stats = ExtractionModeStats()
+
+def parse_json_response(response_text: str) -> Any:
+    """Parse a JSON answer, stripping the ```json fences the model sometimes adds."""
+    # Clean up the response to ensure it's valid JSON
+    response_text = response_text.strip()
+    if response_text.startswith('```json'):
+        response_text = response_text[7:]
+    if response_text.endswith('```'):
+        response_text = response_text[:-3]
+    return json.loads(response_text.strip())
+
+def image_message(prompt: str, image_url: str) -> List[Dict[str, Any]]:
+    """Single user message made of a text prompt and an image."""
+    return [
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": prompt
+                },
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": image_url
+                    }
+                }
+            ]
+        }
+    ]
+
+def _extract_two_step(mistral_client: MistralClient, image_url: str, image_path: str) -> Dict[str, Any]:
+    """
+    OCR call on the image, then an analysis call turning the raw text into JSON. The analysis
+    call is skipped when the heuristic parser reads the raw text with enough confidence.
+    """
+    # First, get the raw text from the image
+    logger.info(f"Extracting text from: {image_path}")
+    raw_text = mistral_client.send_message(image_message(TEXT_PROMPT, image_url))
+    
+    if not raw_text:
+        logger.warning(f"Mistral returned empty text for {image_path}")
+        return {"success": False, "error": "Pixtral returned no text", "data": None}
+
+    logger.debug(f"\n🔹 Raw extracted text:\n{raw_text}")
+
+    # Easy receipts (clear date, TOTAL line, currency) do not need the LLM analysis
+    if HEURISTIC_PARSER:
+        fields, confidence = parse_receipt_text(raw_text)
+        accepted = confidence >= HEURISTIC_CONFIDENCE_THRESHOLD
+        heuristic_parser_stats.record(accepted)
+        if accepted:
+            logger.info(f"Heuristic parser confidence {confidence:.2f}, skipping the analysis call")
             return {
                 "success": True,
                 "data": {
-                    "json": extracted_data,
+                    "json": fields,
                     "raw_text": raw_text
                 }
             }
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON response: {e}")
-            return {"success": False, "error": "Failed to parse extracted data", "data": None}
+        logger.debug(f"Heuristic parser confidence {confidence:.2f}, below {HEURISTIC_CONFIDENCE_THRESHOLD}")
+
+    # Now, analyze the text using the invoice extraction prompt
+    analysis_prompt = load_prompt().format(invoice_text=raw_text)
+    
+    analysis_messages = [
+        {
+            "role": "user",
+            "content": analysis_prompt
+        }
+    ]
+
+    logger.info("Analyzing extracted text...")
+    analysis_result = mistral_client.send_message(analysis_messages)
+    
+    try:
+        extracted_data = parse_json_response(analysis_result)
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to parse JSON response: {e}")
+        return {"success": False, "error": "Failed to parse extracted data", "data": None}
+
+    return {
+        "success": True,
+        "data": {
+            "json": extracted_data,
+            "raw_text": raw_text
+        }
+    }
+
+def _extract_single_call(mistral_client: MistralClient, image_url: str, image_path: str) -> Dict[str, Any]:
+    """
+    One vision call returning the invoice fields and the raw text as a JSON object.
+
+    Returns:
+        dict or None: {"json", "raw_text"}, or None when the answer is not a usable JSON object
+    """
+    logger.info(f"Extracting invoice data in a single call from: {image_path}")
+    response = mistral_client.send_message(
+        image_message(load_prompt(SINGLE_CALL_PROMPT_FILE), image_url),
+        response_format={"type": "json_object"}
+    )
+    try:
+        extracted_data = parse_json_response(response or '')
+    except json.JSONDecodeError as e:
+        logger.warning(f"Single-call extraction returned invalid JSON for {image_path}: {e}")
+        return None
+    if not isinstance(extracted_data, dict) or not INVOICE_FIELDS.issubset(extracted_data):
+        logger.warning(f"Single-call extraction returned incomplete data for {image_path}")
+        return None
+
+    raw_text = extracted_data.pop('raw_text', None) or ''
+    return {
+        "json": extracted_data,
+        "raw_text": raw_text
+    }
+
+@register_backend
+class MistralBackend(ExtractionBackend):
+    """Pixtral vision model through the Mistral HTTP API (two_step or single_call mode)."""
+
+    name = 'mistral'
+
+    def available(self) -> bool:
+        return bool(MISTRAL_API_KEY)
+
+    def version(self, mode: str, preprocess: bool) -> str:
+        return f"{MISTRAL_MODEL}:{get_prompt_version(mode)}:{preprocessing_signature(preprocess)}"
+
+    def extract(self, image_path: str, image_content: bytes, mode: str, preprocess: bool) -> Dict[str, Any]:
+        # Shared Mistral client (keep-alive connection pool)
+        mistral_client = get_mistral_client()
+        payload, mime_type = prepare_image_payload(image_content, image_path, preprocess)
+        image_base64 = base64.b64encode(payload).decode('utf-8')
+        image_url = f"data:{mime_type};base64,{image_base64}"
+
+        if mode == 'single_call':
+            started = time.perf_counter()
+            data = None
+            try:
+                data = _extract_single_call(mistral_client, image_url, image_path)
+            except Exception as e:
+                logger.warning(f"Single-call extraction failed for {image_path}: {e}")
+            extraction_mode_stats.record('single_call', time.perf_counter() - started, data is not None)
+            if data is not None:
+                return {"success": True, "data": data}
+            logger.info(f"Falling back to two-step extraction for {image_path}")
+            extraction_mode_stats.record_fallback()
+
+        started = time.perf_counter()
+        result = {"success": False, "error": "Two-step extraction failed", "data": None}
+        try:
+            result = _extract_two_step(mistral_client, image_url, image_path)
+        finally:
+            extraction_mode_stats.record('two_step', time.perf_counter() - started, result["success"])
+        return result
+
+# Concurrent extractions of identical content (same cache key) share one set of API calls
+extraction_flight = SingleFlight()
+
+def _extract_image(image_path: str, image_content: bytes, cache_key: str, version: str, backend: ExtractionBackend,
+                   mode: str, preprocess: bool, use_cache: bool) -> Dict[str, Any]:
+    """
+    Cache lookup (exact content), then extraction by the backend and cache write. A near-duplicate
+    of an earlier image is extracted anyway and returned with a possible_duplicate flag.
+    """
+    cached = extraction_cache.get(cache_key) if use_cache else None
+    if cached is not None:
+        logger.info(f"Extraction cache hit for: {image_path}")
+        return {"success": True, "data": cached}
+
+    # A near match (re-scan, or another receipt of the same shop) is only flagged: byte-identical
+    # images already hit the cache above
+    image_hash = None
+    possible_duplicate = None
+    if use_cache and PHASH_DEDUP:
+        try:
+            image_hash = dhash(image_content)
+        except Exception as e:
+            logger.warning(f"Could not compute the perceptual hash of {image_path}: {e}")
+        if image_hash is not None:
+            near_duplicate = perceptual_index.find(image_hash)
+            if near_duplicate is not None:
+                logger.warning(f"{image_path} may be a duplicate of {near_duplicate['image']} "
+                               f"(distance {near_duplicate['distance']}), extracting it anyway")
+                possible_duplicate = {'duplicate_of': near_duplicate['image'], 'distance': near_duplicate['distance']}
+
+    result = backend.extract(image_path, image_content, mode, preprocess)
+    if not result["success"]:
+        return result
+    data = result["data"]
+
+    logger.info("\n🔹 Extracted Information:")
+    logger.info(json.dumps(data["json"], indent=2))
+
+    if use_cache:
+        try:
+            extraction_cache.put(cache_key, data, model=backend.name)
+            if image_hash is not None:
+                perceptual_index.add(image_hash, os.path.basename(image_path), cache_key, version)
+        except Exception as e:
+            logger.error(f"Could not cache the extraction of {image_path}: {e}", exc_info=True)
+
+    result = {
+        "success": True,
+        "data": data
+    }
+    if possible_duplicate is not None:
+        result["possible_duplicate"] = possible_duplicate
+    return result
+
+def get_extracted_data(image_path: str, mode: str = EXTRACTION_MODE, preprocess: bool = IMAGE_PREPROCESSING,
+                       use_cache: bool = True, backend: str = None, image_content: bytes = None) -> Dict[str, Any]:
+    """
+    Extract data from an image with the configured extraction backend (Mistral Vision API by default).
+
+    Results are cached on disk by image content, model and prompt version, so an image
+    already extracted (in any session) does not call the API again. Requests for the same
+    content arriving while its extraction is still running wait for it and share its result.
+
+    Args:
+        image_path: Path to the invoice image
+        mode: 'two_step' (OCR call, then analysis call) or 'single_call' (one vision call with a
+            JSON response format, falling back to two_step when its answer cannot be used)
+        preprocess: Rotate, downscale and recompress the image before sending it (see preprocess_image)
+        use_cache: Read and write the extraction cache, and coalesce identical requests
+            (disabled by benchmarks to time the API)
+        backend: Name of a registered extraction backend ('mistral', 'tesseract'; EXTRACTION_BACKEND by default)
+        image_content: Image bytes when already read (by the pipeline load stage), otherwise read from image_path
+    """
+    try:
+        # Read the image
+        if image_content is None:
+            with open(image_path, 'rb') as image_file:
+                image_content = image_file.read()
+
+        extraction_backend = get_backend(backend)
+        version = f"{extraction_backend.name}:{extraction_backend.version(mode, preprocess)}"
+        cache_key = extraction_key(image_content, extraction_backend.name, version)
+        if not use_cache:
+            return _extract_image(image_path, image_content, cache_key, version, extraction_backend, mode, preprocess, use_cache)
+
+        result, shared = extraction_flight.do(
+            cache_key,
+            lambda: _extract_image(image_path, image_content, cache_key, version, extraction_backend, mode, preprocess, use_cache)
+        )
+        if shared:
+            logger.info(f"Shared the in-flight extraction of identical content for: {image_path}")
+            return copy.deepcopy(result)
+        return result
         
     except Exception as e:
         logger.error(f"Error during Pixtral extraction for {image_path}: {e}", exc_info=True)
         return {"success": False, "error": str(e), "data": None}
 
+def extract_batch(image_paths: List[str], max_workers: int = EXTRACTION_CONCURRENCY,
+                  backend: str = None, use_cache: bool = True) -> Iterator[Tuple[int, str, Dict[str, Any]]]:
+    """
+    Extract data from several images concurrently.
+
+    At most max_workers extractions are in flight at once, and every API call goes through
+    the shared rate limiter, so the batch stays within the Mistral quota. Results are yielded
+    as soon as each extraction finishes, in completion order.
+
+    Args:
+        image_paths: Invoice image paths
+        max_workers: Maximum number of extractions in flight
+        backend: Extraction backend name (EXTRACTION_BACKEND by default)
+        use_cache: Read and write the extraction cache
+
+    Yields:
+        tuple: (index of the image in image_paths, image path, get_extracted_data result)
+    """
+    if not image_paths:
+        return
+    max_workers = max(1, min(max_workers, len(image_paths)))
+    logger.info(f"Extracting {len(image_paths)} images with {max_workers} concurrent workers")
+    reserve_mistral_connections(max_workers)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='extract') as executor:
+        futures = {
+            executor.submit(get_extracted_data, image_path, use_cache=use_cache, backend=backend): (index, image_path)
+            for index, image_path in enumerate(image_paths)
+        }
+        for future in as_completed(futures):
+            index, image_path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Error during extraction for {image_path}: {e}", exc_info=True)
+                result = {"success": False, "error": str(e), "data": None}
+            yield index, image_path, result
+
 # Définir le chemin de base
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -0,0 +1,118 @@
+import io
+import shutil
+import logging
+import threading
+
+from PIL import Image, ImageOps
+
+from src.server.api.receipt_parser import parse_receipt_text, PARSER_VERSION
+from src.server.config.settings import EXTRACTION_BACKEND, TESSERACT_CMD, TESSERACT_LANG
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pytesseract  # optional, only needed by the 'tesseract' backend (plus the tesseract binary)
+except ImportError:
+    pytesseract = None
+
+
+class ExtractionBackend:
+    """
+    Turns an invoice image into {"json": {date, amount, currency, vendor}, "raw_text": ...}.
+
+    Backends only do the extraction itself: caching, in-flight coalescing and near-duplicate
+    flagging are applied around them by get_extracted_data, whatever the backend.
+    """
+
+    name = None
+
+    def available(self):
+        """Whether the backend can run here (credentials, binaries, optional packages)."""
+        return True
+
+    def version(self, mode, preprocess):
+        """Everything that changes the output for the same image, part of the extraction cache key."""
+        raise NotImplementedError
+
+    def extract(self, image_path, image_content, mode, preprocess):
+        """
+        Returns:
+            dict: {"success": True, "data": {"json", "raw_text"}} or {"success": False, "error", "data": None}
+        """
+        raise NotImplementedError
+
+
+_BACKEND_CLASSES = {}
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def register_backend(backend_class):
+    """Class decorator adding a backend to the registry under its name."""
+    _BACKEND_CLASSES[backend_class.name] = backend_class
+    return backend_class
+
+
+def get_backend(name=None):
+    """Shared instance of the backend selected by name (EXTRACTION_BACKEND by default)."""
+    name = name or EXTRACTION_BACKEND
+    with _backends_lock:
+        if name not in _backends:
+            if name not in _BACKEND_CLASSES:
+                raise ValueError(f"Unknown extraction backend '{name}', available: {sorted(_BACKEND_CLASSES)}")
+            _backends[name] = _BACKEND_CLASSES[name]()
+        return _backends[name]
+
+
+def list_backends():
+    """Registered backends and whether each one can run here."""
+    return {name: get_backend(name).available() for name in sorted(_BACKEND_CLASSES)}
+
+
+@register_backend
+class TesseractBackend(ExtractionBackend):
+    """
+    Local CPU OCR with Tesseract, for air-gapped deployments and cheap first passes on bulk jobs.
+
+    The OCR text goes through the same deterministic parser as the fast path of the Mistral
+    two-step extraction (parse_receipt_text), so both backends return the same JSON fields.
+    """
+
+    name = 'tesseract'
+
+    def __init__(self):
+        self._version = None
+        if pytesseract is not None:
+            pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+
+    def available(self):
+        return pytesseract is not None and shutil.which(TESSERACT_CMD) is not None
+
+    def version(self, mode, preprocess):
+        if self._version is None:
+            engine = pytesseract.get_tesseract_version() if self.available() else 'missing'
+            self._version = f"tesseract-{engine}:{TESSERACT_LANG}:parser={PARSER_VERSION}"
+        return self._version
+
+    def extract(self, image_path, image_content, mode, preprocess):
+        if not self.available():
+            return {"success": False, "error": "Tesseract backend unavailable (install pytesseract and tesseract)", "data": None}
+
+        with Image.open(io.BytesIO(image_content)) as image:
+            image = ImageOps.exif_transpose(image).convert('L')
+            logger.info(f"Running local OCR on: {image_path}")
+            raw_text = pytesseract.image_to_string(image, lang=TESSERACT_LANG)
+
+        if not raw_text.strip():
+            logger.warning(f"Tesseract returned empty text for {image_path}")
+            return {"success": False, "error": "Tesseract returned no text", "data": None}
+
+        fields, confidence = parse_receipt_text(raw_text)
+        logger.info(f"Local OCR parsed {image_path} with confidence {confidence:.2f}")
+        return {
+            "success": True,
+            "data": {
+                "json": fields,
+                "raw_text": raw_text
+            }
+        }
@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+
+from src.server.config.paths import EXTRACTION_CACHE_DIR
+from src.server.config.settings import EXTRACTION_CACHE_MAX_BYTES, EXTRACTION_CACHE_MAX_AGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of a cache entry changes
+ENTRY_VERSION = 1
+
+
+def extraction_key(image_bytes, model, prompt_version):
+    """SHA-256 of the image bytes, the model name and the prompt version."""
+    digest = hashlib.sha256(image_bytes)
+    digest.update(b'\0' + str(model).encode('utf-8'))
+    digest.update(b'\0' + str(prompt_version).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Persistent, content-addressed cache of invoice extractions.
+
+    Each entry is a small JSON file holding the raw text and the parsed JSON of one image,
+    stored under its key (see extraction_key), so a receipt already seen by any session is
+    never sent to the API again. Writes go through a temporary file and a rename; entries
+    older than max_age_seconds are dropped on read, and the least recently used entries are
+    removed once the directory grows past max_bytes.
+    """
+
+    def __init__(self, directory=EXTRACTION_CACHE_DIR, max_bytes=EXTRACTION_CACHE_MAX_BYTES,
+                 max_age_seconds=EXTRACTION_CACHE_MAX_AGE_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._total_bytes = None  # computed on first write
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _expired(self, mtime, now):
+        return self.max_age_seconds > 0 and now - mtime > self.max_age_seconds
+
+    def get(self, key):
+        """Returns the cached {"json", "raw_text"} for key, or None."""
+        path = self._entry_path(key)
+        try:
+            stat = os.stat(path)
+            now = time.time()
+            if self._expired(stat.st_mtime, now):
+                self._remove(path, stat.st_size)
+                raise FileNotFoundError(path)
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            if entry.get("version") != ENTRY_VERSION:
+                raise ValueError(f"Unsupported cache entry version: {entry.get('version')}")
+            # The access time drives eviction (least recently used first)
+            os.utime(path, (now, stat.st_mtime))
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable extraction cache entry {path}: {e}")
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return {"json": entry["json"], "raw_text": entry["raw_text"]}
+
+    def put(self, key, data, model=None):
+        """Stores the {"json", "raw_text"} extraction of one image under key."""
+        path = self._entry_path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        entry = {
+            "version": ENTRY_VERSION,
+            "model": model,
+            "created": time.time(),
+            "json": data["json"],
+            "raw_text": data["raw_text"],
+        }
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            try:
+                previous_size = os.path.getsize(path)
+            except OSError:
+                previous_size = 0
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self.writes += 1
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += os.path.getsize(path) - previous_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _iter_entries(self):
+        if not os.path.isdir(self.directory):
+            return
+        for shard in os.listdir(self.directory):
+            shard_dir = os.path.join(self.directory, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for file_name in os.listdir(shard_dir):
+                if file_name.endswith('.json'):
+                    path = os.path.join(shard_dir, file_name)
+                    try:
+                        yield path, os.stat(path)
+                    except FileNotFoundError:
+                        continue
+
+    def _scan_size(self):
+        return sum(stat.st_size for _, stat in self._iter_entries())
+
+    def _remove(self, path, size):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self.evictions += 1
+            if self._total_bytes is not None:
+                self._total_bytes -= size
+
+    def _evict(self):
+        """Drops expired entries, then the least recently used ones until the budget is met. Called with the lock held."""
+        now = time.time()
+        entries = sorted(self._iter_entries(), key=lambda item: item[1].st_atime)
+        total = sum(stat.st_size for _, stat in entries)
+        for path, stat in entries:
+            if total <= self.max_bytes and not self._expired(stat.st_mtime, now):
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= stat.st_size
+            self.evictions += 1
+        self._total_bytes = total
+        logger.debug(f"Extraction cache evicted down to {total} bytes")
+
+    def clear(self):
+        with self._lock:
+            for path, _ in list(self._iter_entries()):
+                os.remove(path)
+            self._total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            entries = list(self._iter_entries())
+            return {
+                "entries": len(entries),
+                "bytes": sum(stat.st_size for _, stat in entries),
+                "max_bytes": self.max_bytes,
+                "max_age_seconds": self.max_age_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Process-wide instance used by get_extracted_data
+extraction_cache = ExtractionCache()
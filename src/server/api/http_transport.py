@@ -0,0 +1,140 @@
+import time
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.server.config.settings import CONNECT_TIMEOUT, REQUEST_TIMEOUT, EXTRACTION_CONCURRENCY, MISTRAL_HTTP2
+
+logger = logging.getLogger(__name__)
+
+try:
+    import httpx  # optional, only needed for HTTP/2 (pip install "httpx[http2]")
+except ImportError:
+    httpx = None
+
+# Connection-level errors of both backends, retried by the callers
+TRANSPORT_ERRORS = (requests.exceptions.RequestException,) + ((httpx.HTTPError,) if httpx is not None else ())
+
+
+class HTTPTransport:
+    """
+    Keep-alive HTTP transport shared by every call of the process.
+
+    Connections are pooled (pool_size connections per host, grown by reserve() to the
+    number of workers of a batch), so only the first calls pay the TCP and TLS handshakes.
+    HTTP/2 is used through httpx when requested and installed; requests is used otherwise.
+
+    Every call is timed. The timings are aggregated in stats() and passed to the hooks
+    registered with add_timing_hook, as a dict with url, status, elapsed (seconds) and
+    new_connections (connections opened during the call; None with httpx). Under
+    concurrency new_connections is approximate, the totals are exact.
+    """
+
+    def __init__(self, pool_size=EXTRACTION_CONCURRENCY, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=REQUEST_TIMEOUT, http2=MISTRAL_HTTP2):
+        self.pool_size = max(1, pool_size)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._lock = threading.Lock()
+        self._hooks = []
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self._retired_connections = 0  # opened by the pools replaced in reserve()
+
+        if http2 and httpx is None:
+            logger.warning("HTTP/2 requested but httpx is not installed, falling back to HTTP/1.1 keep-alive")
+        self.http2 = bool(http2 and httpx is not None)
+        self._open_pool()
+
+    def _open_pool(self):
+        if self.http2:
+            self._client = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+            )
+        else:
+            self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+            self._client = requests.Session()
+            self._client.mount('https://', self._adapter)
+            self._client.mount('http://', self._adapter)
+
+    def reserve(self, connections):
+        """
+        Grows the pool to at least connections, e.g. the number of workers of a batch, so that no
+        worker opens a connection the full pool would then discard. The pool never shrinks; the
+        calls in flight finish on the previous pool.
+        """
+        with self._lock:
+            if connections <= self.pool_size:
+                return
+            logger.info(f"Growing the HTTP connection pool from {self.pool_size} to {connections}")
+            self._retired_connections = self.connections_opened() or 0
+            self.pool_size = connections
+            self._open_pool()
+
+    def add_timing_hook(self, hook):
+        """Registers a callable receiving the timing dict of every call."""
+        with self._lock:
+            self._hooks.append(hook)
+
+    def connections_opened(self):
+        """Connections opened since the transport was created (None when the backend does not expose it)."""
+        if self.http2:
+            return None
+        pools = self._adapter.poolmanager.pools
+        return self._retired_connections + sum(pools[key].num_connections for key in pools.keys())
+
+    def post(self, url, headers=None, json=None):
+        """POSTs a JSON body with separate connect and read timeouts and returns the response."""
+        opened_before = self.connections_opened()
+        started = time.perf_counter()
+        status = None
+        try:
+            if self.http2:
+                response = self._client.post(url, headers=headers, json=json)
+            else:
+                response = self._client.post(url, headers=headers, json=json,
+                                             timeout=(self.connect_timeout, self.read_timeout))
+            status = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            opened_after = self.connections_opened()
+            timing = {
+                "url": url,
+                "status": status,
+                "elapsed": elapsed,
+                "new_connections": None if opened_before is None else opened_after - opened_before,
+            }
+            with self._lock:
+                self.calls += 1
+                self.errors += status is None
+                self.total_seconds += elapsed
+                hooks = list(self._hooks)
+            for hook in hooks:
+                try:
+                    hook(timing)
+                except Exception as e:
+                    logger.error(f"HTTP timing hook failed: {e}", exc_info=True)
+
+    def stats(self):
+        with self._lock:
+            calls, errors, total_seconds = self.calls, self.errors, self.total_seconds
+        connections = self.connections_opened()
+        return {
+            "http2": self.http2,
+            "pool_size": self.pool_size,
+            "calls": calls,
+            "errors": errors,
+            "total_seconds": total_seconds,
+            "mean_seconds": total_seconds / calls if calls else 0.0,
+            "connections_opened": connections,
+            "connection_reuse_rate": 1 - connections / calls if calls and connections is not None else None,
+        }
+
+    def close(self):
+        self._client.close()
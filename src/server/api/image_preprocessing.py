@@ -0,0 +1,97 @@
+import io
+import logging
+import mimetypes
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from src.server.config.settings import (
+    IMAGE_PREPROCESSING,
+    IMAGE_MAX_EDGE,
+    IMAGE_GRAYSCALE,
+    IMAGE_TARGET_BYTES,
+    IMAGE_JPEG_QUALITY_MAX,
+    IMAGE_JPEG_QUALITY_MIN
+)
+
+logger = logging.getLogger(__name__)
+
+# MIME types of the formats Pillow can identify, used when the original bytes are sent as-is
+PIL_FORMAT_MIME = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'WEBP': 'image/webp', 'GIF': 'image/gif'}
+
+QUALITY_STEP = 10
+EXIF_ORIENTATION = 0x0112
+
+
+def preprocessing_signature(preprocess=IMAGE_PREPROCESSING):
+    """Settings that change the preprocessed payload, part of the extraction cache key."""
+    if not preprocess:
+        return "raw"
+    return f"edge={IMAGE_MAX_EDGE},gray={int(IMAGE_GRAYSCALE)},target={IMAGE_TARGET_BYTES},q={IMAGE_JPEG_QUALITY_MAX}-{IMAGE_JPEG_QUALITY_MIN}"
+
+
+def guess_mime_type(image_bytes, image_path=None):
+    """MIME type from the image content, falling back on the file extension, then image/jpeg."""
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            mime = PIL_FORMAT_MIME.get(image.format)
+            if mime:
+                return mime
+    except (UnidentifiedImageError, OSError):
+        pass
+    if image_path:
+        mime, _ = mimetypes.guess_type(image_path)
+        if mime and mime.startswith('image/'):
+            return mime
+    return 'image/jpeg'
+
+
+def _encode_jpeg(image, target_bytes):
+    """Encodes as JPEG, lowering the quality step by step until the payload fits target_bytes."""
+    quality = IMAGE_JPEG_QUALITY_MAX
+    while True:
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=quality, optimize=True)
+        if buffer.tell() <= target_bytes or quality - QUALITY_STEP < IMAGE_JPEG_QUALITY_MIN:
+            return buffer.getvalue(), quality
+        quality -= QUALITY_STEP
+
+
+def preprocess_image(image_bytes, image_path=None, max_edge=IMAGE_MAX_EDGE, grayscale=IMAGE_GRAYSCALE,
+                     target_bytes=IMAGE_TARGET_BYTES):
+    """
+    Shrinks an invoice image before it is base64-encoded for the vision model.
+
+    The image is rotated according to its EXIF orientation, downscaled so its longest edge is
+    at most max_edge pixels, optionally converted to grayscale and re-encoded as JPEG with the
+    highest quality that fits target_bytes. The original bytes are kept when they are already
+    smaller and need no rotation, or when Pillow cannot read them.
+
+    Returns:
+        tuple: (image bytes, MIME type)
+    """
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            original_mime = PIL_FORMAT_MIME.get(image.format)
+            needs_rotation = image.getexif().get(EXIF_ORIENTATION, 1) != 1
+            processed = ImageOps.exif_transpose(image)
+            if max(processed.size) > max_edge:
+                processed.thumbnail((max_edge, max_edge), Image.LANCZOS)
+            processed = processed.convert('L' if grayscale else 'RGB')
+            payload, quality = _encode_jpeg(processed, target_bytes)
+    except (UnidentifiedImageError, OSError) as e:
+        logger.warning(f"Could not preprocess {image_path or 'image'}, sending it unchanged: {e}")
+        return image_bytes, guess_mime_type(image_bytes, image_path)
+
+    if original_mime and not needs_rotation and len(payload) >= len(image_bytes):
+        logger.debug(f"Preprocessing would not shrink {image_path or 'image'}, sending it unchanged")
+        return image_bytes, original_mime
+
+    logger.debug(f"Preprocessed {image_path or 'image'}: {len(image_bytes)} -> {len(payload)} bytes (JPEG quality {quality})")
+    return payload, 'image/jpeg'
+
+
+def prepare_image_payload(image_bytes, image_path=None, preprocess=IMAGE_PREPROCESSING):
+    """Bytes and MIME type sent to the vision model, preprocessed unless disabled."""
+    if preprocess:
+        return preprocess_image(image_bytes, image_path)
+    return image_bytes, guess_mime_type(image_bytes, image_path)
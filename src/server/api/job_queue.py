@@ -0,0 +1,411 @@
+import os
+import json
+import time
+import hashlib
+import uuid
+import sqlite3
+import logging
+from contextlib import contextmanager
+
+from src.server.config.paths import JOBS_DB_PATH
+from src.server.config.settings import JOB_LEASE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Job statuses; 'queued' and 'running' jobs still have items to process
+ACTIVE_STATUSES = ('queued', 'running')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    status TEXT NOT NULL,
+    statement_path TEXT NOT NULL,
+    params TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    mode TEXT NOT NULL DEFAULT 'worker',
+    fingerprint TEXT
+);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    invoice_path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    worker TEXT,
+    claimed_at REAL,
+    finished_at REAL,
+    done_order INTEGER,
+    record TEXT,
+    PRIMARY KEY (job_id, position)
+);
+CREATE INDEX IF NOT EXISTS job_items_status ON job_items (status, job_id);
+CREATE INDEX IF NOT EXISTS jobs_owner ON jobs (owner, created_at);
+CREATE TABLE IF NOT EXISTS owners (
+    owner TEXT PRIMARY KEY,
+    last_served_at REAL NOT NULL
+);
+"""
+
+# Columns added after the first version of the schema, created on databases that lack them
+_ADDED_COLUMNS = {
+    'mode': "TEXT NOT NULL DEFAULT 'worker'",
+    'fingerprint': "TEXT",
+}
+
+# Item statuses counted as failed in the job progress
+FAILED_RECORD_STATUSES = ('extraction_failed', 'matching_failed')
+
+# Jobs processed by job_worker.py, and jobs processed by the process that created them (CLI,
+# Streamlit without background jobs) which only use the queue as a checkpoint
+WORKER_MODE = 'worker'
+INLINE_MODE = 'inline'
+
+
+def job_fingerprint(statement_path, invoice_paths, params=None):
+    """
+    Identifies a batch, to find the interrupted run of the same batch again: statement content,
+    invoice names and sizes (re-uploading the same files gives the same fingerprint) and options.
+    """
+    digest = hashlib.sha256()
+    statement_digest = hashlib.sha256()
+    with open(statement_path, 'rb') as f:
+        # Hashed by blocks, so a large statement is never read into memory at once
+        for block in iter(lambda: f.read(1 << 20), b''):
+            statement_digest.update(block)
+    digest.update(statement_digest.digest())
+    invoices = [(os.path.basename(path), os.path.getsize(path) if os.path.exists(path) else None) for path in invoice_paths]
+    digest.update(json.dumps([invoices, params or {}], sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class JobQueue:
+    """
+    Durable queue of reconciliation jobs in a local SQLite database, shared by the Streamlit app
+    (which submits jobs and polls them) and the worker processes (job_worker.py).
+
+    A job is a statement and a list of invoices; each invoice is an item, stored with its result
+    once processed, so progress and partial results survive page reloads and app restarts.
+
+    Workers claim a few items at a time, always from the owner served least recently: the jobs of
+    several users are interleaved instead of running one after the other. Items claimed by a worker
+    that died are handed out again once their lease (JOB_LEASE_SECONDS) has expired.
+
+    The same tables checkpoint the batches run in-process (inline jobs, never claimed by workers):
+    after a crash or an API outage, resume() retries only the failed and unfinished invoices.
+    """
+
+    def __init__(self, path=JOBS_DB_PATH, lease_seconds=JOB_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        with self._read() as conn:
+            conn.executescript(_SCHEMA)
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for name, definition in _ADDED_COLUMNS.items():
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_fingerprint ON jobs (fingerprint, created_at)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction taking the database lock up front, so concurrent claims never interleave."""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _read(self):
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def submit(self, owner, statement_path, invoice_paths, params=None, mode=WORKER_MODE, fingerprint=None):
+        """
+        Queues a reconciliation job.
+
+        Args:
+            owner (str): Who submitted the job (a browser session, a cron job...), the unit of fair scheduling
+            statement_path (str): Uploaded statement path
+            invoice_paths (list): Uploaded invoice image paths
+            params (dict): reconciliation_pipeline options (threshold, backend, use_cache)
+            mode (str): WORKER_MODE (processed by job_worker.py) or INLINE_MODE (processed by the caller)
+            fingerprint (str): job_fingerprint of the batch, to find it again with find_unfinished
+
+        Returns:
+            str: job id
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, owner, status, statement_path, params, total, created_at, mode, fingerprint) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, owner, 'queued' if mode == WORKER_MODE else 'running', statement_path,
+                 json.dumps(params or {}), len(invoice_paths), now, mode, fingerprint)
+            )
+            conn.executemany(
+                "INSERT INTO job_items (job_id, position, invoice_path, status) VALUES (?, ?, ?, 'pending')",
+                [(job_id, position, path) for position, path in enumerate(invoice_paths)]
+            )
+        logger.info(f"Job {job_id} queued for {owner}: {len(invoice_paths)} invoices")
+        return job_id
+
+    def requeue_expired(self):
+        """
+        Hands out again the items whose worker stopped before finishing them; returns their number.
+        Only worker jobs: the items of an inline job are retried when its own process resumes it.
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE job_items SET status = 'pending', worker = NULL, claimed_at = NULL "
+                "WHERE status = 'running' AND claimed_at < ? "
+                "AND job_id IN (SELECT id FROM jobs WHERE mode = 'worker')",
+                (time.time() - self.lease_seconds,)
+            )
+        if cursor.rowcount:
+            logger.warning(f"Requeued {cursor.rowcount} job items whose lease expired")
+        return cursor.rowcount
+
+    def claim(self, worker_id, limit):
+        """
+        Claims up to limit pending items of a single job, from the owner served least recently.
+
+        Returns:
+            dict or None: {"job": job dict, "items": [(position, invoice_path), ...]}
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            job = conn.execute(
+                "SELECT j.* FROM jobs j LEFT JOIN owners o ON o.owner = j.owner "
+                "WHERE j.status IN ('queued', 'running') AND j.mode = 'worker' "
+                "AND EXISTS (SELECT 1 FROM job_items i WHERE i.job_id = j.id AND i.status = 'pending') "
+                "ORDER BY COALESCE(o.last_served_at, 0), j.created_at LIMIT 1"
+            ).fetchone()
+            if job is None:
+                return None
+            items = conn.execute(
+                "SELECT position, invoice_path FROM job_items WHERE job_id = ? AND status = 'pending' "
+                "ORDER BY position LIMIT ?",
+                (job['id'], limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE job_items SET status = 'running', worker = ?, claimed_at = ? WHERE job_id = ? AND position = ?",
+                [(worker_id, now, job['id'], item['position']) for item in items]
+            )
+            conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, ?) WHERE id = ?",
+                (now, job['id'])
+            )
+            conn.execute(
+                "INSERT INTO owners (owner, last_served_at) VALUES (?, ?) "
+                "ON CONFLICT(owner) DO UPDATE SET last_served_at = excluded.last_served_at",
+                (job['owner'], now)
+            )
+        return {
+            "job": self._job_dict(job),
+            "items": [(item['position'], item['invoice_path']) for item in items]
+        }
+
+    def claim_job(self, job_id, worker_id):
+        """
+        Claims every pending item of one job, for the process running an inline job itself.
+
+        Returns:
+            dict or None: {"job": job dict, "items": [(position, invoice_path), ...]}
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            job = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None or job['status'] not in ACTIVE_STATUSES:
+                return None
+            items = conn.execute(
+                "SELECT position, invoice_path FROM job_items WHERE job_id = ? AND status = 'pending' ORDER BY position",
+                (job_id,)
+            ).fetchall()
+            conn.execute(
+                "UPDATE job_items SET status = 'running', worker = ?, claimed_at = ? WHERE job_id = ? AND status = 'pending'",
+                (worker_id, now, job_id)
+            )
+            conn.execute("UPDATE jobs SET started_at = COALESCE(started_at, ?) WHERE id = ?", (now, job_id))
+        return {
+            "job": self._job_dict(job),
+            "items": [(item['position'], item['invoice_path']) for item in items]
+        }
+
+    def find_unfinished(self, fingerprint):
+        """Most recent job of a batch that still has failed or unprocessed invoices, or None."""
+        with self._read() as conn:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE fingerprint = ? AND (status != 'done' OR failed > 0) "
+                "ORDER BY created_at DESC LIMIT 1",
+                (fingerprint,)
+            ).fetchone()
+        return row['id'] if row else None
+
+    def release(self, job_id, worker_id, positions):
+        """Puts items claimed by worker_id and left unfinished (e.g. the run was interrupted) back to pending."""
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE job_items SET status = 'pending', worker = NULL, claimed_at = NULL "
+                "WHERE job_id = ? AND position = ? AND status = 'running' AND worker = ?",
+                [(job_id, position, worker_id) for position in positions]
+            )
+
+    def resume(self, job_id):
+        """
+        Puts the failed, cancelled and abandoned (lease expired) invoices of a job back to pending;
+        the completed ones keep their checkpointed result, and items another process is still
+        running are left to it.
+
+        Returns:
+            int: number of invoices left to process
+        """
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE job_items SET status = 'pending', worker = NULL, claimed_at = NULL, finished_at = NULL, "
+                "done_order = NULL, record = NULL WHERE job_id = ? "
+                "AND (status IN ('failed', 'cancelled') OR (status = 'running' AND claimed_at < ?))",
+                (job_id, time.time() - self.lease_seconds)
+            )
+            remaining = conn.execute(
+                "SELECT COUNT(*) FROM job_items WHERE job_id = ? AND status = 'pending'", (job_id,)
+            ).fetchone()[0]
+            conn.execute(
+                "UPDATE jobs SET done = (SELECT COUNT(*) FROM job_items WHERE job_id = jobs.id AND status = 'done'), "
+                "failed = 0, finished_at = CASE WHEN ? THEN NULL ELSE finished_at END, "
+                "status = CASE WHEN ? = 0 THEN 'done' WHEN mode = 'inline' THEN 'running' ELSE 'queued' END "
+                "WHERE id = ?",
+                (remaining, remaining, job_id)
+            )
+        logger.info(f"Job {job_id} resumed: {remaining} invoices left")
+        return remaining
+
+    def leased(self, job_id):
+        """
+        Items of a job still claimed by a run whose lease has not expired, which resume leaves to it
+        (e.g. a crashed inline run of the same batch, until JOB_LEASE_SECONDS have passed).
+
+        Returns:
+            dict: items (number of leased items) and expires_in (seconds until the last lease expires)
+        """
+        now = time.time()
+        with self._read() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) AS items, MAX(claimed_at) AS last_claim FROM job_items "
+                "WHERE job_id = ? AND status = 'running' AND claimed_at >= ?",
+                (job_id, now - self.lease_seconds)
+            ).fetchone()
+        expires_in = max(0.0, row['last_claim'] + self.lease_seconds - now) if row['items'] else 0.0
+        return {"items": row['items'], "expires_in": expires_in}
+
+    def complete(self, job_id, position, record):
+        """Stores the result of an item and finishes the job with its last item."""
+        now = time.time()
+        failed = record.get('status') in FAILED_RECORD_STATUSES
+        with self._transaction() as conn:
+            job = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None or job['status'] not in ACTIVE_STATUSES:
+                # Cancelled (or deleted) while the item was processed
+                return
+            # Completion order, also after a resume (retried invoices come after the checkpointed ones)
+            done_order = conn.execute(
+                "SELECT COALESCE(MAX(done_order), 0) + 1 FROM job_items WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+            cursor = conn.execute(
+                "UPDATE job_items SET status = ?, finished_at = ?, done_order = ?, record = ? "
+                "WHERE job_id = ? AND position = ? AND status = 'running'",
+                ('failed' if failed else 'done', now, done_order, json.dumps(record, default=str), job_id, position)
+            )
+            if not cursor.rowcount:
+                # Already completed by a worker whose lease had expired
+                return
+            conn.execute("UPDATE jobs SET done = done + 1, failed = failed + ? WHERE id = ?", (int(failed), job_id))
+            remaining = conn.execute(
+                "SELECT COUNT(*) FROM job_items WHERE job_id = ? AND status IN ('pending', 'running')", (job_id,)
+            ).fetchone()[0]
+            if not remaining:
+                conn.execute("UPDATE jobs SET status = 'done', finished_at = ? WHERE id = ?", (now, job_id))
+                logger.info(f"Job {job_id} finished")
+
+    def cancel(self, job_id):
+        """Stops a job: its pending items are not processed."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+                (time.time(), job_id)
+            )
+            conn.execute("UPDATE job_items SET status = 'cancelled' WHERE job_id = ? AND status = 'pending'", (job_id,))
+
+    @staticmethod
+    def _job_dict(row):
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        return job
+
+    def get(self, job_id):
+        """Job status and progress, or None for an unknown id."""
+        with self._read() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = self._job_dict(row)
+            if job['status'] == 'queued':
+                # Active worker jobs submitted before this one (inline jobs never go through the workers)
+                job['queue_position'] = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running') AND mode = 'worker' AND created_at < ?",
+                    (job['created_at'],)
+                ).fetchone()[0]
+        return job
+
+    def results(self, job_id, after=0):
+        """
+        Results of the items completed after the after-th one, in completion order, for incremental polling.
+
+        Returns:
+            list: reconcile_invoice records, each with its 'done_order'
+        """
+        with self._read() as conn:
+            rows = conn.execute(
+                "SELECT done_order, record FROM job_items WHERE job_id = ? AND done_order > ? ORDER BY done_order",
+                (job_id, after)
+            ).fetchall()
+        return [{**json.loads(row['record']), 'done_order': row['done_order']} for row in rows]
+
+    def list_jobs(self, owner=None, limit=20):
+        with self._read() as conn:
+            if owner is None:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT * FROM jobs WHERE owner = ? ORDER BY created_at DESC LIMIT ?", (owner, limit)
+                ).fetchall()
+        return [self._job_dict(row) for row in rows]
+
+    def stats(self):
+        with self._read() as conn:
+            jobs = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            items = dict(conn.execute("SELECT status, COUNT(*) FROM job_items GROUP BY status").fetchall())
+        return {"jobs": jobs, "items": items}
+
+
+job_queue = JobQueue()
@@ -0,0 +1,132 @@
+import os
+import socket
+import logging
+import threading
+
+from src.server.api.job_queue import job_queue, job_fingerprint, INLINE_MODE
+from src.server.api.reconciliation import reconciliation_pipeline
+from src.server.config.settings import JOB_BATCH_SIZE, JOB_POLL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def process_items(queue, job, items, pipeline=None, worker_id=None):
+    """
+    Runs claimed items of a job through the reconciliation pipeline and checkpoints each result
+    in the queue before handing it on. When the run stops early (error, consumer gone), the
+    unfinished items claimed by worker_id are released so a resume retries them.
+
+    Args:
+        pipeline: StagedPipeline to use (built from the job options by default), e.g. with other worker counts
+        worker_id: Worker that claimed the items
+
+    Yields:
+        dict: reconcile_invoice records, in completion order
+    """
+    positions = {}
+    for position, invoice_path in items:
+        positions.setdefault(invoice_path, []).append(position)
+
+    if pipeline is None:
+        params = job['params']
+        pipeline = reconciliation_pipeline(
+            job['statement_path'],
+            threshold=params.get('threshold', 70),
+            backend=params.get('backend'),
+            use_cache=params.get('use_cache', True)
+        )
+    try:
+        for record in pipeline.run([invoice_path for _, invoice_path in items]):
+            queue.complete(job['id'], positions[record['invoice_path']].pop(0), record)
+            yield record
+    finally:
+        unfinished = [position for remaining in positions.values() for position in remaining]
+        if unfinished and worker_id is not None:
+            queue.release(job['id'], worker_id, unfinished)
+    logger.debug(f"Pipeline stats for job {job['id']}: {pipeline.stats()}")
+
+
+def open_checkpoint(owner, statement_path, invoice_paths, params=None, resume=True, queue=job_queue):
+    """
+    Starts an inline (in-process) job checkpointed in the job queue, or resumes the interrupted
+    run of the same batch (same statement, invoices and options) when there is one.
+
+    Invoices another run still holds (lease not expired) are not processed again: their number is
+    reported as leased, so the caller can tell the user instead of showing an incomplete run as done.
+
+    Returns:
+        dict: job_id, resumed (bool), completed (the records checkpointed by the earlier run) and
+            leased ({"items", "expires_in"}, see JobQueue.leased)
+    """
+    fingerprint = job_fingerprint(statement_path, invoice_paths, params)
+    job_id = queue.find_unfinished(fingerprint) if resume else None
+    if job_id is not None:
+        remaining = queue.resume(job_id)
+        leased = queue.leased(job_id)
+        logger.info(f"Resuming job {job_id}: {remaining} of {len(invoice_paths)} invoices left")
+        if leased['items']:
+            logger.warning(f"Job {job_id}: {leased['items']} invoices still leased by another run "
+                           f"for {leased['expires_in']:.0f}s, not processed again")
+        return {"job_id": job_id, "resumed": True, "completed": queue.results(job_id), "leased": leased}
+    job_id = queue.submit(owner, statement_path, invoice_paths, params, mode=INLINE_MODE, fingerprint=fingerprint)
+    return {"job_id": job_id, "resumed": False, "completed": [], "leased": {"items": 0, "expires_in": 0.0}}
+
+
+def run_checkpoint(job_id, pipeline=None, worker_id=None, queue=job_queue):
+    """
+    Processes the pending invoices of an inline job in the calling process (with pipeline when given).
+
+    Yields:
+        dict: reconcile_invoice records, each checkpointed before it is yielded
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    claim = queue.claim_job(job_id, worker_id)
+    if claim is None or not claim['items']:
+        return
+    yield from process_items(queue, claim['job'], claim['items'], pipeline, worker_id)
+
+
+class JobWorker:
+    """
+    Processes the jobs of a JobQueue: claims a few items (batch_size invoices of one job, from
+    the owner served least recently), runs them through the reconciliation pipeline and stores
+    each result as soon as its invoice is matched.
+    """
+
+    def __init__(self, queue=job_queue, batch_size=JOB_BATCH_SIZE, poll_seconds=JOB_POLL_SECONDS, worker_id=None):
+        self.queue = queue
+        self.batch_size = max(1, batch_size)
+        self.poll_seconds = poll_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.stop_event = threading.Event()
+        self.processed = 0
+
+    def run_once(self):
+        """Processes one claimed batch; returns False when there was nothing to do."""
+        self.queue.requeue_expired()
+        claim = self.queue.claim(self.worker_id, self.batch_size)
+        if claim is None:
+            return False
+
+        job = claim['job']
+        logger.info(f"Worker {self.worker_id}: {len(claim['items'])} invoices of job {job['id']} ({job['owner']})")
+        for _ in process_items(self.queue, job, claim['items'], worker_id=self.worker_id):
+            self.processed += 1
+        return True
+
+    def run(self):
+        """Processes jobs until stop() is called, waiting poll_seconds whenever the queue is empty."""
+        logger.info(f"Job worker {self.worker_id} started")
+        while not self.stop_event.is_set():
+            try:
+                worked = self.run_once()
+            except Exception as e:
+                logger.error(f"Job worker error: {e}", exc_info=True)
+                worked = False
+            if not worked:
+                self.stop_event.wait(self.poll_seconds)
+        logger.info(f"Job worker {self.worker_id} stopped after {self.processed} invoices")
+
+    def stop(self):
+        """Stops after the batch in progress (its items are finished, not abandoned)."""
+        self.stop_event.set()
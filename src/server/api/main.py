@@ -1,9 +1,23 @@
-from src.server.api.extract_data import get_extracted_data
-from src.server.api.matching import get_matching_rows
+from src.server.api.extract_data import get_extracted_data, extract_batch, get_mistral_client, extraction_mode_stats, extraction_flight
+from src.server.api.extraction_cache import extraction_cache
+from src.server.api.extraction_backends import list_backends
+from src.server.api.reconciliation import reconcile_invoice, combine_confusion_matrices, reconciliation_pipeline
+from src.server.api.job_queue import job_queue
+from src.server.api.job_worker import open_checkpoint, run_checkpoint
+from src.server.config.settings import EXTRACTION_CONCURRENCY, PIPELINE_QUEUE_SIZE, PIPELINE_LOAD_WORKERS, PIPELINE_MATCH_WORKERS
+from src.server.api.perceptual_hash import perceptual_index
+from src.server.api.matching import get_matching_rows, match_candidates_cache
+from src.server.api.assignment import match_batch
+from src.server.api.bulk_scoring import score_invoices_topk
+from src.server.api.streaming import stream_matching_rows
 from src.server.api.upload import upload_file
 from src.server.api.download import download_file
 from src.server.api.delete import delete_file
-from src.server.api.benchmark import benchmark, calculate_confusion_matrix
+from src.server.api.benchmark import benchmark, calculate_confusion_matrix, benchmark_image_preprocessing, benchmark_heuristic_parser, benchmark_extraction_backends, benchmark_match_scoring
+from src.server.api.receipt_parser import heuristic_parser_stats
+from src.server.api.statement_cache import load_statement, statement_cache
+from src.server.api.columnar import delete_statement_sidecar
+from src.server.api.vendor import get_vendor_cache_stats
 import pandas as pd
 
 class APIService:
@@ -12,17 +26,196 @@ class APIService:
 
     def get_extracted_data(self, image_path):
         return get_extracted_data(image_path)
+
+    def extract_batch(self, image_paths, backend=None, max_workers=EXTRACTION_CONCURRENCY, use_cache=True):
+        """
+        Extract several invoices concurrently, within the Mistral rate limit.
+
+        Args:
+            image_paths: List of invoice image paths
+            backend: Extraction backend name ('mistral', 'tesseract'; EXTRACTION_BACKEND by default)
+            max_workers: Maximum number of extractions in flight
+            use_cache: Read and write the extraction cache
+
+        Returns:
+            generator: (index, image path, extraction result) tuples in completion order
+        """
+        return extract_batch(image_paths, max_workers=max_workers, backend=backend, use_cache=use_cache)
+
+    def reconcile_invoice(self, csv_file_path, invoice_path, extraction, threshold=70):
+        """
+        Match one extracted invoice against the statement and evaluate it (no UI involved).
+
+        Args:
+            csv_file_path: Path to the CSV file
+            invoice_path: Invoice image path
+            extraction: get_extracted_data result for the invoice
+            threshold: Minimum vendor similarity score
+
+        Returns:
+            dict: status, extracted fields, matches, best matches and confusion results
+        """
+        return reconcile_invoice(csv_file_path, invoice_path, extraction, threshold)
+
+    def reconciliation_pipeline(self, csv_file_path, threshold=70, backend=None, use_cache=True,
+                                load_workers=PIPELINE_LOAD_WORKERS, extraction_workers=EXTRACTION_CONCURRENCY,
+                                match_workers=PIPELINE_MATCH_WORKERS, queue_size=PIPELINE_QUEUE_SIZE):
+        """
+        Staged load -> extraction -> matching pipeline with bounded queues between the stages.
+
+        Args:
+            csv_file_path: Path to the CSV file
+            threshold: Minimum vendor similarity score
+            backend: Extraction backend name (EXTRACTION_BACKEND by default)
+            use_cache: Read and write the extraction cache
+            load_workers, extraction_workers, match_workers: Worker threads of each stage
+            queue_size: Maximum number of invoices waiting between two stages
+
+        Returns:
+            StagedPipeline: pipeline.run(invoice_paths) yields reconcile_invoice records in completion
+                order; pipeline.stats() gives per-stage queue depth, throughput and utilization
+        """
+        return reconciliation_pipeline(csv_file_path, threshold, backend, use_cache,
+                                       load_workers, extraction_workers, match_workers, queue_size)
+
+    def submit_job(self, owner, csv_file_path, invoice_paths, threshold=70, backend=None, use_cache=True):
+        """
+        Queue a reconciliation job for the background workers (job_worker.py).
+
+        Args:
+            owner: Submitter id (e.g. the browser session), used for fair scheduling between users
+            csv_file_path: Uploaded statement path
+            invoice_paths: Uploaded invoice image paths
+            threshold: Minimum vendor similarity score
+            backend: Extraction backend name (EXTRACTION_BACKEND by default)
+            use_cache: Read and write the extraction cache
+
+        Returns:
+            str: job id, to poll with get_job and get_job_results
+        """
+        params = {'threshold': threshold, 'backend': backend, 'use_cache': use_cache}
+        return job_queue.submit(owner, csv_file_path, invoice_paths, params)
+
+    def get_job(self, job_id):
+        """Status ('queued', 'running', 'done', 'cancelled') and progress (total, done, failed) of a job."""
+        return job_queue.get(job_id)
+
+    def get_job_results(self, job_id, after=0):
+        """reconcile_invoice records of a job completed after the after-th one, in completion order."""
+        return job_queue.results(job_id, after)
+
+    def list_jobs(self, owner=None):
+        """Most recent jobs, of one owner or of everybody."""
+        return job_queue.list_jobs(owner)
+
+    def cancel_job(self, job_id):
+        """Stop a job; the invoices not processed yet are skipped."""
+        return job_queue.cancel(job_id)
+
+    def resume_job(self, job_id):
+        """Retry the failed and unfinished invoices of a job; returns how many are left to process."""
+        return job_queue.resume(job_id)
+
+    def open_checkpoint(self, owner, csv_file_path, invoice_paths, threshold=70, backend=None, use_cache=True, resume=True):
+        """
+        Start a batch processed in this process but checkpointed invoice by invoice, or resume the
+        interrupted run of the same batch (same statement, invoices and options).
+
+        Args:
+            owner: Submitter id (browser session, 'cli'...)
+            csv_file_path: Uploaded statement path
+            invoice_paths: Invoice image paths
+            threshold: Minimum vendor similarity score
+            backend: Extraction backend name (EXTRACTION_BACKEND by default)
+            use_cache: Read and write the extraction cache
+            resume: Reuse an unfinished run of the same batch (False always starts over)
+
+        Returns:
+            dict: job_id, resumed (bool), completed (records already checkpointed, to display or export)
+                and leased (invoices still held by another run: items, expires_in seconds)
+        """
+        params = {'threshold': threshold, 'backend': backend, 'use_cache': use_cache}
+        return open_checkpoint(owner, csv_file_path, invoice_paths, params, resume)
+
+    def run_checkpoint(self, job_id, pipeline=None):
+        """
+        Process the remaining invoices of a checkpointed batch.
+
+        Args:
+            job_id: Job returned by open_checkpoint
+            pipeline: reconciliation_pipeline with the same options, to set worker counts (optional)
+
+        Returns:
+            generator: reconcile_invoice records in completion order, each saved before it is yielded
+        """
+        return run_checkpoint(job_id, pipeline)
+
+    def get_job_queue_stats(self):
+        """Number of jobs and of invoices per status in the job queue."""
+        return job_queue.stats()
+
+    def combine_confusion_matrices(self, confusion_results):
+        """Global confusion matrix and metrics (in %) of a list of per-invoice confusion results."""
+        return combine_confusion_matrices(confusion_results)
+
+    def list_extraction_backends(self):
+        """Registered extraction backends and whether each one can run here."""
+        return list_backends()
     
     def get_matching_rows(self, csv_file_path, invoice_contents, threshold=70):
         return get_matching_rows(csv_file_path, invoice_contents, threshold)
     
-    def upload_file(self, file_path, data):
-        return upload_file(file_path, data)
+    def match_batch(self, csv_file_path, invoices_contents, threshold=70):
+        """
+        Match all invoices of a batch at once with a one-to-one assignment.
+
+        Args:
+            csv_file_path: Path to the CSV file
+            invoices_contents: List of extracted invoice data dicts
+            threshold: Minimum vendor similarity score
+
+        Returns:
+            list: For each invoice, a list with its assigned match (or an empty list)
+        """
+        return match_batch(csv_file_path, invoices_contents, threshold)
+
+    def score_batch_topk(self, csv_file_path, invoices_contents, top_k=5):
+        """
+        Bulk reconciliation: the top_k statement rows of each invoice, scored like calculate_match_score.
+
+        Args:
+            csv_file_path: Path to the CSV file
+            invoices_contents: List of extracted invoice data dicts
+            top_k: Number of rows kept per invoice
+
+        Returns:
+            list: For each invoice, its top_k matches, best first
+        """
+        return score_invoices_topk(csv_file_path, invoices_contents, top_k)
+
+    def stream_matching_rows(self, csv_file_path, invoices_contents, threshold=70):
+        """
+        Match invoices against a statement too large for memory, reading it chunk by chunk.
+
+        Args:
+            csv_file_path: Path to the CSV file
+            invoices_contents: List of extracted invoice data dicts
+            threshold: Minimum vendor similarity score
+
+        Returns:
+            list: For each invoice, its best matches ranked by score
+        """
+        return stream_matching_rows(csv_file_path, invoices_contents, threshold)
+
+    def upload_file(self, file_path, data, ingest=True):
+        return upload_file(file_path, data, ingest)
     
     def download_file(self, df, type='csv'):
         return download_file(df, type)
     
     def delete_file(self, file_path):
+        statement_cache.invalidate(file_path)
+        delete_statement_sidecar(file_path)
         return delete_file(file_path)
     
     def benchmark(self, df, df_predicted):
@@ -41,8 +234,8 @@ class APIService:
             dict: Dictionary containing confusion matrix and metrics
         """
         try:
-            # Read CSV file
-            df = pd.read_csv(csv_file_path)
+            # Reuse the statement already parsed for matching
+            df = load_statement(csv_file_path).df
             
             # Calculate confusion matrix
             return calculate_confusion_matrix(df, matching_results, image_filename)
@@ -50,3 +243,108 @@ class APIService:
             print(f"Error calculating confusion matrix: {e}")
             return None
 
+    def get_statement_cache_stats(self):
+        """Hit/miss counters and memory footprint of the parsed-statement cache."""
+        return statement_cache.stats()
+
+    def get_match_cache_stats(self):
+        """Hit/miss counters of the per-invoice score vector cache."""
+        return match_candidates_cache.stats()
+
+    def get_vendor_cache_stats(self):
+        """Hit rates of the vendor normalization and similarity caches, to size them."""
+        return get_vendor_cache_stats()
+
+    def get_extraction_cache_stats(self):
+        """Hit/miss counters and disk footprint of the invoice extraction cache."""
+        return extraction_cache.stats()
+
+    def get_extraction_flight_stats(self):
+        """Extractions run (leaders) and requests served by an identical extraction already in flight (shared)."""
+        return extraction_flight.stats()
+
+    def find_duplicate_invoices(self, image_paths):
+        """
+        Flag near-duplicate invoice images (perceptual hash) within the batch and against the history.
+
+        Args:
+            image_paths: List of invoice image paths
+
+        Returns:
+            list: For each image, None or {'duplicate_of', 'distance', 'source'}
+        """
+        return perceptual_index.find_duplicates(image_paths)
+
+    def get_perceptual_index_stats(self):
+        """Size of the perceptual hash history and near-duplicates flagged."""
+        return perceptual_index.stats()
+
+    def get_http_transport_stats(self):
+        """Call count, mean latency and connection reuse of the pooled Mistral HTTP transport."""
+        return get_mistral_client().transport.stats()
+
+    def get_retry_stats(self):
+        """Retries, hedged requests and circuit breaker state of the shared Mistral client."""
+        return get_mistral_client().stats()
+
+    def get_extraction_mode_stats(self):
+        """Latency and success rate of each extraction mode (two_step, single_call) and single-call fallbacks."""
+        return extraction_mode_stats.stats()
+
+    def benchmark_match_scoring(self, csv_file_path, invoices, repeat=3):
+        """
+        Compare the row-wise and vectorized match scorers on a statement (time per invoice, speedup, mismatches).
+
+        Args:
+            csv_file_path: Statement path
+            invoices: Extracted invoice data dicts (date, amount, currency, vendor)
+            repeat: Timings per invoice and scorer, the best one is kept
+
+        Returns:
+            dict: rows, invoices, row_wise_seconds, vectorized_seconds, speedup and mismatches (expected 0)
+        """
+        return benchmark_match_scoring(csv_file_path, invoices, repeat)
+
+    def benchmark_image_preprocessing(self, image_paths, csv_file_path=None):
+        """
+        Compare payload size, latency and field accuracy of extractions with and without image preprocessing.
+
+        Args:
+            image_paths: List of invoice image paths (e.g. sample/images)
+            csv_file_path: Statement with a 'source' column used as ground truth (optional)
+
+        Returns:
+            dict: Per-variant statistics ('raw', 'preprocessed') and per-image details
+        """
+        return benchmark_image_preprocessing(image_paths, csv_file_path)
+
+    def benchmark_extraction_backends(self, image_paths, csv_file_path=None, backends=None):
+        """
+        Compare field accuracy, latency and throughput of the extraction backends on the same images.
+
+        Args:
+            image_paths: List of invoice image paths
+            csv_file_path: Statement with a 'source' column used as ground truth (optional)
+            backends: Backend names to compare (all available backends by default)
+
+        Returns:
+            dict: Per-backend statistics and per-image details
+        """
+        return benchmark_extraction_backends(image_paths, csv_file_path, backends)
+
+    def get_heuristic_parser_stats(self):
+        """Receipts read by the heuristic parser alone, i.e. LLM analysis calls saved."""
+        return heuristic_parser_stats.stats()
+
+    def benchmark_heuristic_parser(self, samples):
+        """
+        Accuracy of the heuristic parser on a labeled set.
+
+        Args:
+            samples: List of {"raw_text": ..., "expected": {date, amount, currency, vendor}} dicts
+
+        Returns:
+            dict: LLM calls saved and per-field accuracy on accepted and on all receipts
+        """
+        return benchmark_heuristic_parser(samples)
+
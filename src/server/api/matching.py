@@ -1,10 +1,17 @@
 import pandas as pd
+import numpy as np
 from fuzzywuzzy import fuzz, process # process might be useful later, fuzz is used now
 import logging
 from datetime import datetime, timedelta
-import re # Import regex for vendor cleaning
 import os
+import json
+import threading
+from collections import OrderedDict
 from src.server.api.benchmark import calculate_confusion_matrix
+from src.server.api.statement_cache import load_statement
+from src.server.api.vendor import normalize_vendor, vendor_similarity
+from src.server.api.statement_index import AmountIndex, amount_to_cents, amounts_to_cents
+from src.server.config.settings import MATCH_DATE_WINDOW_DAYS, AMOUNT_TOLERANCE_CENTS, MATCH_CACHE_SIZE
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -55,22 +62,39 @@ def read_csv(file_path):
         logger.error(f"Failed to read or process CSV {file_path}: {e}", exc_info=True)
         return None
 
-def normalize_vendor(name):
-    """Basic normalization for vendor names."""
-    if not isinstance(name, str):
-        return ""
-    name = name.lower()
-    # Remove common business suffixes (add more if needed)
-    suffixes = ['inc', 'llc', 'ltd', 'corp', 'co', 'gmbh', 'bv', 'pty', 'sa', 'sas', 'sarl']
-    # Use regex to remove suffixes if they appear as whole words at the end
-    for suffix in suffixes:
-        name = re.sub(r'\b' + suffix + r'\.?$', '', name).strip() # \b for word boundary, \.? for optional dot
-    # Remove punctuation
-    name = re.sub(r'[^\w\s]', '', name)
-    # Replace multiple spaces with single space
-    name = re.sub(r'\s+', ' ', name).strip()
-    return name
 
+# Increased weights for more reliable fields (Amount, Date)
+# Shared by the row-wise and the vectorized scorers so both always agree.
+MATCH_WEIGHTS = {
+    'date': 0.60,
+    #'amount': 0.40,
+    'currency': 0.5, # Currency is usually exact or missing
+    'vendor': 0.35  # Vendor matching is inherently fuzzy
+}
+
+def parse_invoice_date(invoice_date_str):
+    """Parses the extracted invoice date ('YYYY-MM-DD' string or None). Returns a datetime or None."""
+    if isinstance(invoice_date_str, str):
+        try:
+            # Handle potential 'N/A' strings explicitly
+            if invoice_date_str.upper() == 'N/A':
+                 logger.debug("Invoice date is 'N/A', treating as missing.")
+                 return None
+            return datetime.strptime(invoice_date_str, '%Y-%m-%d')
+        except ValueError:
+            logger.warning(f"Could not parse invoice date string: '{invoice_date_str}'. Treating as missing.")
+            return None
+    elif invoice_date_str is not None: # Should ideally be string or None
+         logger.warning(f"Unexpected invoice date type: {type(invoice_date_str)}. Treating as missing.")
+    return None
+
+def _clean_invoice_field(value):
+    """Returns the invoice string field, or None when missing, empty or 'N/A'."""
+    if not isinstance(value, str) or not value:
+        return None
+    if value.upper() == 'N/A':
+        return None
+    return value
 
 def calculate_match_score(row, invoice_data, date_tolerance_days=1, amount_tolerance=0.01):
     """
@@ -80,33 +104,11 @@ def calculate_match_score(row, invoice_data, date_tolerance_days=1, amount_toler
     score = 0
     total_weight = 0
 
-    # Increased weights for more reliable fields (Amount, Date)
-    weights = {
-        'date': 0.60,
-        #'amount': 0.40,
-        'currency': 0.5, # Currency is usually exact or missing
-        'vendor': 0.35  # Vendor matching is inherently fuzzy
-    }
+    weights = MATCH_WEIGHTS
 
     # --- 1. Date Comparison (Stricter) ---
-    invoice_date_str = invoice_data.get('date') # Expecting 'YYYY-MM-DD' string or None
     csv_date = row.get('date') # Expecting datetime object or NaT
-
-    invoice_date_obj = None
-    if isinstance(invoice_date_str, str):
-        try:
-            # Handle potential 'N/A' strings explicitly
-            if invoice_date_str.upper() == 'N/A':
-                 invoice_date_obj = None
-                 logger.debug("Invoice date is 'N/A', treating as missing.")
-            else:
-                 invoice_date_obj = datetime.strptime(invoice_date_str, '%Y-%m-%d')
-        except ValueError:
-            logger.warning(f"Could not parse invoice date string: '{invoice_date_str}'. Treating as missing.")
-            invoice_date_obj = None
-    elif invoice_date_str is not None: # Should ideally be string or None
-         logger.warning(f"Unexpected invoice date type: {type(invoice_date_str)}. Treating as missing.")
-         invoice_date_obj = None
+    invoice_date_obj = parse_invoice_date(invoice_data.get('date'))
 
     # Check if CSV date is valid (not NaT) AND invoice date was successfully parsed
     if pd.notna(csv_date) and invoice_date_obj is not None:
@@ -219,7 +221,7 @@ def calculate_match_score(row, invoice_data, date_tolerance_days=1, amount_toler
 
             if norm_csv_vendor and norm_invoice_vendor: # Ensure they aren't empty after normalization
                 # Using token_set_ratio is good for partial matches and different word order
-                vendor_score = fuzz.token_set_ratio(norm_csv_vendor, norm_invoice_vendor)
+                vendor_score = vendor_similarity(norm_csv_vendor, norm_invoice_vendor)
                 score += vendor_score * weights['vendor']
                 total_weight += weights['vendor']
                 logger.debug(f"Vendor comparison: Norm CSV='{norm_csv_vendor}', Norm Invoice='{norm_invoice_vendor}', Score={vendor_score} (Original CSV='{csv_vendor}', Invoice='{invoice_vendor}')")
@@ -242,6 +244,84 @@ def calculate_match_score(row, invoice_data, date_tolerance_days=1, amount_toler
         logger.warning("Could not calculate score for row, total_weight is zero (all comparable fields were missing/invalid).")
         return 0
 
+def calculate_match_scores(df, invoice_data, date_tolerance_days=1, amount_index=None):
+    """
+    Vectorized version of calculate_match_score: scores every row of df against the invoice at once.
+    The invoice side (date parsing, vendor normalization) is prepared a single time, the statement
+    side is compared column by column, and the fuzzy vendor score is computed once per distinct vendor.
+
+    Args:
+        amount_index: Optional AmountIndex over df rows (the cached statement's index), used by the
+            amount component when it is enabled in MATCH_WEIGHTS
+
+    Returns:
+        pd.Series: integer scores aligned on df.index, identical to the row-wise scores.
+    """
+    row_count = len(df)
+    score = np.zeros(row_count, dtype=np.float64)
+    total_weight = np.zeros(row_count, dtype=np.float64)
+
+    # --- 1. Date Comparison ---
+    invoice_date_obj = parse_invoice_date(invoice_data.get('date'))
+    if invoice_date_obj is not None and 'date' in df.columns:
+        csv_dates = df['date']
+        if not pd.api.types.is_datetime64_any_dtype(csv_dates):
+            csv_dates = pd.to_datetime(csv_dates, errors='coerce')
+        valid = csv_dates.notna().to_numpy()
+        within = ((csv_dates - invoice_date_obj).abs() <= pd.Timedelta(days=date_tolerance_days)).to_numpy()
+        date_scores = np.where(within, 100, 0) * MATCH_WEIGHTS['date']
+        score += np.where(valid, date_scores, 0.0)
+        total_weight += np.where(valid, MATCH_WEIGHTS['date'], 0.0)
+
+    # --- 2. Amount Comparison (integer cents, only when 'amount' is enabled in MATCH_WEIGHTS) ---
+    invoice_cents = amount_to_cents(invoice_data.get('amount'))
+    if 'amount' in MATCH_WEIGHTS and invoice_cents is not None and 'amount' in df.columns:
+        if amount_index is None:
+            amount_index = AmountIndex(amounts_to_cents(df['amount']))
+        valid = df['amount'].notna().to_numpy()
+        matched = amount_index.mask(invoice_cents, AMOUNT_TOLERANCE_CENTS, row_count)
+        amount_scores = np.where(matched, 100, 0) * MATCH_WEIGHTS['amount']
+        score += np.where(valid, amount_scores, 0.0)
+        total_weight += np.where(valid, MATCH_WEIGHTS['amount'], 0.0)
+
+    # --- 3. Currency Comparison (Case-insensitive Exact Match) ---
+    invoice_currency = _clean_invoice_field(invoice_data.get('currency'))
+    if invoice_currency is not None and 'currency' in df.columns:
+        csv_currency = df['currency']
+        csv_upper = csv_currency.astype(str).str.upper()
+        valid = (csv_currency.notna() & (csv_upper != 'N/A')).to_numpy()
+        same = (csv_upper.str.strip() == invoice_currency.upper().strip()).to_numpy()
+        currency_scores = np.where(same, 100, 0) * MATCH_WEIGHTS['currency']
+        score += np.where(valid, currency_scores, 0.0)
+        total_weight += np.where(valid, MATCH_WEIGHTS['currency'], 0.0)
+
+    # --- 4. Vendor Comparison (Normalized Fuzzy Match, once per distinct vendor) ---
+    invoice_vendor = _clean_invoice_field(invoice_data.get('vendor'))
+    if invoice_vendor is not None and 'vendor' in df.columns:
+        norm_invoice_vendor = normalize_vendor(invoice_vendor)
+        if norm_invoice_vendor:
+            # Cached statements already carry the normalized vendor column
+            if 'vendor_norm' in df.columns:
+                codes, uniques = pd.factorize(df['vendor_norm'])
+            else:
+                codes, uniques = pd.factorize(df['vendor'])
+                uniques = [normalize_vendor(str(csv_vendor)) for csv_vendor in uniques]
+            unique_scores = np.full(len(uniques) + 1, np.nan)  # last slot catches code -1 (missing vendor)
+            for i, norm_csv_vendor in enumerate(uniques):
+                if norm_csv_vendor:
+                    unique_scores[i] = vendor_similarity(norm_csv_vendor, norm_invoice_vendor)
+            vendor_scores = unique_scores[codes]
+            valid = ~np.isnan(vendor_scores)
+            score += np.where(valid, vendor_scores * MATCH_WEIGHTS['vendor'], 0.0)
+            total_weight += np.where(valid, MATCH_WEIGHTS['vendor'], 0.0)
+
+    # --- Normalize final score ---
+    has_weight = total_weight > 0
+    final_scores = np.minimum(100.0, score / np.where(has_weight, total_weight, 1.0))
+    final_scores = np.where(has_weight, np.round(final_scores), 0).astype(np.int64)
+    logger.debug(f"Vectorized scores computed for {row_count} rows ({int((~has_weight).sum())} rows without comparable fields).")
+    return pd.Series(final_scores, index=df.index, name='match_score')
+
 def find_matching_rows(df, invoice_data, threshold=70):
     """Finds matching rows and adds the match_score column."""
     logger.debug(f"Finding matching rows with invoice_data: {invoice_data}")
@@ -264,7 +344,12 @@ def find_matching_rows(df, invoice_data, threshold=70):
             logger.error(f"Error calculating score for row: {row.to_dict()}. Error: {e}", exc_info=True)
             return 0 # Return 0 score if calculation fails for a row
 
-    df['match_score'] = df.apply(lambda row: safe_calculate_score(row, invoice_data), axis=1)
+    try:
+        df['match_score'] = calculate_match_scores(df, invoice_data, date_tolerance_days=1)
+    except Exception as e:
+        # Fall back to the row-wise scorer, which isolates errors per row
+        logger.error(f"Vectorized scoring failed, falling back to row-wise scoring. Error: {e}", exc_info=True)
+        df['match_score'] = df.apply(lambda row: safe_calculate_score(row, invoice_data), axis=1)
     logger.debug(f"Match scores calculated (showing first 5):\n{df['match_score'].head()}")
 
     # Filter by threshold
@@ -276,6 +361,116 @@ def find_matching_rows(df, invoice_data, threshold=70):
 
     return matching_df
 
+def get_match_candidates(statement, invoice_data):
+    """
+    Finds the statement rows that can match the invoice (same date window and amount) and scores
+    their vendor similarity, before any threshold is applied.
+
+    Args:
+        statement (ParsedStatement): Cached statement with its date and amount indexes
+        invoice_data (dict): Extracted invoice data
+
+    Returns:
+        tuple: (np.ndarray of row ids in statement order, np.ndarray of vendor similarity scores)
+    """
+    df = statement.df
+
+    # Convert invoice date to datetime
+    invoice_date = pd.to_datetime(invoice_data.get('date'))
+    invoice_cents = amount_to_cents(invoice_data.get('amount', 0))
+    invoice_vendor = invoice_data.get('vendor', '').lower()
+
+    # Only rows inside the date window can match: take them from the date index
+    if pd.isna(invoice_date) or statement.date_index is None:
+        logger.warning("Invoice date or statement dates missing, no candidate rows.")
+        candidate_ids = np.array([], dtype=np.int64)
+    else:
+        invoice_day = np.datetime64(invoice_date.date(), 'D').astype(np.int64)
+        candidate_ids = statement.date_index.candidates(invoice_day - MATCH_DATE_WINDOW_DAYS, invoice_day + MATCH_DATE_WINDOW_DAYS)
+    logger.debug(f"Date blocking kept {len(candidate_ids)} candidate rows out of {len(df)}")
+
+    # Amounts are compared as integer cents through the amount index, then combined with the date window
+    if invoice_cents is None or statement.amount_index is None:
+        logger.warning("Invoice amount or statement amounts missing, no candidate rows.")
+        candidate_ids = np.array([], dtype=np.int64)
+    else:
+        amount_ids = statement.amount_index.lookup(invoice_cents, AMOUNT_TOLERANCE_CENTS)
+        candidate_ids = np.intersect1d(candidate_ids, amount_ids, assume_unique=True)
+    logger.debug(f"Amount lookup kept {len(candidate_ids)} candidate rows")
+
+    # Calculate similarity score for vendor names
+    vendor_lower = df['vendor_lower'].iloc[candidate_ids]
+    scores = np.array([fuzz.ratio(vendor, invoice_vendor) for vendor in vendor_lower], dtype=np.int64)
+    return candidate_ids, scores
+
+class MatchCandidatesCache:
+    """
+    LRU cache of the per-invoice candidate rows and their scores, computed without threshold.
+
+    Entries are keyed by statement file version and by the invoice fields used for matching, so
+    a threshold change (e.g. the slider in the UI) only re-filters the cached score vector.
+    """
+
+    def __init__(self, max_entries=MATCH_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(statement, invoice_data):
+        fields = {field: invoice_data.get(field) for field in ('date', 'amount', 'vendor')}
+        return (statement.path, statement.signature, json.dumps(fields, sort_keys=True, default=str))
+
+    def get(self, statement, invoice_data):
+        """Returns (row ids, scores) for the invoice, computing them on the first request only."""
+        key = self._key(statement, invoice_data)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        entry = get_match_candidates(statement, invoice_data)
+        with self._lock:
+            self._entries[key] = entry
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+match_candidates_cache = MatchCandidatesCache()
+
+def build_match(df, row_id, score):
+    """Formats a statement row as a match result."""
+    row = df.iloc[row_id]
+    return {
+        'date': row['date'].strftime('%Y-%m-%d'),
+        'amount': float(row['amount']),
+        'currency': row['currency'],
+        'vendor': row['vendor'],
+        'source': row['source'],
+        'match_score': int(score)
+    }
+
 def get_matching_rows(file_path, invoice_data={}, threshold=70):
     """
     Find matching rows in CSV file based on invoice data.
@@ -283,26 +478,10 @@ def get_matching_rows(file_path, invoice_data={}, threshold=70):
     logger.info(f"Getting matching rows for file: {file_path} with invoice_data: {invoice_data}")
     
     try:
-        # Read CSV file
-        logger.debug(f"Reading CSV file: {file_path}")
-        df = pd.read_csv(file_path)
-        
-        # Log DataFrame info before cleaning
-        logger.debug("CSV DataFrame head before cleaning:\n%s", df.head())
-        logger.debug("CSV DataFrame dtypes before cleaning:\n%s", df.dtypes)
-        
-        # Clean and convert data types
-        df['date'] = pd.to_datetime(df['date'], errors='coerce', infer_datetime_format=True)
-        df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
-        
-        # Log DataFrame info after cleaning
-        logger.debug("CSV DataFrame head after cleaning:\n%s", df.head())
-        logger.debug("CSV DataFrame dtypes after cleaning:\n%s", df.dtypes)
-        
-        # Convert invoice date to datetime
-        invoice_date = pd.to_datetime(invoice_data.get('date'))
-        invoice_amount = float(invoice_data.get('amount', 0))
-        invoice_vendor = invoice_data.get('vendor', '').lower()
+        # Load the cleaned statement (parsed once per file version, shared across invoices)
+        logger.debug(f"Loading statement: {file_path}")
+        statement = load_statement(file_path)
+        df = statement.df
         
         logger.debug(f"Finding matching rows with invoice_data: {invoice_data}")
         
@@ -310,27 +489,11 @@ def get_matching_rows(file_path, invoice_data={}, threshold=70):
             logger.warning("DataFrame is empty or None, cannot find matches.")
             return []
             
-        # Find matches based on criteria
-        matches = []
-        for _, row in df.iterrows():
-            # Calculate similarity score for vendor names
-            vendor_similarity = fuzz.ratio(row['vendor'].lower(), invoice_vendor)
-            
-            # Check if dates match exactly and amounts are within 0.01
-            date_match = row['date'].date() == invoice_date.date()
-            amount_match = abs(row['amount'] - invoice_amount) < 0.01
-            
-            # If all criteria match and similarity is above threshold
-            if date_match and amount_match and vendor_similarity >= threshold:
-                match_info = {
-                    'date': row['date'].strftime('%Y-%m-%d'),
-                    'amount': row['amount'],
-                    'currency': row['currency'],
-                    'vendor': row['vendor'],
-                    'source': row['source'],
-                    'match_score': vendor_similarity
-                }
-                matches.append(match_info)
+        # Find matches based on criteria: same date window and amount, vendor similarity above threshold.
+        # The score vector is cached, so another threshold only re-filters it.
+        candidate_ids, scores = match_candidates_cache.get(statement, invoice_data)
+        keep = scores >= threshold
+        matches = [build_match(df, row_id, score) for row_id, score in zip(candidate_ids[keep], scores[keep])]
         
         # Calculate and log confusion matrix
         confusion_results = calculate_confusion_matrix(df, matches, invoice_data.get('source', ''))
@@ -0,0 +1,165 @@
+import io
+import os
+import json
+import logging
+import threading
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from src.server.config.paths import PHASH_INDEX_PATH
+from src.server.config.settings import PHASH_MAX_DISTANCE
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 8  # 8 x 8 comparisons = 64-bit hash, stored as uint64
+
+# Number of set bits of every byte value, for numpy versions without np.bitwise_count
+_BYTE_POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+
+def hamming_distances(hashes, image_hash):
+    """Hamming distances between one 64-bit hash and an array of hashes."""
+    xor = np.asarray(hashes, dtype=np.uint64) ^ np.uint64(image_hash)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(xor).astype(np.int64)
+    return _BYTE_POPCOUNT[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1).astype(np.int64)
+
+
+def dhash(image_bytes, hash_size=HASH_SIZE):
+    """
+    Difference hash of an image: the image is reduced to (hash_size + 1) x hash_size grayscale
+    pixels and each bit tells whether a pixel is brighter than its right neighbour. Re-scans,
+    re-compressions and resizes of the same receipt give hashes a few bits apart.
+
+    JPEG files are decoded at a reduced scale (draft mode), so hashing a 12 MP photo only
+    decodes a fraction of its pixels.
+
+    Returns:
+        int: hash of hash_size * hash_size bits
+    """
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image.draft('L', (hash_size * 8, hash_size * 8))
+        image = ImageOps.exif_transpose(image).convert('L')
+        pixels = np.asarray(image.resize((hash_size + 1, hash_size), Image.BILINEAR), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+class PerceptualIndex:
+    """
+    Perceptual hashes of the invoices already extracted, persisted as an append-only JSON lines
+    file, so near-duplicates (same receipt photographed twice, re-scanned at another resolution)
+    are flagged as possible duplicates.
+
+    A near match never reuses an extraction: two receipts of the same shop can hash a few bits
+    apart. Only byte-identical images share an extraction, through the content-keyed
+    extraction cache.
+
+    Each entry holds the hash, the image name, the extraction cache key and the extraction
+    version (prompt, model and preprocessing).
+    """
+
+    def __init__(self, path=PHASH_INDEX_PATH, max_distance=PHASH_MAX_DISTANCE):
+        self.path = path
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._hashes = None
+        self._records = None
+        self.lookups = 0
+        self.near_duplicates = 0
+
+    def _load(self):
+        """Reads the history on first use. Called with the lock held."""
+        if self._records is not None:
+            return
+        hashes, records = [], []
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        hashes.append(int(record['hash'], 16))
+                        records.append(record)
+                    except (ValueError, KeyError):
+                        # A line cut by a crash is skipped
+                        continue
+        self._hashes = np.array(hashes, dtype=np.uint64)
+        self._records = records
+
+    def find(self, image_hash, version=None):
+        """
+        Closest indexed image within max_distance bits (restricted to one extraction version when given).
+
+        Returns:
+            dict or None: the indexed record, with its 'distance'
+        """
+        with self._lock:
+            self._load()
+            self.lookups += 1
+            if not len(self._hashes):
+                return None
+            distances = hamming_distances(self._hashes, image_hash)
+            candidates = np.flatnonzero(distances <= self.max_distance)
+            if version is not None:
+                candidates = [i for i in candidates if self._records[i].get('version') == version]
+            if not len(candidates):
+                return None
+            best = min(candidates, key=lambda i: (distances[i], -i))
+            self.near_duplicates += 1
+            return {**self._records[best], 'distance': int(distances[best])}
+
+    def add(self, image_hash, image, key=None, version=None):
+        """Records an extracted image in the history."""
+        record = {'hash': f"{image_hash:016x}", 'image': image, 'key': key, 'version': version}
+        with self._lock:
+            self._load()
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+            self._hashes = np.append(self._hashes, np.uint64(image_hash))
+            self._records.append(record)
+
+    def find_duplicates(self, image_paths):
+        """
+        Flags the near-duplicates of a batch, against the earlier images of the batch and the history.
+
+        Returns:
+            list: for each image, None or {'duplicate_of', 'distance', 'source' ('batch' or 'history')}
+        """
+        batch_hashes = []
+        flags = []
+        for image_path in image_paths:
+            try:
+                with open(image_path, 'rb') as f:
+                    image_hash = dhash(f.read())
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not hash {image_path}: {e}")
+                flags.append(None)
+                continue
+
+            flag = None
+            if batch_hashes:
+                distances = hamming_distances([h for _, h in batch_hashes], image_hash)
+                best = int(np.argmin(distances))
+                if distances[best] <= self.max_distance:
+                    flag = {'duplicate_of': batch_hashes[best][0], 'distance': int(distances[best]), 'source': 'batch'}
+            if flag is None:
+                match = self.find(image_hash)
+                if match is not None:
+                    flag = {'duplicate_of': match['image'], 'distance': match['distance'], 'source': 'history'}
+            flags.append(flag)
+            batch_hashes.append((os.path.basename(image_path), image_hash))
+        return flags
+
+    def stats(self):
+        with self._lock:
+            return {
+                "indexed": len(self._records) if self._records is not None else None,
+                "lookups": self.lookups,
+                "near_duplicates": self.near_duplicates,
+                "max_distance": self.max_distance,
+            }
+
+
+perceptual_index = PerceptualIndex()
@@ -0,0 +1,200 @@
+import time
+import queue
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the items on a queue (one per downstream worker)
+_DONE = object()
+# How often blocked workers check whether the pipeline was stopped
+_POLL_SECONDS = 0.1
+
+
+class Stage:
+    """
+    One step of a StagedPipeline: workers threads apply function to each item of the input queue.
+
+    function(item) returns the item handed to the next stage. It should turn its own failures
+    into a result (like the {"success", "error"} dicts of the API); an exception escaping it is
+    logged and on_error(item, error) is handed to the next stage instead. Without on_error, that
+    is {"success": False, "error": "<stage>: <error>", "data": None}.
+    """
+
+    def __init__(self, name, function, workers=1, on_error=None):
+        self.name = name
+        self.function = function
+        self.workers = max(1, workers)
+        self.on_error = on_error
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.max_queue_depth = 0
+        self.input = None
+
+    def record(self, busy, blocked, failed):
+        with self._lock:
+            self.processed += 1
+            self.errors += int(failed)
+            self.busy_seconds += busy
+            self.blocked_seconds += blocked
+
+    def observe_depth(self):
+        depth = self.input.qsize()
+        with self._lock:
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def failed(self, item, error):
+        """Item handed to the next stage when function(item) raised error."""
+        if self.on_error is not None:
+            try:
+                return self.on_error(item, error)
+            except Exception as e:
+                logger.error(f"Error handler of pipeline stage '{self.name}' failed: {e}", exc_info=True)
+        return {"success": False, "error": f"{self.name}: {error}", "data": None}
+
+
+class StagedPipeline:
+    """
+    Producer/consumer stages linked by bounded queues, so the stages overlap: while invoices are
+    extracted (network bound), earlier ones are matched (CPU bound) and read from disk.
+
+    A full queue blocks the stage feeding it (backpressure), so at most queue_size items wait
+    between two stages whatever the batch size, and a slow consumer of run() slows the whole
+    pipeline down instead of piling results up in memory.
+
+    stats() reports, per stage, the current and highest queue depth, throughput, how busy its
+    workers are and how long they were blocked by the next stage: the stage with the highest
+    utilization limits the throughput.
+    """
+
+    def __init__(self, stages, queue_size=8):
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self._stop = threading.Event()
+        self._started = None
+        self._finished = None
+        self._output = None
+
+    def _put(self, target, item):
+        """Blocking put that gives up when the pipeline is stopped; returns the seconds spent blocked."""
+        started = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=_POLL_SECONDS)
+                break
+            except queue.Full:
+                continue
+        return time.perf_counter() - started
+
+    def _get(self, source):
+        while not self._stop.is_set():
+            try:
+                return source.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _worker(self, stage, output, downstream_workers, remaining):
+        while True:
+            item = self._get(stage.input)
+            if item is _DONE:
+                break
+            stage.observe_depth()
+            started = time.perf_counter()
+            failed = False
+            try:
+                item = stage.function(item)
+            except Exception as e:
+                logger.error(f"Pipeline stage '{stage.name}' failed: {e}", exc_info=True)
+                item = stage.failed(item, e)
+                failed = True
+            busy = time.perf_counter() - started
+            blocked = self._put(output, item)
+            stage.record(busy, blocked, failed)
+
+        # The last worker of a stage tells every worker of the next stage that no more items are coming
+        with remaining['lock']:
+            remaining['workers'] -= 1
+            last = remaining['workers'] == 0
+        if last:
+            for _ in range(downstream_workers):
+                self._put(output, _DONE)
+
+    def _feed(self, items):
+        first = self.stages[0]
+        try:
+            for item in items:
+                if self._stop.is_set():
+                    break
+                self._put(first.input, item)
+        finally:
+            for _ in range(first.workers):
+                self._put(first.input, _DONE)
+
+    def run(self, items):
+        """
+        Pushes items through every stage.
+
+        Yields:
+            the items returned by the last stage, in completion order
+        """
+        for stage in self.stages:
+            stage.input = queue.Queue(maxsize=self.queue_size)
+        self._output = queue.Queue(maxsize=self.queue_size)
+        self._stop.clear()
+        self._started = time.perf_counter()
+        self._finished = None
+
+        threads = [threading.Thread(target=self._feed, args=(items,), name='pipeline-feed', daemon=True)]
+        for position, stage in enumerate(self.stages):
+            last_stage = position == len(self.stages) - 1
+            output = self._output if last_stage else self.stages[position + 1].input
+            downstream_workers = 1 if last_stage else self.stages[position + 1].workers
+            remaining = {'lock': threading.Lock(), 'workers': stage.workers}
+            for number in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._worker, args=(stage, output, downstream_workers, remaining),
+                    name=f"pipeline-{stage.name}-{number}", daemon=True
+                ))
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = self._get(self._output)
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            # Also reached when the consumer stops iterating early: release the blocked workers
+            self._stop.set()
+            for thread in threads:
+                thread.join(timeout=1)
+            self._finished = time.perf_counter()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        """Per-stage queue depth, throughput (items/s), utilization and backpressure."""
+        if self._started is None:
+            return {}
+        elapsed = (self._finished or time.perf_counter()) - self._started
+        stats = {}
+        for stage in self.stages:
+            with stage._lock:
+                stats[stage.name] = {
+                    "workers": stage.workers,
+                    "queue_depth": stage.input.qsize(),
+                    "max_queue_depth": stage.max_queue_depth,
+                    "processed": stage.processed,
+                    "errors": stage.errors,
+                    "throughput": stage.processed / elapsed if elapsed else 0.0,
+                    "utilization": stage.busy_seconds / (stage.workers * elapsed) if elapsed else 0.0,
+                    "blocked_seconds": stage.blocked_seconds,
+                }
+        busiest = max(stats, key=lambda name: stats[name]["utilization"]) if stats else None
+        return {"elapsed_seconds": elapsed, "queue_size": self.queue_size, "bottleneck": busiest, "stages": stats}
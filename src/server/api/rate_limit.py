@@ -0,0 +1,60 @@
+import time
+import logging
+import threading
+
+from src.server.config.settings import MISTRAL_RATE_LIMIT_PER_SECOND, MISTRAL_RATE_LIMIT_BURST
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Tokens are refilled continuously at `rate` per second, up to `capacity`. acquire() takes
+    one token, sleeping outside the lock until one is available, so every thread sharing the
+    bucket stays within the same quota whatever the number of calls in flight.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = max(1, int(capacity))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waited_seconds = 0.0
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Blocks until a token is available and takes it. A rate <= 0 disables the limit."""
+        if self.rate <= 0:
+            return
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self.acquired += 1
+                    self.waited_seconds += now - started
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "capacity": self.capacity,
+                "acquired": self.acquired,
+                "waited_seconds": self.waited_seconds,
+            }
+
+
+# Shared by every Mistral call of the process, tuned to the account quota
+mistral_rate_limiter = TokenBucket(MISTRAL_RATE_LIMIT_PER_SECOND, MISTRAL_RATE_LIMIT_BURST)
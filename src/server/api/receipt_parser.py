@@ -0,0 +1,197 @@
+import re
+import logging
+import threading
+from datetime import date
+
+logger = logging.getLogger(__name__)
+
+# Bump when the rules change, so cached extractions made by older rules are not reused
+PARSER_VERSION = 2
+
+CURRENCY_SYMBOLS = {'$': 'USD', '€': 'EUR', '£': 'GBP', '¥': 'JPY', '₹': 'INR', 'CHF': 'CHF'}
+CURRENCY_CODES = ['USD', 'EUR', 'GBP', 'CAD', 'AUD', 'CHF', 'JPY', 'INR', 'SGD', 'MYR', 'IDR']
+# A bare '$' is also the symbol of CAD, AUD, SGD...: USD is only a guess
+DOLLAR_CONFIDENCE = 0.7
+# Currencies whose receipts write numeric dates day first; USD ones write them month first
+DAY_FIRST_CURRENCIES = {'EUR', 'GBP', 'CHF', 'INR', 'AUD', 'SGD', 'MYR', 'IDR'}
+MONTH_FIRST_CURRENCIES = {'USD'}
+# Confidence of a date that reads both ways (e.g. 03/04/2024) when the currency does not settle the order
+AMBIGUOUS_DATE_CONFIDENCE = 0.5
+# Same default as the extraction prompt
+DEFAULT_CURRENCY = 'USD'
+
+# Total lines, most specific first; subtotals and tax lines are never totals
+TOTAL_KEYWORDS = ['grand total', 'total due', 'amount due', 'balance due', 'total ttc', 'montant total', 'net a payer', 'total']
+NOT_TOTAL_RE = re.compile(r'sub\s*-?\s*total|total\s+(?:tax|tva|ht|items?|qty|discount|savings)', re.IGNORECASE)
+# Lines that are never the vendor name
+VENDOR_STOPWORDS_RE = re.compile(r'receipt|invoice|facture|welcome|bienvenue|tel\b|phone|www\.|http|@|order|table|cashier|date', re.IGNORECASE)
+# Address lines following the vendor name: street number and name, street type or postcode
+ADDRESS_RE = re.compile(r'^\d{1,5}\s*,?\s+[^\W\d]{2,}|\b(?:rue|avenue|av|bd|boulevard|place|chemin|route|street|st|road|rd|ave|blvd|lane|suite)\b\.?|\b\d{5}(?:-\d{4})?\b', re.IGNORECASE)
+# Address lines merged into the vendor, like the extraction prompt asks ("nom et adresse du vendeur")
+MAX_ADDRESS_LINES = 2
+
+_ISO_DATE_RE = re.compile(r'\b(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})\b')
+_NUMERIC_DATE_RE = re.compile(r'\b(\d{1,2})[-/.](\d{1,2})[-/.](\d{4}|\d{2})\b')
+_AMOUNT_RE = re.compile(r'(\d{1,3}(?:[,.]\d{3})*[.,]\d{2}|\d+[.,]\d{2})(?!\d)')
+_CODE_RE = re.compile(r'\b(' + '|'.join(CURRENCY_CODES) + r')\b')
+
+
+def _valid_date(year, month, day):
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _find_dates(text, day_first=None):
+    """
+    Dates of the text, each with whether its reading is certain.
+
+    A numeric date whose two first numbers can both be a month (03/04/2024) is read day first
+    or month first as day_first says, and is only certain when day_first is known (not None);
+    without it the US order (month/day) is assumed.
+
+    Returns:
+        list: (date, certain) tuples
+    """
+    dates = []
+    for match in _ISO_DATE_RE.finditer(text):
+        parsed = _valid_date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        if parsed:
+            dates.append((parsed, True))
+    for match in _NUMERIC_DATE_RE.finditer(text):
+        first, second, year = int(match.group(1)), int(match.group(2)), int(match.group(3))
+        year = year + 2000 if year < 100 else year
+        ambiguous = first <= 12 and second <= 12 and first != second
+        if first > 12 or (ambiguous and day_first):
+            parsed = _valid_date(year, second, first)
+        else:
+            parsed = _valid_date(year, first, second)
+        if parsed:
+            dates.append((parsed, not ambiguous or day_first is not None))
+    return dates
+
+
+def _parse_amount(token):
+    """'1,234.56', '1.234,56' and '12.50' to float; the last separator is the decimal one."""
+    integer, decimals = token[:-3], token[-2:]
+    return float(f"{re.sub(r'[,.]', '', integer) or 0}.{decimals}")
+
+
+def _find_total(lines):
+    """Amount on the most specific total line, with its keyword rank (None when no total line)."""
+    for rank, keyword in enumerate(TOTAL_KEYWORDS):
+        for line in reversed(lines):
+            lowered = line.lower()
+            if keyword not in lowered or NOT_TOTAL_RE.search(line):
+                continue
+            amounts = _AMOUNT_RE.findall(line)
+            if amounts:
+                return _parse_amount(amounts[-1]), rank
+    return None, None
+
+
+def _find_currency(text):
+    codes = _CODE_RE.findall(text)
+    if codes:
+        return max(set(codes), key=codes.count), 1.0
+    for symbol, code in CURRENCY_SYMBOLS.items():
+        if symbol in text:
+            return code, DOLLAR_CONFIDENCE if symbol == '$' else 1.0
+    return DEFAULT_CURRENCY, 0.6
+
+
+def _address_lines(lines):
+    """Leading lines that look like an address (at most MAX_ADDRESS_LINES)."""
+    address = []
+    for line in lines[:MAX_ADDRESS_LINES]:
+        candidate = line.strip(' *-=#:')
+        if (not ADDRESS_RE.search(candidate) or VENDOR_STOPWORDS_RE.search(candidate)
+                or _find_dates(candidate) or _AMOUNT_RE.search(candidate)):
+            break
+        address.append(candidate)
+    return address
+
+
+def _find_vendor(lines):
+    """Vendor name (first plausible line among the first five) followed by its address lines, if any."""
+    for position, line in enumerate(lines[:5]):
+        candidate = line.strip(' *-=#:')
+        letters = sum(char.isalpha() for char in candidate)
+        if letters < 3 or VENDOR_STOPWORDS_RE.search(candidate) or _find_dates(candidate):
+            continue
+        clean = letters / len(candidate) >= 0.6 and len(candidate) <= 40
+        vendor = ', '.join([candidate] + _address_lines(lines[position + 1:]))
+        return vendor, 0.9 if clean and position < 3 else 0.6
+    return None, 0.0
+
+
+def parse_receipt_text(raw_text):
+    """
+    Deterministic extraction of date, amount, currency and vendor from the OCR text of a receipt.
+
+    Each field gets a confidence in [0, 1] and the overall confidence is the lowest of them, so
+    a single doubtful field sends the receipt to the LLM analysis step: a date that reads both
+    ways (03/04/2024) unless the currency settles the order, a bare '$', a vendor line that
+    does not look like a name.
+
+    Returns:
+        tuple: (dict with date (YYYY-MM-DD), amount, currency and vendor, confidence)
+    """
+    if not raw_text:
+        return {}, 0.0
+    lines = [line.strip() for line in raw_text.splitlines() if line.strip()]
+
+    currency, currency_confidence = _find_currency(raw_text)
+    # The currency, when certain, settles the order of ambiguous numeric dates (€ -> day first)
+    day_first = None
+    if currency_confidence == 1.0 and currency in DAY_FIRST_CURRENCIES | MONTH_FIRST_CURRENCIES:
+        day_first = currency in DAY_FIRST_CURRENCIES
+
+    dates = _find_dates(raw_text, day_first)
+    invoice_date = dates[0][0] if dates else None
+    if not dates:
+        date_confidence = 0.0
+    elif len({parsed for parsed, _ in dates}) > 1:
+        date_confidence = 0.5
+    else:
+        date_confidence = 1.0 if all(certain for _, certain in dates) else AMBIGUOUS_DATE_CONFIDENCE
+
+    amount, rank = _find_total(lines)
+    amount_confidence = 0.0 if amount is None else 1.0 if rank < len(TOTAL_KEYWORDS) - 1 else 0.9
+
+    vendor, vendor_confidence = _find_vendor(lines)
+
+    fields = {
+        'date': invoice_date.isoformat() if invoice_date else None,
+        'amount': amount,
+        'currency': currency,
+        'vendor': vendor
+    }
+    confidence = min(date_confidence, amount_confidence, currency_confidence, vendor_confidence)
+    return fields, confidence
+
+
+class HeuristicParserStats:
+    """How many receipts the heuristic parser handled alone, i.e. LLM analysis calls saved."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.accepted = 0
+
+    def record(self, accepted):
+        with self._lock:
+            self.attempts += 1
+            self.accepted += int(accepted)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "attempts": self.attempts,
+                "llm_calls_saved": self.accepted,
+                "saved_rate": self.accepted / self.attempts if self.attempts else 0.0,
+            }
+
+
+heuristic_parser_stats = HeuristicParserStats()
@@ -0,0 +1,284 @@
+import os
+import csv
+import json
+import logging
+
+import numpy as np
+
+from src.server.api.matching import get_matching_rows
+from src.server.api.benchmark import calculate_confusion_matrix
+from src.server.api.extract_data import get_extracted_data, reserve_mistral_connections
+from src.server.api.pipeline import Stage, StagedPipeline
+from src.server.api.statement_cache import load_statement
+from src.server.config.settings import (
+    EXTRACTION_CONCURRENCY,
+    PIPELINE_QUEUE_SIZE,
+    PIPELINE_LOAD_WORKERS,
+    PIPELINE_MATCH_WORKERS
+)
+
+logger = logging.getLogger(__name__)
+
+# Columns of the flat (CSV) reconciliation output, one row per invoice
+RESULT_COLUMNS = [
+    'invoice', 'status', 'error',
+    'date', 'amount', 'currency', 'vendor',
+    'matches', 'match_date', 'match_amount', 'match_currency', 'match_vendor', 'match_source', 'match_score',
+    'true_positive', 'false_positive', 'true_negative', 'false_negative'
+]
+
+
+def false_negative_confusion():
+    """Confusion of an invoice that could not be extracted or matched: counted as a false negative."""
+    return {
+        "confusion_matrix": [[0, 0], [1, 0]],  # [TN, FP], [FN, TP]
+        "metrics": {
+            "accuracy": 0.0,
+            "precision": 0.0,
+            "recall": 0.0,
+            "f1_score": 0.0
+        },
+        "counts": {
+            "true_positive": 0,
+            "false_positive": 0,
+            "true_negative": 0,
+            "false_negative": 1
+        }
+    }
+
+
+def combine_confusion_matrices(matrices_list):
+    """Combine multiple confusion matrices into one global matrix"""
+    if not matrices_list:
+        return None
+
+    # Initialize the global matrix with zeros
+    global_matrix = np.zeros((2, 2), dtype=int)
+
+    # Sum all individual matrices
+    for matrix in matrices_list:
+        if matrix is not None:
+            global_matrix += np.array(matrix["confusion_matrix"])
+
+    # Calculate global metrics
+    TP = global_matrix[1, 1]
+    FP = global_matrix[0, 1]
+    TN = global_matrix[0, 0]
+    FN = global_matrix[1, 0]
+
+    total = TP + FP + TN + FN
+    accuracy = (TP + TN) / total if total > 0 else 0
+    precision = TP / (TP + FP) if (TP + FP) > 0 else 0
+    recall = TP / (TP + FN) if (TP + FN) > 0 else 0
+    f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
+
+    return {
+        "confusion_matrix": global_matrix.tolist(),
+        "metrics": {
+            "accuracy": accuracy * 100,
+            "precision": precision * 100,
+            "recall": recall * 100,
+            "f1_score": f1 * 100
+        },
+        "counts": {
+            "true_positive": int(TP),
+            "false_positive": int(FP),
+            "true_negative": int(TN),
+            "false_negative": int(FN)
+        }
+    }
+
+
+def best_matches(match_list):
+    """Matches with the highest score (several rows on a tie)."""
+    if not match_list:
+        return []
+    max_score = max(match.get('match_score', 0) for match in match_list)
+    return [match for match in match_list if match.get('match_score', 0) == max_score]
+
+
+def failed_record(invoice_path, status, error):
+    """Record of an invoice that could not be reconciled (status 'extraction_failed' or 'matching_failed')."""
+    return {
+        'invoice': os.path.basename(invoice_path),
+        'invoice_path': invoice_path,
+        'status': status,
+        'error': error,
+        'extracted': {},
+        'raw_text': '',
+        'matches': [],
+        'best_matches': [],
+        'confusion': false_negative_confusion()
+    }
+
+
+def reconcile_invoice(csv_file_path, invoice_path, extraction, threshold=70):
+    """
+    Matches one extracted invoice against the statement and evaluates the match, like the home page
+    does for each invoice, without any UI.
+
+    A failed extraction or a matching error is counted as a false negative.
+
+    Args:
+        csv_file_path (str): Statement path
+        invoice_path (str): Invoice image path
+        extraction (dict): get_extracted_data result
+        threshold (int): Minimum vendor similarity score
+
+    Returns:
+        dict: invoice, status ('matched', 'unmatched', 'extraction_failed', 'matching_failed'), error,
+            extracted fields and raw text, all matches, best matches and confusion results
+    """
+    invoice_name = os.path.basename(invoice_path)
+    extraction = extraction or {}
+    invoice_data = {}
+    if extraction.get('success'):
+        invoice_data = (extraction.get('data') or {}).get('json') or {}
+    record = {
+        'invoice': invoice_name,
+        'invoice_path': invoice_path,
+        'status': None,
+        'error': None if extraction.get('success') else extraction.get('error', 'Unknown error'),
+        'extracted': invoice_data,
+        'raw_text': (extraction.get('data') or {}).get('raw_text', '') if extraction.get('success') else '',
+        'matches': [],
+        'best_matches': [],
+        'confusion': None
+    }
+
+    if not invoice_data:
+        record['status'] = 'extraction_failed'
+        record['error'] = record['error'] or 'Empty extraction'
+        record['confusion'] = false_negative_confusion()
+        return record
+
+    try:
+        match_list = get_matching_rows(csv_file_path, invoice_data, threshold=threshold)
+        if match_list is None:
+            raise ValueError("Matching returned no result")
+        record['matches'] = match_list
+        record['best_matches'] = best_matches(match_list)
+        record['status'] = 'matched' if match_list else 'unmatched'
+        # Reuse the statement already parsed for matching
+        record['confusion'] = calculate_confusion_matrix(load_statement(csv_file_path).df, match_list, invoice_name)
+    except Exception as e:
+        logger.error(f"Matching Error for {invoice_path}: {e}", exc_info=True)
+        record['status'] = 'matching_failed'
+        record['error'] = str(e)
+        record['confusion'] = false_negative_confusion()
+    return record
+
+
+def reconciliation_pipeline(csv_file_path, threshold=70, backend=None, use_cache=True,
+                            load_workers=PIPELINE_LOAD_WORKERS, extraction_workers=EXTRACTION_CONCURRENCY,
+                            match_workers=PIPELINE_MATCH_WORKERS, queue_size=PIPELINE_QUEUE_SIZE):
+    """
+    Three-stage pipeline: load (read the image from disk), extraction (API calls, within the rate
+    limit) and matching/evaluation (reconcile_invoice). Items are invoice paths, results are the
+    reconcile_invoice records, in completion order.
+
+    At most queue_size images wait between two stages, so memory stays bounded on large batches,
+    and the HTTP connection pool is grown to extraction_workers if it is smaller.
+    A stage raising still yields one record per invoice: an exception in the load or extraction
+    stage becomes an 'extraction_failed' record, one in the matching stage a 'matching_failed' one.
+
+    Returns:
+        StagedPipeline: iterate pipeline.run(invoice_paths), then read pipeline.stats()
+    """
+    def load(invoice_path):
+        with open(invoice_path, 'rb') as f:
+            return {'invoice_path': invoice_path, 'content': f.read()}
+
+    def load_failed(invoice_path, error):
+        # The extraction reads (and reports) the file itself
+        return {'invoice_path': invoice_path, 'content': None}
+
+    def extract(item):
+        extraction = get_extracted_data(item['invoice_path'], use_cache=use_cache, backend=backend,
+                                        image_content=item.pop('content'))
+        return {'invoice_path': item['invoice_path'], 'extraction': extraction}
+
+    def extraction_failed(item, error):
+        return {'invoice_path': item['invoice_path'], 'extraction': {"success": False, "error": str(error), "data": None}}
+
+    def match(item):
+        return reconcile_invoice(csv_file_path, item['invoice_path'], item['extraction'], threshold)
+
+    def matching_failed(item, error):
+        return failed_record(item['invoice_path'], 'matching_failed', str(error))
+
+    reserve_mistral_connections(extraction_workers)
+    return StagedPipeline([
+        Stage('load', load, load_workers, on_error=load_failed),
+        Stage('extraction', extract, extraction_workers, on_error=extraction_failed),
+        Stage('matching', match, match_workers, on_error=matching_failed),
+    ], queue_size=queue_size)
+
+
+def flatten_record(record):
+    """One flat row (RESULT_COLUMNS) per invoice, with its first best match."""
+    extracted = record.get('extracted') or {}
+    best = record['best_matches'][0] if record.get('best_matches') else {}
+    counts = (record.get('confusion') or {}).get('counts', {})
+    return {
+        'invoice': record['invoice'],
+        'status': record['status'],
+        'error': record.get('error'),
+        'date': extracted.get('date'),
+        'amount': extracted.get('amount'),
+        'currency': extracted.get('currency'),
+        'vendor': extracted.get('vendor'),
+        'matches': len(record.get('matches') or []),
+        'match_date': best.get('date'),
+        'match_amount': best.get('amount'),
+        'match_currency': best.get('currency'),
+        'match_vendor': best.get('vendor'),
+        'match_source': best.get('source'),
+        'match_score': best.get('match_score'),
+        'true_positive': counts.get('true_positive'),
+        'false_positive': counts.get('false_positive'),
+        'true_negative': counts.get('true_negative'),
+        'false_negative': counts.get('false_negative'),
+    }
+
+
+class ResultWriter:
+    """
+    Streams reconciliation records to a CSV (one flat row per invoice) or JSON lines file (the full
+    record, with every match), flushed after each invoice so a partial run keeps its results.
+    """
+
+    FORMATS = ('csv', 'jsonl')
+
+    def __init__(self, path, output_format=None, append=False):
+        self.path = path
+        self.format = output_format or ('jsonl' if path.lower().endswith(('.jsonl', '.ndjson')) else 'csv')
+        if self.format not in self.FORMATS:
+            raise ValueError(f"Unknown output format '{self.format}', expected one of {self.FORMATS}")
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        write_header = not (append and os.path.exists(path) and os.path.getsize(path) > 0)
+        self._file = open(path, 'a' if append else 'w', encoding='utf-8', newline='')
+        self._csv = None
+        if self.format == 'csv':
+            self._csv = csv.DictWriter(self._file, fieldnames=RESULT_COLUMNS)
+            if write_header:
+                self._csv.writeheader()
+        self.written = 0
+
+    def write(self, record):
+        if self._csv is not None:
+            self._csv.writerow(flatten_record(record))
+        else:
+            self._file.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+        self._file.flush()
+        self.written += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
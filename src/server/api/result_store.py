@@ -0,0 +1,225 @@
+import sys
+import math
+from array import array
+
+import numpy as np
+import pandas as pd
+
+# Code of a missing value in a text column
+MISSING_CODE = -1
+
+
+class _Column:
+    """
+    One column of a ResultStore, typed by the values it receives: integers and floats go to a
+    typed array (8 bytes per row), strings are dictionary encoded (a 4-byte code per row plus
+    each distinct value once), anything else to a plain list.
+
+    A value that does not fit the current kind converts the column to a more general one
+    (int -> float -> object, text -> object), once.
+    """
+
+    def __init__(self, rows=0):
+        self.kind = None
+        self.missing = rows  # missing values seen before the kind is known
+        self.values = None
+        self.categories = None  # value -> code
+        self.labels = None  # code -> value
+        self.codes = None
+
+    def __len__(self):
+        if self.kind is None:
+            return self.missing
+        return len(self.codes) if self.kind == 'text' else len(self.values)
+
+    @staticmethod
+    def _kind_of(value):
+        if isinstance(value, bool):
+            return 'object'
+        if isinstance(value, (int, np.integer)):
+            return 'int'
+        if isinstance(value, (float, np.floating)):
+            return 'float'
+        if isinstance(value, str):
+            return 'text'
+        return 'object'
+
+    def _start(self, kind):
+        if kind == 'int' and self.missing:
+            # Integers stay exact while the column has no missing value
+            kind = 'float'
+        self.kind = kind
+        if kind == 'int':
+            self.values = array('q')
+        elif kind == 'float':
+            self.values = array('d', [math.nan]) * self.missing
+        elif kind == 'text':
+            self.categories = {}
+            self.labels = []
+            self.codes = array('i', [MISSING_CODE]) * self.missing
+        else:
+            self.values = [None] * self.missing
+        self.missing = 0
+
+    def _convert(self, kind):
+        values = list(self)
+        self.kind = kind
+        self.categories = self.labels = self.codes = None
+        if kind == 'float':
+            self.values = array('d', [math.nan if value is None else value for value in values])
+        else:
+            self.values = values
+
+    def append(self, value):
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            self._append_missing()
+            return
+        kind = self._kind_of(value)
+        if self.kind is None:
+            self._start(kind)
+        elif kind != self.kind:
+            if {kind, self.kind} == {'int', 'float'}:
+                if self.kind == 'int':
+                    self._convert('float')
+            else:
+                self._convert('object')
+
+        if self.kind == 'text':
+            code = self.categories.get(value)
+            if code is None:
+                code = self.categories[value] = len(self.labels)
+                self.labels.append(value)
+            self.codes.append(code)
+        elif self.kind == 'int':
+            self.values.append(int(value))
+        elif self.kind == 'float':
+            self.values.append(float(value))
+        else:
+            self.values.append(value)
+
+    def _append_missing(self):
+        if self.kind is None:
+            self.missing += 1
+        elif self.kind == 'text':
+            self.codes.append(MISSING_CODE)
+        elif self.kind == 'int':
+            self._convert('float')
+            self.values.append(math.nan)
+        elif self.kind == 'float':
+            self.values.append(math.nan)
+        else:
+            self.values.append(None)
+
+    def get(self, position):
+        if self.kind is None:
+            return None
+        if self.kind == 'text':
+            code = self.codes[position]
+            return None if code == MISSING_CODE else self.labels[code]
+        value = self.values[position]
+        if self.kind == 'float' and math.isnan(value):
+            return None
+        return value
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self.get(position)
+
+    def to_series(self):
+        if self.kind is None:
+            return pd.Series([None] * self.missing, dtype=object)
+        if self.kind == 'text':
+            codes = np.frombuffer(self.codes, dtype=np.int32).copy() if len(self.codes) else np.array([], dtype=np.int32)
+            return pd.Series(pd.Categorical.from_codes(codes, categories=pd.Index(self.labels, dtype=object)))
+        if self.kind == 'int':
+            return pd.Series(np.frombuffer(self.values, dtype=np.int64).copy() if len(self.values) else np.array([], dtype=np.int64))
+        if self.kind == 'float':
+            return pd.Series(np.frombuffer(self.values, dtype=np.float64).copy() if len(self.values) else np.array([], dtype=np.float64))
+        return pd.Series(self.values, dtype=object)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the column: its buffer, plus each distinct string (text) or each value (object)."""
+        if self.kind is None:
+            return 0
+        if self.kind == 'text':
+            return self.codes.itemsize * len(self.codes) + sum(sys.getsizeof(value) for value in self.labels)
+        if self.kind in ('int', 'float'):
+            return self.values.itemsize * len(self.values)
+        return 8 * len(self.values) + sum(sys.getsizeof(value) for value in self.values if value is not None)
+
+
+class ResultStore:
+    """
+    Append-only, columnar store for result rows (dicts), replacing a DataFrame grown with
+    pd.concat after each invoice, which copies every earlier row on each append (quadratic
+    over a batch).
+
+    append() is amortized O(1): each value goes to the typed array of its column. A DataFrame
+    is only built by to_dataframe(), when the table is displayed or downloaded, and is reused
+    until the next append. rows() iterates the stored rows from any position, e.g. to display
+    or export the new ones only.
+
+    Columns appear in the order they are first seen; rows missing a column get None.
+    """
+
+    def __init__(self, rows=None):
+        self._columns = {}
+        self._rows = 0
+        self._frame = None
+        if rows:
+            self.extend(rows)
+
+    def append(self, row):
+        for name in row:
+            if name not in self._columns:
+                self._columns[name] = _Column(self._rows)
+        for name, column in self._columns.items():
+            column.append(row.get(name))
+        self._rows += 1
+        self._frame = None
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def __len__(self):
+        return self._rows
+
+    @property
+    def empty(self):
+        """Same meaning as DataFrame.empty, so callers can test a store like the DataFrame it replaces."""
+        return self._rows == 0
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def rows(self, start=0):
+        """
+        Iterates over the rows from position start, without building a DataFrame.
+
+        Yields:
+            dict: one row, with every column
+        """
+        for position in range(start, self._rows):
+            yield {name: column.get(position) for name, column in self._columns.items()}
+
+    def __iter__(self):
+        return self.rows()
+
+    def to_dataframe(self):
+        """The rows as a DataFrame (text columns as categoricals), cached until the next append."""
+        if self._frame is None:
+            self._frame = pd.DataFrame({name: column.to_series() for name, column in self._columns.items()})
+        return self._frame
+
+    def memory_usage(self):
+        """Bytes held by the columns, in total and per row."""
+        nbytes = sum(column.nbytes for column in self._columns.values())
+        return {
+            "rows": self._rows,
+            "columns": len(self._columns),
+            "bytes": nbytes,
+            "bytes_per_row": nbytes / self._rows if self._rows else 0.0
+        }
@@ -0,0 +1,170 @@
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from src.server.config.settings import (
+    MAX_RETRIES,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    RETRY_DEADLINE_SECONDS,
+    CIRCUIT_BREAKER_FAILURES,
+    CIRCUIT_BREAKER_RESET_SECONDS,
+    HEDGE_DELAY_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Statuses meaning the API itself is unhealthy (counted by the circuit breaker)
+SERVER_ERROR_STATUSES = frozenset({500, 502, 503, 504})
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the API while the circuit breaker is open."""
+
+
+class RetryPolicy:
+    """
+    When and how long to wait before retrying an API call.
+
+    Delays follow the "decorrelated jitter" scheme (each delay is drawn between base_delay and
+    three times the previous one, capped at max_delay), so concurrent workers spread their
+    retries instead of hitting the API at the same moment. A Retry-After header, when present,
+    takes precedence. No retry is started once it would end after the deadline budget.
+    """
+
+    def __init__(self, max_attempts=MAX_RETRIES, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY,
+                 deadline_seconds=RETRY_DEADLINE_SECONDS, hedge_delay=HEDGE_DELAY_SECONDS):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline_seconds = deadline_seconds
+        self.hedge_delay = hedge_delay
+
+    @staticmethod
+    def is_retryable(status_code):
+        return status_code in RETRYABLE_STATUSES
+
+    def next_delay(self, previous_delay):
+        """Decorrelated jitter: uniform between base_delay and 3 x the previous delay, capped at max_delay."""
+        upper = max(self.base_delay, previous_delay * 3)
+        return min(self.max_delay, random.uniform(self.base_delay, upper))
+
+    @staticmethod
+    def retry_after(response):
+        """Delay requested by a Retry-After header (seconds or HTTP date), or None."""
+        value = response.headers.get('Retry-After') if response is not None else None
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def deadline(self, started):
+        """Monotonic time after which no retry may start (None without deadline budget)."""
+        return started + self.deadline_seconds if self.deadline_seconds > 0 else None
+
+
+class CircuitBreaker:
+    """
+    Fails fast while the API is persistently down.
+
+    After failure_threshold consecutive failures the circuit opens and calls raise
+    CircuitOpenError without touching the network. Once reset_seconds have elapsed, a single
+    trial call is let through (half-open): its success closes the circuit, its failure opens
+    it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=CIRCUIT_BREAKER_FAILURES, reset_seconds=CIRCUIT_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self.rejected = 0
+
+    def before_call(self):
+        """Raises CircuitOpenError when the call must not be made."""
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            if self.state != self.CLOSED:
+                self.rejected += 1
+                raise CircuitOpenError("Circuit ouvert : l'API Mistral est indisponible, appel annulé")
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or (self.failure_threshold > 0 and self.failures >= self.failure_threshold):
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit breaker opened after {self.failures} consecutive failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "rejected": self.rejected,
+            }
+
+
+def hedged_call(call, hedge_delay, max_hedges=1):
+    """
+    Runs call() and, when it has not answered after hedge_delay seconds, starts a duplicate
+    (up to max_hedges of them). The first successful result wins; the slower calls are
+    abandoned. Only for idempotent calls.
+
+    Returns:
+        tuple: (result, number of hedges launched)
+    """
+    executor = ThreadPoolExecutor(max_workers=max_hedges + 1, thread_name_prefix='hedge')
+    futures = {executor.submit(call)}
+    launched = 1
+    try:
+        while True:
+            can_hedge = launched <= max_hedges
+            done, pending = wait(futures, timeout=hedge_delay if can_hedge else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result(), launched - 1
+                error = future.exception()
+            if not pending:
+                raise error
+            futures = pending
+            if not done:
+                # Nothing answered within hedge_delay: send a duplicate
+                logger.debug(f"No answer after {hedge_delay}s, sending a hedged request")
+                futures.add(executor.submit(call))
+                launched += 1
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
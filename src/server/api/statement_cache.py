@@ -0,0 +1,185 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from src.server.config.settings import STATEMENT_CACHE_MAX_BYTES, COLUMNAR_SIDECAR_ON_READ
+from src.server.api.statement_index import DateIndex, AmountIndex, amounts_to_cents
+from src.server.api.vendor import normalize_vendor_column
+from src.server.api.columnar import load_statement_sidecar, write_statement_sidecar, has_statement_sidecar
+
+logger = logging.getLogger(__name__)
+
+# Day ordinal used for rows whose date could not be parsed (NaT)
+NAT_DAY = np.iinfo(np.int64).min
+
+
+def clean_statement(df):
+    """
+    Cleans a raw bank statement and adds the derived columns used by the matchers.
+
+    Args:
+        df (pd.DataFrame): Statement as read from the CSV file
+
+    Returns:
+        pd.DataFrame: The typed statement with 'date_day' (days since epoch), 'amount_cents' (int64)
+            and 'vendor_lower' / 'vendor_norm' columns
+    """
+    logger.debug("CSV DataFrame dtypes before cleaning:\n%s", df.dtypes)
+
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+        df['date_day'] = df['date'].to_numpy(dtype='datetime64[ns]').astype('datetime64[D]').astype(np.int64)
+    else:
+        logger.warning("CSV file does not contain a 'date' column.")
+
+    if 'amount' in df.columns:
+        # Clean amount string before converting (remove currency symbols, commas)
+        if df['amount'].dtype == 'object':
+            df['amount'] = df['amount'].astype(str).str.replace(r'[$,€£¥]', '', regex=True).str.strip()
+        df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
+        df['amount_cents'] = amounts_to_cents(df['amount'])
+    else:
+        logger.warning("CSV file does not contain an 'amount' column.")
+
+    if 'vendor' in df.columns:
+        df['vendor_lower'] = df['vendor'].fillna('').astype(str).str.lower()
+        df['vendor_norm'] = normalize_vendor_column(df['vendor'])
+
+    logger.debug("CSV DataFrame dtypes after cleaning:\n%s", df.dtypes)
+    return df
+
+
+class ParsedStatement:
+    """A cleaned statement held by the cache, with the file signature it was built from and its indexes."""
+
+    def __init__(self, path, signature, df):
+        self.path = path
+        self.signature = signature
+        self.df = df
+        self.date_index = DateIndex(df['date_day'].to_numpy()) if 'date_day' in df.columns else None
+        self.amount_index = AmountIndex(df['amount_cents'].to_numpy()) if 'amount_cents' in df.columns else None
+        self.nbytes = int(df.memory_usage(deep=True).sum())
+        for index in (self.date_index, self.amount_index):
+            if index is not None:
+                self.nbytes += index.nbytes
+
+
+class StatementCache:
+    """
+    Process-wide cache of parsed statements.
+
+    Entries are keyed by absolute path and validated against the file mtime and size,
+    so a re-uploaded statement is parsed again. The least recently used entries are
+    evicted once the total memory footprint exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes=STATEMENT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _signature(path):
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def get(self, file_path):
+        """Returns the ParsedStatement for file_path, parsing the CSV only when needed."""
+        path = os.path.abspath(file_path)
+        signature = self._signature(path)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        entry = ParsedStatement(path, signature, self._load(path))
+
+        with self._lock:
+            self._entries[path] = entry
+            self._entries.move_to_end(path)
+            self._evict()
+        return entry
+
+    @staticmethod
+    def _load(path):
+        """
+        Memory-maps the columnar sidecar when it is fresh, otherwise parses the CSV. The sidecar is
+        only written on read when COLUMNAR_SIDECAR_ON_READ is set (see ingest_statement).
+        """
+        df = load_statement_sidecar(path)
+        if df is not None:
+            logger.debug(f"Statement cache miss, loaded columnar sidecar: {path}")
+            return df
+
+        logger.debug(f"Statement cache miss, parsing: {path}")
+        df = clean_statement(pd.read_csv(path))
+        if COLUMNAR_SIDECAR_ON_READ:
+            _write_sidecar(path, df)
+        return df
+
+    def _evict(self):
+        total = sum(entry.nbytes for entry in self._entries.values())
+        # Always keep the most recent entry, even if it alone exceeds the budget
+        while total > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            total -= evicted.nbytes
+            self.evictions += 1
+            logger.debug(f"Statement cache evicted: {evicted.path}")
+
+    def invalidate(self, file_path=None):
+        """Drops one statement (or all of them when file_path is None)."""
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(file_path), None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(entry.nbytes for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+statement_cache = StatementCache()
+
+
+def _write_sidecar(path, df):
+    try:
+        write_statement_sidecar(path, df)
+    except Exception as e:
+        logger.error(f"Could not write columnar sidecar for {path}: {e}", exc_info=True)
+
+
+def load_statement(file_path):
+    """Returns the cached, cleaned statement for file_path. The DataFrame is shared: do not modify it."""
+    return statement_cache.get(file_path)
+
+
+def ingest_statement(file_path):
+    """
+    Parses a statement and writes its columnar sidecar (explicit ingest, e.g. on upload), so later
+    reads memory-map it instead of parsing the CSV again.
+    """
+    entry = statement_cache.get(file_path)
+    if not has_statement_sidecar(entry.path):
+        _write_sidecar(entry.path, entry.df)
+    return entry
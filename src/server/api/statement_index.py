@@ -0,0 +1,90 @@
+import numpy as np
+
+
+class DateIndex:
+    """
+    Statement row ids sorted by day ordinal (days since epoch).
+
+    A date window is resolved with two binary searches, so candidate generation costs
+    O(log rows + candidates) instead of a full scan of the statement.
+    """
+
+    def __init__(self, date_day):
+        self.order = np.argsort(date_day, kind='stable')
+        self.sorted_days = date_day[self.order]
+
+    def candidates(self, first_day, last_day):
+        """Returns the row ids (in statement order) whose day falls within [first_day, last_day]."""
+        start = np.searchsorted(self.sorted_days, first_day, side='left')
+        stop = np.searchsorted(self.sorted_days, last_day, side='right')
+        return np.sort(self.order[start:stop])
+
+    @property
+    def nbytes(self):
+        return self.order.nbytes + self.sorted_days.nbytes
+
+
+# Cents value used for rows whose amount could not be parsed (NaN)
+MISSING_CENTS = np.iinfo(np.int64).min
+
+
+def amount_to_cents(amount):
+    """Converts an invoice amount (number or numeric string) to integer cents. Returns None if it is not a number."""
+    try:
+        value = float(amount)
+    except (TypeError, ValueError):
+        return None
+    if np.isnan(value):
+        return None
+    return int(round(value * 100))
+
+
+def amounts_to_cents(amounts):
+    """Converts a float amount column to int64 cents, with MISSING_CENTS for NaN."""
+    amounts = np.asarray(amounts, dtype=np.float64)
+    cents = np.full(len(amounts), MISSING_CENTS, dtype=np.int64)
+    valid = ~np.isnan(amounts)
+    cents[valid] = np.round(amounts[valid] * 100).astype(np.int64)
+    return cents
+
+
+class AmountIndex:
+    """
+    Hash index from integer cents to statement row ids.
+
+    Rows are grouped by cents once; each bucket is a (start, stop) slice of the sorted
+    row ids, so an exact lookup is O(1) and a ±N cents lookup touches 2N+1 buckets.
+    """
+
+    def __init__(self, amount_cents):
+        self.order = np.argsort(amount_cents, kind='stable')
+        sorted_cents = amount_cents[self.order]
+        values, starts = np.unique(sorted_cents, return_index=True)
+        stops = np.append(starts[1:], len(sorted_cents))
+        self.buckets = {
+            int(value): (int(start), int(stop))
+            for value, start, stop in zip(values, starts, stops)
+            if value != MISSING_CENTS
+        }
+
+    def lookup(self, cents, tolerance_cents=0):
+        """Returns the row ids (in statement order) whose amount is within ±tolerance_cents of cents."""
+        slices = []
+        for value in range(cents - tolerance_cents, cents + tolerance_cents + 1):
+            bucket = self.buckets.get(value)
+            if bucket is not None:
+                slices.append(self.order[bucket[0]:bucket[1]])
+        if not slices:
+            return np.array([], dtype=np.int64)
+        return np.sort(np.concatenate(slices))
+
+    def mask(self, cents, tolerance_cents, size):
+        """Boolean mask over the statement rows matching the amount."""
+        matched = np.zeros(size, dtype=bool)
+        matched[self.lookup(cents, tolerance_cents)] = True
+        return matched
+
+    @property
+    def nbytes(self):
+        # Bucket dict entries cost roughly 100 bytes each on top of the sorted row ids
+        return self.order.nbytes + 100 * len(self.buckets)
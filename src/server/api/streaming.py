@@ -0,0 +1,129 @@
+import heapq
+import logging
+
+import numpy as np
+import pandas as pd
+from fuzzywuzzy import fuzz
+
+from src.server.api.columnar import iter_sidecar_chunks
+from src.server.api.statement_cache import clean_statement, NAT_DAY
+from src.server.api.statement_index import amount_to_cents, MISSING_CENTS
+from src.server.config.settings import (
+    MATCH_DATE_WINDOW_DAYS,
+    AMOUNT_TOLERANCE_CENTS,
+    STREAM_CHUNK_ROWS,
+    STREAM_TOP_K
+)
+
+logger = logging.getLogger(__name__)
+
+
+def iter_statement_chunks(file_path, chunksize=STREAM_CHUNK_ROWS):
+    """
+    Reads a statement in chunks of cleaned rows, from the columnar sidecar when it is fresh,
+    otherwise with read_csv(chunksize=...). Memory use depends on chunksize, not on the file size.
+
+    Yields:
+        tuple: (row id of the first row of the chunk, cleaned pd.DataFrame)
+    """
+    chunks = iter_sidecar_chunks(file_path, chunksize)
+    if chunks is not None:
+        logger.debug(f"Streaming statement from its columnar sidecar: {file_path}")
+        yield from chunks
+        return
+
+    logger.debug(f"Streaming statement from CSV: {file_path}")
+    first_row = 0
+    for chunk in pd.read_csv(file_path, chunksize=chunksize):
+        chunk_size = len(chunk)
+        yield first_row, clean_statement(chunk.reset_index(drop=True))
+        first_row += chunk_size
+
+
+def _prepare_invoice(invoice_data):
+    """Invoice fields used by the streaming matcher, or None when the invoice cannot match anything."""
+    invoice_date = pd.to_datetime(invoice_data.get('date'), errors='coerce')
+    invoice_cents = amount_to_cents(invoice_data.get('amount', 0))
+    invoice_vendor = invoice_data.get('vendor')
+    if pd.isna(invoice_date) or invoice_cents is None or not isinstance(invoice_vendor, str):
+        return None
+    invoice_day = np.datetime64(invoice_date.date(), 'D').astype(np.int64)
+    return invoice_day, invoice_cents, invoice_vendor.lower()
+
+
+def stream_matching_rows(file_path, invoices, threshold=70, top_k=STREAM_TOP_K, chunksize=STREAM_CHUNK_ROWS):
+    """
+    Matches invoices against a statement too large to hold in memory.
+
+    The statement is read once, chunk by chunk, for all invoices. Each chunk is filtered with
+    the same date window, integer-cents amount and vendor criteria as get_matching_rows, and
+    each invoice keeps a bounded heap of its top_k matches.
+
+    Args:
+        file_path (str): Path to the statement CSV file
+        invoices (list): Extracted invoice data dicts
+        threshold (int): Minimum vendor similarity score
+        top_k (int): Matches kept per invoice
+        chunksize (int): Rows per chunk
+
+    Returns:
+        list: For each invoice, its matches ranked by score, then statement order; the same
+            rows as get_matching_rows sorted by score and cut to top_k
+    """
+    logger.info(f"Streaming match of {len(invoices)} invoices against: {file_path} (chunks of {chunksize} rows)")
+    prepared = [_prepare_invoice(invoice_data or {}) for invoice_data in invoices]
+    heaps = [[] for _ in invoices]
+
+    try:
+        for first_row, chunk in iter_statement_chunks(file_path, chunksize):
+            if chunk.empty or 'date_day' not in chunk.columns or 'amount_cents' not in chunk.columns:
+                continue
+            date_day = chunk['date_day'].to_numpy()
+            amount_cents = chunk['amount_cents'].to_numpy()
+            vendor_lower = chunk['vendor_lower'].to_numpy()
+            # Rows without a date or an amount never match (like the date and amount indexes); their
+            # sentinels are int64.min, which would overflow in the differences below
+            valid = (date_day != NAT_DAY) & (amount_cents != MISSING_CENTS)
+            valid_ids = np.flatnonzero(valid)
+            date_day = date_day[valid]
+            amount_cents = amount_cents[valid]
+
+            for invoice_id, invoice in enumerate(prepared):
+                if invoice is None:
+                    continue
+                invoice_day, invoice_cents, invoice_vendor = invoice
+                candidates = valid_ids[
+                    (np.abs(date_day - invoice_day) <= MATCH_DATE_WINDOW_DAYS)
+                    & (np.abs(amount_cents - invoice_cents) <= AMOUNT_TOLERANCE_CENTS)
+                ]
+                heap = heaps[invoice_id]
+                for position in candidates:
+                    score = fuzz.ratio(vendor_lower[position], invoice_vendor)
+                    if score < threshold:
+                        continue
+                    # Ranking key: higher score first, then earlier statement row
+                    key = (score, -(first_row + position))
+                    if len(heap) < top_k:
+                        heapq.heappush(heap, (key, chunk.iloc[position]))
+                    elif key > heap[0][0]:
+                        heapq.heapreplace(heap, (key, chunk.iloc[position]))
+
+        results = []
+        for heap in heaps:
+            ranked = sorted(heap, key=lambda entry: entry[0], reverse=True)
+            results.append([
+                {
+                    'date': row['date'].strftime('%Y-%m-%d'),
+                    'amount': float(row['amount']),
+                    'currency': row['currency'],
+                    'vendor': row['vendor'],
+                    'source': row['source'],
+                    'match_score': key[0]
+                }
+                for key, row in ranked
+            ])
+        return results
+
+    except Exception as e:
+        logger.error(f"Error in stream_matching_rows: {str(e)}", exc_info=True)
+        return [[] for _ in invoices]
@@ -1,16 +1,26 @@
-def upload_file(file_path, data):
+from src.server.api.statement_cache import ingest_statement
+
+
+def upload_file(file_path, data, ingest=True):
     """
     Uploads data to the specified file path.
 
     Args:
         file_path (str): The path where the file will be saved.
         data (bytes): The data to be written to the file.
+        ingest (bool): Convert a bank statement (.csv) to its columnar sidecar, so
+            matching and benchmarking memory-map it instead of parsing the CSV again.
     """
     try:
         
         with open(file_path, 'wb') as file:
             file.write(data)
         print(f"File uploaded successfully to {file_path}")
+        if ingest and file_path.lower().endswith('.csv'):
+            try:
+                ingest_statement(file_path)
+            except Exception as e:
+                print(f"Could not prepare the columnar statement for {file_path}: {e}")
         return {"success": True, "data":{"message": f"File uploaded successfully to {file_path}"}}
     except Exception as e:
         print(f"Error uploading file: {e}")
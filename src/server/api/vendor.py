@@ -0,0 +1,73 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from fuzzywuzzy import fuzz
+
+from src.server.config.settings import VENDOR_CACHE_SIZE, VENDOR_PAIR_CACHE_SIZE
+
+# Common business suffixes (add more if needed), removed when they appear as whole words at the end
+VENDOR_SUFFIXES = ['inc', 'llc', 'ltd', 'corp', 'co', 'gmbh', 'bv', 'pty', 'sa', 'sas', 'sarl']
+
+# Precompiled once, one pattern per suffix (\b for word boundary, \.? for optional dot)
+_SUFFIX_RES = [re.compile(r'\b' + suffix + r'\.?$') for suffix in VENDOR_SUFFIXES]
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=VENDOR_CACHE_SIZE)
+def _normalize_vendor(name):
+    name = name.lower()
+    # A single pass in list order, as before the cache: "foo ltd co" gives "foo ltd", not "foo"
+    for suffix_re in _SUFFIX_RES:
+        name = suffix_re.sub('', name).strip()
+    # Remove punctuation
+    name = _PUNCTUATION_RE.sub('', name)
+    # Replace multiple spaces with single space
+    return _WHITESPACE_RE.sub(' ', name).strip()
+
+
+def normalize_vendor(name):
+    """Basic normalization for vendor names (memoized in a bounded LRU cache)."""
+    if not isinstance(name, str):
+        return ""
+    return _normalize_vendor(name)
+
+
+@lru_cache(maxsize=VENDOR_PAIR_CACHE_SIZE)
+def vendor_similarity(norm_csv_vendor, norm_invoice_vendor):
+    """token_set_ratio between two normalized vendor names, memoized per pair."""
+    return fuzz.token_set_ratio(norm_csv_vendor, norm_invoice_vendor)
+
+
+def normalize_vendor_column(vendors):
+    """
+    Normalizes a statement vendor column, calling normalize_vendor once per distinct value.
+
+    Returns:
+        np.ndarray: object array of normalized names ('' for missing vendors)
+    """
+    codes, uniques = pd.factorize(vendors)
+    normalized = np.array([normalize_vendor(str(vendor)) for vendor in uniques] + [''], dtype=object)
+    return normalized[codes]
+
+
+def _cache_stats(cached_function):
+    info = cached_function.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "max_size": info.maxsize,
+        "hit_rate": info.hits / lookups if lookups else 0.0,
+    }
+
+
+def get_vendor_cache_stats():
+    """Hit rates of the vendor normalization and pairwise similarity caches."""
+    return {
+        "normalize": _cache_stats(_normalize_vendor),
+        "similarity": _cache_stats(vendor_similarity),
+    }
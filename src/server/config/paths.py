@@ -8,7 +8,12 @@ STORAGE_DIR = os.path.join(ROOT_DIR, 'storage')
 DATASET_DIR = os.path.join(STORAGE_DIR, 'dataset')
 CSV_DIR = os.path.join(DATASET_DIR, 'csv')
 IMAGES_DIR = os.path.join(DATASET_DIR, 'images')
+COLUMNAR_DIR = os.path.join(DATASET_DIR, 'columnar')
+CACHE_DIR = os.path.join(STORAGE_DIR, 'cache')
+EXTRACTION_CACHE_DIR = os.path.join(CACHE_DIR, 'extraction')
+PHASH_INDEX_PATH = os.path.join(CACHE_DIR, 'perceptual_index.jsonl')
+JOBS_DB_PATH = os.path.join(STORAGE_DIR, 'jobs.sqlite3')
 
 # Create directories if they don't exist
-for directory in [STORAGE_DIR, DATASET_DIR, CSV_DIR, IMAGES_DIR]:
+for directory in [STORAGE_DIR, DATASET_DIR, CSV_DIR, IMAGES_DIR, COLUMNAR_DIR, CACHE_DIR, EXTRACTION_CACHE_DIR]:
     os.makedirs(directory, exist_ok=True) 
\ No newline at end of file
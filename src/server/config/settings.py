@@ -14,16 +14,105 @@ DEBUG = os.getenv('DEBUG', 'True').lower() == 'true'
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG')
 
 # Configuration des timeouts
-REQUEST_TIMEOUT = int(os.getenv('REQUEST_TIMEOUT', '30'))
+REQUEST_TIMEOUT = int(os.getenv('REQUEST_TIMEOUT', '30'))  # timeout de lecture
+CONNECT_TIMEOUT = float(os.getenv('CONNECT_TIMEOUT', '5'))  # timeout d'établissement de la connexion
 MAX_RETRIES = int(os.getenv('MAX_RETRIES', '3'))
 
 # Configuration du modèle
 MAX_TOKENS = int(os.getenv('MAX_TOKENS', '131072'))
 TEMPERATURE = float(os.getenv('TEMPERATURE', '0.0'))
 
+# Configuration du cache des relevés bancaires (mémoire maximale en Mo)
+STATEMENT_CACHE_MAX_BYTES = int(os.getenv('STATEMENT_CACHE_MAX_MB', '512')) * 1024 * 1024
+# Écrire le fichier colonnaire d'un relevé dès sa première lecture (sinon seulement à l'import, via upload_file)
+COLUMNAR_SIDECAR_ON_READ = os.getenv('COLUMNAR_SIDECAR_ON_READ', 'False').lower() == 'true'
+
+# Configuration du matching (fenêtre de dates autour de la date de la facture, en jours)
+MATCH_DATE_WINDOW_DAYS = int(os.getenv('MATCH_DATE_WINDOW_DAYS', '0'))
+
+# Tolérance sur les montants (en centimes, 0 = montant exact). 1 centime par défaut, comme l'ancienne
+# comparaison en flottants abs(montant - montant_facture) < 0.01 qui acceptait les écarts d'un centime
+AMOUNT_TOLERANCE_CENTS = int(os.getenv('AMOUNT_TOLERANCE_CENTS', '1'))
+
+# Taille des caches de normalisation et de similarité des vendeurs (nombre d'entrées)
+VENDOR_CACHE_SIZE = int(os.getenv('VENDOR_CACHE_SIZE', '65536'))
+VENDOR_PAIR_CACHE_SIZE = int(os.getenv('VENDOR_PAIR_CACHE_SIZE', '262144'))
+
+# Budget mémoire d'une tuile du scoring en masse factures x transactions (en Mo)
+BULK_SCORING_MEMORY_BYTES = int(os.getenv('BULK_SCORING_MEMORY_MB', '256')) * 1024 * 1024
+
+# Matching en flux pour les relevés volumineux (lignes par bloc, correspondances gardées par facture)
+STREAM_CHUNK_ROWS = int(os.getenv('STREAM_CHUNK_ROWS', '200000'))
+STREAM_TOP_K = int(os.getenv('STREAM_TOP_K', '10'))
+
+# Nombre de vecteurs de scores par facture gardés en cache (changement de seuil sans re-matching)
+MATCH_CACHE_SIZE = int(os.getenv('MATCH_CACHE_SIZE', '4096'))
+
+# Cache disque des extractions de factures (taille maximale en Mo, durée de vie en jours, 0 = illimitée)
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv('EXTRACTION_CACHE_MAX_MB', '256')) * 1024 * 1024
+EXTRACTION_CACHE_MAX_AGE_SECONDS = int(os.getenv('EXTRACTION_CACHE_MAX_AGE_DAYS', '30')) * 24 * 3600
+
+# Extraction concurrente (appels simultanés maximum) et quota de l'API Mistral (requêtes par seconde, rafale)
+EXTRACTION_CONCURRENCY = int(os.getenv('EXTRACTION_CONCURRENCY', '4'))
+MISTRAL_RATE_LIMIT_PER_SECOND = float(os.getenv('MISTRAL_RATE_LIMIT_PER_SECOND', '1.0'))
+MISTRAL_RATE_LIMIT_BURST = int(os.getenv('MISTRAL_RATE_LIMIT_BURST', '1'))
+
+# HTTP/2 pour l'API Mistral (nécessite httpx[http2], sinon HTTP/1.1 keep-alive)
+MISTRAL_HTTP2 = os.getenv('MISTRAL_HTTP2', 'False').lower() == 'true'
+
+# Mode d'extraction : 'two_step' (OCR puis analyse) ou 'single_call' (un seul appel, repli sur two_step)
+EXTRACTION_MODE = os.getenv('EXTRACTION_MODE', 'two_step')
+
+# Prétraitement des images avant envoi au modèle de vision (rotation EXIF, redimensionnement, niveaux de gris, JPEG adaptatif)
+# Désactivé par défaut tant que benchmark_image_preprocessing n'a pas montré une précision des champs inchangée
+IMAGE_PREPROCESSING = os.getenv('IMAGE_PREPROCESSING', 'False').lower() == 'true'
+IMAGE_MAX_EDGE = int(os.getenv('IMAGE_MAX_EDGE', '1600'))  # plus grand côté en pixels
+IMAGE_GRAYSCALE = os.getenv('IMAGE_GRAYSCALE', 'False').lower() == 'true'
+IMAGE_TARGET_BYTES = int(os.getenv('IMAGE_TARGET_KB', '400')) * 1024  # taille visée après compression
+IMAGE_JPEG_QUALITY_MAX = int(os.getenv('IMAGE_JPEG_QUALITY_MAX', '85'))
+IMAGE_JPEG_QUALITY_MIN = int(os.getenv('IMAGE_JPEG_QUALITY_MIN', '55'))
+
+# Politique de nouvelles tentatives (délais en secondes, budget total par requête, 0 = sans limite)
+RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', '1'))
+RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', '30'))
+RETRY_DEADLINE_SECONDS = float(os.getenv('RETRY_DEADLINE_SECONDS', '120'))
+
+# Disjoncteur : échecs consécutifs avant ouverture (0 = désactivé) et délai avant un nouvel essai
+CIRCUIT_BREAKER_FAILURES = int(os.getenv('CIRCUIT_BREAKER_FAILURES', '5'))
+CIRCUIT_BREAKER_RESET_SECONDS = float(os.getenv('CIRCUIT_BREAKER_RESET_SECONDS', '30'))
+
+# Requêtes doublées si pas de réponse après ce délai en secondes (0 = désactivé)
+HEDGE_DELAY_SECONDS = float(os.getenv('HEDGE_DELAY_SECONDS', '0'))
+
+# Analyse heuristique du texte brut : l'appel LLM d'analyse n'est fait que sous ce seuil de confiance
+# (désactivée par défaut tant que sa précision n'est pas mesurée sur des factures annotées)
+HEURISTIC_PARSER = os.getenv('HEURISTIC_PARSER', 'False').lower() == 'true'
+HEURISTIC_CONFIDENCE_THRESHOLD = float(os.getenv('HEURISTIC_CONFIDENCE_THRESHOLD', '0.9'))
+
+# Détection des quasi-doublons de factures par hash perceptuel (distance de Hamming maximale sur 64 bits) :
+# un quasi-doublon est seulement signalé, son extraction n'est jamais réutilisée
+PHASH_DEDUP = os.getenv('PHASH_DEDUP', 'False').lower() == 'true'
+PHASH_MAX_DISTANCE = int(os.getenv('PHASH_MAX_DISTANCE', '6'))
+
+# Backend d'extraction : 'mistral' (API Pixtral) ou 'tesseract' (OCR local, sans réseau)
+EXTRACTION_BACKEND = os.getenv('EXTRACTION_BACKEND', 'mistral')
+TESSERACT_CMD = os.getenv('TESSERACT_CMD', 'tesseract')
+TESSERACT_LANG = os.getenv('TESSERACT_LANG', 'eng')
+
+# Pipeline de rapprochement : taille des files entre étapes et nombre de workers par étape
+# (l'étape d'extraction utilise EXTRACTION_CONCURRENCY)
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '8'))
+PIPELINE_LOAD_WORKERS = int(os.getenv('PIPELINE_LOAD_WORKERS', '2'))
+PIPELINE_MATCH_WORKERS = int(os.getenv('PIPELINE_MATCH_WORKERS', '2'))
+
+# File de jobs en arrière-plan : l'interface soumet les rapprochements à job_worker.py au lieu de les exécuter
+BACKGROUND_JOBS = os.getenv('BACKGROUND_JOBS', 'False').lower() == 'true'
+JOB_BATCH_SIZE = int(os.getenv('JOB_BATCH_SIZE', '8'))
+JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', '2'))
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', '600'))
+
 # Validation des variables requises
-if not MISTRAL_API_KEY:
-    raise ValueError("MISTRAL_API_KEY n'est pas définie dans le fichier .env")
+# MISTRAL_API_KEY n'est requise que par le backend 'mistral' : elle est vérifiée à la création du client
 
 # Logging Configuration
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s" 
\ No newline at end of file
@@ -0,0 +1,103 @@
+import importlib
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.sparse import csr_matrix
+
+from src.server.api import columnar
+from src.server.api.assignment import match_batch, solve_assignment
+from src.server.api.statement_cache import StatementCache
+
+assignment_module = importlib.import_module('src.server.api.assignment')
+statement_cache_module = importlib.import_module('src.server.api.statement_cache')
+matching_module = importlib.import_module('src.server.api.matching')
+
+INVOICE = {'date': '2024-01-02', 'amount': 10.0, 'currency': 'USD', 'vendor': 'Walmart'}
+
+
+@pytest.fixture
+def statement(tmp_path, monkeypatch):
+    monkeypatch.setattr(columnar, 'COLUMNAR_DIR', str(tmp_path / 'columnar'))
+    monkeypatch.setattr(statement_cache_module, 'statement_cache', StatementCache())
+    matching_module.match_candidates_cache.clear()
+    path = tmp_path / 'statement.csv'
+    pd.DataFrame({
+        'date': '2024-01-02',
+        'amount': [10.0, 10.01],
+        'currency': 'USD',
+        'vendor': ['Walmart', 'Walmart Inc'],
+        'source': ['t1.png.json', 't2.png.json'],
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def solved_shapes(monkeypatch):
+    """Records the shape of every sub-matrix handed to linear_sum_assignment."""
+    shapes = []
+    solve = assignment_module.linear_sum_assignment
+
+    def recording(matrix, maximize=False):
+        shapes.append(matrix.shape)
+        return solve(matrix, maximize=maximize)
+
+    monkeypatch.setattr(assignment_module, 'linear_sum_assignment', recording)
+    return shapes
+
+
+def test_one_to_one_beats_greedy(statement):
+    # A greedy pass gives t1 to the first invoice (100 > 78) and leaves the second one
+    # without any candidate; the assignment moves the first invoice to t2 instead
+    second = {**INVOICE, 'amount': 9.99}
+
+    results = match_batch(statement, [INVOICE, second])
+
+    assert [[match['source'] for match in matches] for matches in results] == [['t2.png.json'], ['t1.png.json']]
+    assert [matches[0]['match_score'] for matches in results] == [78, 100]
+
+
+def test_unmatched_invoices_get_an_empty_list(statement):
+    invoices = [INVOICE, {}, {**INVOICE, 'vendor': 'Cafe du Port'}, {**INVOICE, 'amount': 50.0}]
+
+    results = match_batch(statement, invoices)
+
+    assert [match['source'] for match in results[0]] == ['t1.png.json']
+    assert results[1:] == [[], [], []]
+
+
+def test_transaction_is_never_assigned_twice(statement):
+    results = match_batch(statement, [INVOICE, INVOICE, INVOICE])
+
+    sources = [matches[0]['source'] for matches in results if matches]
+    assert sorted(sources) == ['t1.png.json', 't2.png.json']
+    assert results.count([]) == 1
+
+
+def test_components_are_solved_separately(solved_shapes):
+    # Invoices 0-1 compete for transactions 0-1, invoices 2-3 for transactions 2-3
+    scores = csr_matrix(np.array([
+        [90, 80, 0, 0],
+        [90, 0, 0, 0],
+        [0, 0, 75, 95],
+        [0, 0, 0, 95],
+    ], dtype=np.float64))
+
+    assert solve_assignment(scores) == {0: 1, 1: 0, 2: 2, 3: 3}
+    assert solved_shapes == [(2, 2), (2, 2)]
+
+
+def test_single_row_or_column_takes_the_best_edge(solved_shapes):
+    scores = csr_matrix(np.array([
+        [71, 95, 0],   # one invoice, two candidates
+        [0, 0, 80],    # two invoices, one candidate
+        [0, 0, 90],
+        [0, 0, 0],     # no candidate at all
+    ], dtype=np.float64))
+
+    assert solve_assignment(scores) == {0: 1, 2: 2}
+    assert solved_shapes == []
+
+
+def test_empty_matrix():
+    assert solve_assignment(csr_matrix((3, 5))) == {}
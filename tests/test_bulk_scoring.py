@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.server.api.bulk_scoring import BYTES_PER_CELL, build_invoice_array, score_matrix_topk
+from src.server.api.matching import calculate_match_score
+from src.server.api.statement_cache import clean_statement
+
+from tests.test_matching import SCORING_INVOICES, messy_statement
+
+INVOICES = SCORING_INVOICES + [
+    {'date': '2024-01-15', 'amount': 42.0, 'currency': 'USD', 'vendor': 'Walmart'},
+    {'date': '2024-01-16', 'amount': 10.0, 'currency': 'EUR', 'vendor': 'Acme Corp'},
+    {'date': '2024-02-01', 'currency': 'usd', 'vendor': 'sas'},
+]
+TOP_K = 5
+
+
+def row_wise_topk(df, invoice, top_k):
+    """Top-K of the row-wise scorer: highest score first, then earliest row."""
+    scores = df.apply(lambda row: calculate_match_score(row, invoice, date_tolerance_days=1), axis=1).to_numpy()
+    order = np.lexsort((np.arange(len(scores)), -scores))[:top_k]
+    return order, scores[order]
+
+
+@pytest.mark.parametrize('memory_budget_bytes', [BYTES_PER_CELL * 3, 5000, 256 * 1024 * 1024])
+def test_topk_matches_row_wise_scores(memory_budget_bytes):
+    df = clean_statement(messy_statement(rows=400, seed=5))
+    statement = SimpleNamespace(df=df)
+
+    ranked = score_matrix_topk(statement, build_invoice_array(INVOICES), top_k=TOP_K,
+                               memory_budget_bytes=memory_budget_bytes)
+
+    assert len(ranked) == len(INVOICES)
+    for invoice, (row_ids, scores) in zip(INVOICES, ranked):
+        expected_ids, expected_scores = row_wise_topk(df, invoice, TOP_K)
+        assert scores.tolist() == expected_scores.tolist()
+        # Ties are broken by row order, whatever the tiling
+        assert row_ids.tolist() == expected_ids.tolist()
+
+
+def test_topk_on_empty_inputs():
+    df = clean_statement(messy_statement(rows=10))
+    assert score_matrix_topk(SimpleNamespace(df=df), build_invoice_array([])) == []
+    ranked = score_matrix_topk(SimpleNamespace(df=df.iloc[:0]), build_invoice_array(INVOICES[:2]))
+    assert [len(row_ids) for row_ids, _ in ranked] == [0, 0]
@@ -0,0 +1,56 @@
+import mmap
+import importlib
+
+import pandas as pd
+import pytest
+
+from src.server.api import columnar
+from src.server.api.statement_cache import StatementCache
+
+# The package re-exports the APIService names, statement_cache among them: import the module itself
+statement_cache_module = importlib.import_module('src.server.api.statement_cache')
+
+
+@pytest.fixture
+def statement(tmp_path, monkeypatch):
+    monkeypatch.setattr(columnar, 'COLUMNAR_DIR', str(tmp_path / 'columnar'))
+    monkeypatch.setattr(statement_cache_module, 'statement_cache', StatementCache())
+    path = tmp_path / 'statement.csv'
+    pd.DataFrame({
+        'date': ['2024-01-01', '2024-01-02', None],
+        'amount': [1.5, None, 3.0],
+        'currency': ['USD', 'EUR', 'USD'],
+        'vendor': ['Walmart', None, 'Target'],
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def is_mapped(array):
+    while array is not None:
+        if isinstance(array, mmap.mmap):
+            return True
+        array = getattr(array, 'base', None)
+    return False
+
+
+def test_reading_does_not_write_the_sidecar(statement):
+    statement_cache_module.load_statement(statement)
+    assert not columnar.has_statement_sidecar(statement)
+
+
+def test_reading_writes_the_sidecar_when_enabled(statement, monkeypatch):
+    monkeypatch.setattr(statement_cache_module, 'COLUMNAR_SIDECAR_ON_READ', True)
+    statement_cache_module.load_statement(statement)
+    assert columnar.has_statement_sidecar(statement)
+
+
+def test_ingest_writes_a_zero_copy_sidecar(statement):
+    parsed = statement_cache_module.ingest_statement(statement).df
+    assert columnar.has_statement_sidecar(statement)
+
+    df = columnar.load_statement_sidecar(statement)
+    pd.testing.assert_frame_equal(df.astype({name: object for name in ('currency', 'vendor', 'vendor_lower', 'vendor_norm')}),
+                                  parsed, check_dtype=False)
+    # Category codes stay views on the mapped files, like the numeric columns
+    assert is_mapped(df['vendor'].array.codes)
+    assert is_mapped(df['amount'].to_numpy())
@@ -0,0 +1,98 @@
+import os
+import time
+
+import pytest
+
+from src.server.api.extraction_cache import ExtractionCache, extraction_key
+
+
+def data(name):
+    return {"json": {"vendor": name}, "raw_text": f"receipt {name}"}
+
+
+def key(name):
+    return extraction_key(name.encode('utf-8'), 'model', 'v1')
+
+
+@pytest.fixture
+def entry_size(tmp_path):
+    """Size on disk of one entry written by data()/key() (all names have the same length)."""
+    cache = ExtractionCache(directory=str(tmp_path / 'probe'))
+    cache.put(key('a'), data('a'), model='model')
+    return cache.stats()['bytes']
+
+
+def set_atime(cache, name, atime):
+    path = cache._entry_path(key(name))
+    os.utime(path, (atime, os.stat(path).st_mtime))
+
+
+def test_put_then_get(tmp_path):
+    cache = ExtractionCache(directory=str(tmp_path))
+
+    assert cache.get(key('a')) is None
+    cache.put(key('a'), data('a'), model='model')
+
+    assert cache.get(key('a')) == data('a')
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_key_depends_on_model_and_prompt_version():
+    image = b'image'
+    assert extraction_key(image, 'model', 'v1') == extraction_key(image, 'model', 'v1')
+    assert len({extraction_key(image, 'model', 'v1'), extraction_key(image, 'other', 'v1'),
+                extraction_key(image, 'model', 'v2'), extraction_key(b'other', 'model', 'v1')}) == 4
+
+
+def test_expired_entry_is_dropped_on_read(tmp_path):
+    cache = ExtractionCache(directory=str(tmp_path), max_age_seconds=60)
+    cache.put(key('a'), data('a'))
+    path = cache._entry_path(key('a'))
+    old = time.time() - 120
+    os.utime(path, (old, old))
+
+    assert cache.get(key('a')) is None
+    assert not os.path.exists(path)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_least_recently_read_entry_is_evicted(tmp_path, entry_size):
+    cache = ExtractionCache(directory=str(tmp_path), max_bytes=int(entry_size * 2.5))
+    cache.put(key('a'), data('a'))
+    cache.put(key('b'), data('b'))
+    set_atime(cache, 'a', 1000)
+    set_atime(cache, 'b', 2000)
+    # Reading 'a' makes 'b' the least recently used entry
+    assert cache.get(key('a')) == data('a')
+
+    cache.put(key('c'), data('c'))
+
+    assert cache.get(key('b')) is None
+    assert cache.get(key('a')) == data('a')
+    assert cache.get(key('c')) == data('c')
+    assert cache.stats()['evictions'] == 1
+
+
+def test_size_stays_within_max_bytes(tmp_path, entry_size):
+    cache = ExtractionCache(directory=str(tmp_path), max_bytes=entry_size * 4)
+
+    for index in range(20):
+        name = chr(ord('a') + index)
+        cache.put(key(name), data(name))
+        set_atime(cache, name, 1000 + index)
+        assert cache.stats()['bytes'] <= cache.max_bytes
+
+    stats = cache.stats()
+    assert stats['entries'] == 4 and stats['evictions'] == 16
+    # The last four written are the ones kept
+    assert [cache.get(key(chr(ord('a') + index))) is not None for index in range(16, 20)] == [True] * 4
+
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+    cache = ExtractionCache(directory=str(tmp_path))
+    cache.put(key('a'), data('a'))
+    with open(cache._entry_path(key('a')), 'w', encoding='utf-8') as f:
+        f.write('{not json')
+
+    assert cache.get(key('a')) is None
+    assert cache.stats()['misses'] == 1
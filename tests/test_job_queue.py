@@ -0,0 +1,99 @@
+import time
+
+from src.server.api.job_queue import JobQueue, INLINE_MODE, job_fingerprint
+from src.server.api.job_worker import open_checkpoint, run_checkpoint
+
+
+def make_queue(tmp_path, lease_seconds=60):
+    statement = tmp_path / 'statement.csv'
+    statement.write_text('date,amount,currency,vendor\n')
+    return JobQueue(path=str(tmp_path / 'jobs.sqlite3'), lease_seconds=lease_seconds), str(statement)
+
+
+def item_statuses(queue, job_id):
+    with queue._read() as conn:
+        rows = conn.execute("SELECT position, status FROM job_items WHERE job_id = ? ORDER BY position", (job_id,))
+        return [row['status'] for row in rows]
+
+
+def expire_claims(queue, job_id, seconds):
+    with queue._transaction() as conn:
+        conn.execute("UPDATE job_items SET claimed_at = claimed_at - ? WHERE job_id = ?", (seconds, job_id))
+
+
+def test_resume_leaves_items_still_running_elsewhere(tmp_path):
+    queue, statement = make_queue(tmp_path)
+    job_id = queue.submit('a', statement, ['a.png', 'b.png'], mode=INLINE_MODE)
+    queue.claim_job(job_id, 'other-process')
+    queue.complete(job_id, 0, {'status': 'extraction_failed'})
+
+    # b.png is still being processed by the other process: only the failed invoice is retried
+    assert queue.resume(job_id) == 1
+    assert item_statuses(queue, job_id) == ['pending', 'running']
+
+    expire_claims(queue, job_id, 120)
+    assert queue.resume(job_id) == 2
+
+
+def test_requeue_expired_only_touches_worker_jobs(tmp_path):
+    queue, statement = make_queue(tmp_path)
+    inline_id = queue.submit('a', statement, ['a.png'], mode=INLINE_MODE)
+    worker_id = queue.submit('b', statement, ['b.png'])
+    queue.claim_job(inline_id, 'cli')
+    queue.claim('worker', 1)
+    expire_claims(queue, inline_id, 120)
+    expire_claims(queue, worker_id, 120)
+
+    assert queue.requeue_expired() == 1
+    assert item_statuses(queue, inline_id) == ['running']
+    assert item_statuses(queue, worker_id) == ['pending']
+
+
+def test_release_returns_unfinished_items(tmp_path):
+    queue, statement = make_queue(tmp_path)
+    job_id = queue.submit('a', statement, ['a.png', 'b.png'], mode=INLINE_MODE)
+    queue.claim_job(job_id, 'cli')
+    queue.release(job_id, 'someone-else', [0, 1])
+    assert item_statuses(queue, job_id) == ['running', 'running']
+    queue.release(job_id, 'cli', [1])
+    assert item_statuses(queue, job_id) == ['running', 'pending']
+
+
+def test_inline_jobs_do_not_count_in_the_queue_position(tmp_path):
+    queue, statement = make_queue(tmp_path)
+    first_id = queue.submit('a', statement, ['a.png'])
+    # An abandoned inline run stays 'running' forever
+    queue.submit('b', statement, ['b.png'], mode=INLINE_MODE)
+    worker_id = queue.submit('c', statement, ['c.png'])
+
+    assert queue.get(first_id)['queue_position'] == 0
+    assert queue.get(worker_id)['queue_position'] == 1
+
+
+def test_fingerprint_hashes_large_statements_by_block(tmp_path):
+    statement = tmp_path / 'statement.csv'
+    content = b'date,amount,currency,vendor\n' + b'2024-01-02,12.50,USD,Walmart\n' * 100000
+    statement.write_bytes(content)
+    other = tmp_path / 'other.csv'
+    other.write_bytes(content[:-1] + b'x')
+
+    fingerprint = job_fingerprint(str(statement), ['a.png'])
+    assert fingerprint == job_fingerprint(str(statement), ['a.png'])
+    assert fingerprint != job_fingerprint(str(other), ['a.png'])
+
+
+def test_resume_reports_items_leased_by_a_crashed_run(tmp_path):
+    queue, statement = make_queue(tmp_path)
+    invoices = [str(tmp_path / 'a.png'), str(tmp_path / 'b.png')]
+    first = open_checkpoint('cli', statement, invoices, queue=queue)
+    # The run crashed after claiming its items, without releasing them
+    queue.claim_job(first['job_id'], 'crashed-process')
+
+    second = open_checkpoint('cli', statement, invoices, queue=queue)
+    assert second['resumed'] and second['job_id'] == first['job_id']
+    assert second['leased']['items'] == 2
+    assert 0 < second['leased']['expires_in'] <= 60
+    assert list(run_checkpoint(second['job_id'], queue=queue)) == []
+
+    expire_claims(queue, first['job_id'], 120)
+    assert open_checkpoint('cli', statement, invoices, queue=queue)['leased'] == {"items": 0, "expires_in": 0.0}
@@ -0,0 +1,155 @@
+import random
+import importlib
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.server.api import columnar
+from src.server.api.benchmark import benchmark_match_scoring
+from src.server.api.matching import MatchCandidatesCache, get_matching_rows, calculate_match_score, calculate_match_scores
+from src.server.api.statement_cache import StatementCache, clean_statement
+from src.server.api.streaming import stream_matching_rows
+from src.server.config.settings import AMOUNT_TOLERANCE_CENTS
+
+statement_cache_module = importlib.import_module('src.server.api.statement_cache')
+matching_module = importlib.import_module('src.server.api.matching')
+
+AMOUNTS = [9.98, 9.99, 10.0, 10.01, 10.02, 0.1 + 0.2]
+INVOICE = {'date': '2024-01-02', 'amount': 10.0, 'currency': 'USD', 'vendor': 'Walmart'}
+
+
+@pytest.fixture
+def statement(tmp_path, monkeypatch):
+    monkeypatch.setattr(columnar, 'COLUMNAR_DIR', str(tmp_path / 'columnar'))
+    monkeypatch.setattr(statement_cache_module, 'statement_cache', StatementCache())
+    matching_module.match_candidates_cache.clear()
+    path = tmp_path / 'statement.csv'
+    pd.DataFrame({
+        'date': '2024-01-02',
+        'amount': AMOUNTS,
+        'currency': 'USD',
+        'vendor': 'Walmart',
+        'source': [f'image{i}.png.json' for i in range(len(AMOUNTS))],
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def test_default_tolerance_keeps_one_cent_neighbours(statement):
+    # Same as the former float test abs(amount - invoice_amount) < 0.01, which let 1-cent
+    # differences through by rounding error
+    assert AMOUNT_TOLERANCE_CENTS == 1
+    expected = [9.99, 10.0, 10.01]
+
+    assert sorted(match['amount'] for match in get_matching_rows(statement, INVOICE)) == expected
+    assert sorted(match['amount'] for match in stream_matching_rows(statement, [INVOICE], chunksize=2)[0]) == expected
+
+
+def test_float_sums_match_their_cents(statement):
+    matches = get_matching_rows(statement, {**INVOICE, 'amount': 0.3})
+    assert [match['source'] for match in matches] == ['image5.png.json']
+
+
+def test_exact_amounts_without_tolerance(statement, monkeypatch):
+    monkeypatch.setattr(matching_module, 'AMOUNT_TOLERANCE_CENTS', 0)
+    assert [match['amount'] for match in get_matching_rows(statement, INVOICE)] == [10.0]
+
+
+@pytest.fixture
+def computed(monkeypatch):
+    """Records every invoice whose candidates are actually computed."""
+    invoices = []
+    compute = matching_module.get_match_candidates
+
+    def recording(statement, invoice_data):
+        invoices.append(invoice_data.get('vendor'))
+        return compute(statement, invoice_data)
+
+    monkeypatch.setattr(matching_module, 'get_match_candidates', recording)
+    return invoices
+
+
+def test_threshold_change_only_refilters(statement, computed):
+    hits = matching_module.match_candidates_cache.hits
+    assert len(get_matching_rows(statement, INVOICE, threshold=70)) == 3
+    assert len(get_matching_rows(statement, {**INVOICE, 'source': 'other.png'}, threshold=101)) == 0
+    assert len(get_matching_rows(statement, INVOICE, threshold=0)) == 3
+
+    assert computed == ['Walmart']
+    assert matching_module.match_candidates_cache.hits == hits + 2
+
+
+def test_statement_change_recomputes(statement, computed):
+    get_matching_rows(statement, INVOICE)
+    pd.DataFrame({'date': ['2024-01-02'], 'amount': [10.0], 'currency': ['USD'], 'vendor': ['Walmart'],
+                  'source': ['new.png.json']}).to_csv(statement, index=False)
+
+    assert [match['source'] for match in get_matching_rows(statement, INVOICE)] == ['new.png.json']
+    assert computed == ['Walmart', 'Walmart']
+
+
+def test_least_recently_used_entry_is_evicted(monkeypatch):
+    monkeypatch.setattr(matching_module, 'get_match_candidates', lambda statement, invoice: invoice['vendor'])
+    cache = MatchCandidatesCache(max_entries=2)
+    statement = SimpleNamespace(path='statement.csv', signature=(1, 1))
+
+    def get(vendor):
+        return cache.get(statement, {'vendor': vendor})
+
+    get('a'), get('b'), get('a')  # 'a' is now the most recently used
+    get('c')  # evicts 'b'
+    assert cache.stats()['entries'] == 2
+    misses = cache.misses
+
+    get('a'), get('c')
+    assert cache.misses == misses
+    get('b')
+    assert cache.misses == misses + 1
+    assert cache.stats()['entries'] == 2
+
+
+SCORING_INVOICES = [
+    {'date': '2024-01-15', 'amount': 42.0, 'currency': 'USD', 'vendor': 'Walmart Inc.'},
+    {'date': '2024-02-01', 'amount': 'N/A', 'currency': 'eur ', 'vendor': 'Cafe du Port'},
+    {'date': 'not a date', 'amount': 10, 'currency': 'N/A', 'vendor': 'Acme'},
+    {'date': '2024-01-31', 'currency': None, 'vendor': 'N/A'},
+    {'date': None, 'amount': None, 'currency': 'USD', 'vendor': ''},
+    {},
+]
+
+
+def messy_statement(rows=3000, seed=11):
+    """Statement with missing, 'N/A' and unparseable values in every column."""
+    rng = random.Random(seed)
+    dates = ['2024-01-15', '2024-01-16', '2024-01-14', '2024-02-01', '2024-01-31', 'not a date', None, '']
+    vendors = ['Walmart', 'Walmart Inc', 'Cafe du Port', 'Acme Corp.', 'N/A', '', None, 'sas', 'Co']
+    return pd.DataFrame({
+        'date': [rng.choice(dates) for _ in range(rows)],
+        'amount': [rng.choice([42.0, 10.0, np.nan, 'N/A', '$12.50']) for _ in range(rows)],
+        'currency': [rng.choice(['USD', 'usd', 'EUR', ' eur', 'N/A', None]) for _ in range(rows)],
+        'vendor': [rng.choice(vendors) for _ in range(rows)],
+    })
+
+
+@pytest.mark.parametrize('invoice', SCORING_INVOICES)
+def test_vectorized_scores_match_row_wise(invoice):
+    df = clean_statement(messy_statement())
+
+    expected = df.apply(lambda row: calculate_match_score(row, invoice, date_tolerance_days=1), axis=1)
+    scores = calculate_match_scores(df, invoice, date_tolerance_days=1)
+
+    assert (scores.to_numpy() == expected.to_numpy()).all()
+
+
+def test_benchmark_match_scoring(tmp_path, monkeypatch):
+    monkeypatch.setattr(columnar, 'COLUMNAR_DIR', str(tmp_path / 'columnar'))
+    monkeypatch.setattr(statement_cache_module, 'statement_cache', StatementCache())
+    path = tmp_path / 'messy.csv'
+    messy_statement(500).to_csv(path, index=False)
+
+    results = benchmark_match_scoring(str(path), SCORING_INVOICES[:2], repeat=1)
+
+    assert results['rows'] == 500 and results['invoices'] == 2
+    assert results['mismatches'] == 0
+    assert results['speedup'] > 1
@@ -0,0 +1,105 @@
+import io
+import importlib
+
+import numpy as np
+import pytest
+from PIL import Image, PngImagePlugin
+
+from src.server.api.extraction_cache import ExtractionCache, extraction_key
+from src.server.api.extraction_backends import ExtractionBackend
+from src.server.api.perceptual_hash import PerceptualIndex, dhash
+
+extract_data = importlib.import_module('src.server.api.extract_data')
+
+VERSION = 'fake:1'
+
+
+class FakeBackend(ExtractionBackend):
+    name = 'fake'
+
+    def __init__(self):
+        self.calls = []
+
+    def version(self, mode, preprocess):
+        return '1'
+
+    def extract(self, image_path, image_content, mode, preprocess):
+        self.calls.append(image_path)
+        return {"success": True, "data": {"json": {"vendor": image_path}, "raw_text": image_path}}
+
+
+def receipt(pixels, comment='scan', format='PNG', **save_args):
+    image = Image.fromarray(pixels)
+    if format == 'PNG':
+        info = PngImagePlugin.PngInfo()
+        info.add_text('Comment', comment)
+        save_args['pnginfo'] = info
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **save_args)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def pixels():
+    return np.random.default_rng(0).integers(0, 256, size=(80, 60), dtype=np.uint8)
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(extract_data, 'PHASH_DEDUP', True)
+    monkeypatch.setattr(extract_data, 'extraction_cache', ExtractionCache(directory=str(tmp_path / 'cache')))
+    monkeypatch.setattr(extract_data, 'perceptual_index', PerceptualIndex(path=str(tmp_path / 'index.jsonl')))
+    return FakeBackend()
+
+
+def extract(backend, name, content):
+    key = extraction_key(content, backend.name, VERSION)
+    return extract_data._extract_image(name, content, key, VERSION, backend, 'two_step', False, True)
+
+
+def test_same_pixels_other_metadata_is_extracted_again(backend, pixels):
+    original = receipt(pixels, comment='scan-a')
+    # Same pixels and file size, other bytes: a heuristic match only, never reused
+    resaved = receipt(pixels, comment='scan-b')
+    assert original != resaved and len(original) == len(resaved)
+
+    extract(backend, 'a.png', original)
+    result = extract(backend, 'b.png', resaved)
+
+    assert backend.calls == ['a.png', 'b.png']
+    assert result["data"]["json"]["vendor"] == 'b.png'
+    assert result["possible_duplicate"] == {'duplicate_of': 'a.png', 'distance': 0}
+
+
+def test_identical_bytes_hit_the_extraction_cache(backend, pixels):
+    content = receipt(pixels)
+
+    extract(backend, 'a.png', content)
+    result = extract(backend, 'b.png', content)
+
+    assert backend.calls == ['a.png']
+    assert result["data"]["json"]["vendor"] == 'a.png'
+
+
+def test_near_duplicate_is_only_flagged(backend, pixels):
+    original = receipt(pixels)
+    rescanned = receipt(np.clip(pixels.astype(np.int16) + 3, 0, 255).astype(np.uint8), format='JPEG', quality=90)
+    assert len(original) != len(rescanned)
+    assert bin(dhash(original) ^ dhash(rescanned)).count('1') <= extract_data.perceptual_index.max_distance
+
+    extract(backend, 'a.png', original)
+    result = extract(backend, 'b.jpg', rescanned)
+
+    # Extracted on its own, with a flag pointing at the earlier image
+    assert backend.calls == ['a.png', 'b.jpg']
+    assert result["data"]["json"]["vendor"] == 'b.jpg'
+    assert result["possible_duplicate"]["duplicate_of"] == 'a.png'
+
+
+def test_no_flag_when_disabled(backend, pixels, monkeypatch):
+    monkeypatch.setattr(extract_data, 'PHASH_DEDUP', False)
+    extract(backend, 'a.png', receipt(pixels, comment='scan-a'))
+    result = extract(backend, 'b.png', receipt(pixels, comment='scan-b'))
+
+    assert backend.calls == ['a.png', 'b.png']
+    assert 'possible_duplicate' not in result
@@ -0,0 +1,83 @@
+import importlib
+
+from src.server.api.pipeline import Stage, StagedPipeline
+
+reconciliation = importlib.import_module('src.server.api.reconciliation')
+
+
+def fail_on(value):
+    def function(item):
+        if item == value:
+            raise ValueError(f"bad item {item}")
+        return item
+    return function
+
+
+def test_stage_exception_becomes_an_error_result():
+    pipeline = StagedPipeline([Stage('double', fail_on(2)), Stage('identity', lambda item: item)])
+
+    results = list(pipeline.run([1, 2, 3]))
+
+    assert sorted(result for result in results if isinstance(result, int)) == [1, 3]
+    assert {"success": False, "error": "double: bad item 2", "data": None} in results
+    assert pipeline.stats()['stages']['double']['errors'] == 1
+
+
+def test_stage_exception_goes_through_on_error():
+    def on_error(item, error):
+        return {'item': item, 'error': str(error)}
+
+    pipeline = StagedPipeline([Stage('check', fail_on(2), workers=2, on_error=on_error)])
+
+    results = list(pipeline.run([1, 2, 3]))
+
+    assert len(results) == 3
+    assert {'item': 2, 'error': 'bad item 2'} in results
+
+
+def test_failing_on_error_falls_back_to_the_error_result():
+    def on_error(item, error):
+        raise RuntimeError('handler')
+
+    pipeline = StagedPipeline([Stage('check', fail_on(1), on_error=on_error)])
+
+    assert list(pipeline.run([1])) == [{"success": False, "error": "check: bad item 1", "data": None}]
+
+
+def test_reconciliation_pipeline_reports_stage_exceptions(tmp_path, monkeypatch):
+    invoices = []
+    for name in ['ok.png', 'extract.png', 'match.png']:
+        path = tmp_path / name
+        path.write_bytes(b'image')
+        invoices.append(str(path))
+    missing = str(tmp_path / 'missing.png')
+
+    def get_extracted_data(invoice_path, **kwargs):
+        if invoice_path.endswith('extract.png'):
+            raise RuntimeError('extraction crashed')
+        if kwargs['image_content'] is None:
+            return {"success": False, "error": "No such file", "data": None}
+        return {"success": True, "data": {"json": {"amount": 1.0}, "raw_text": ""}}
+
+    def reconcile_invoice(csv_file_path, invoice_path, extraction, threshold):
+        if invoice_path.endswith('match.png'):
+            raise RuntimeError('matching crashed')
+        if not extraction['success']:
+            return reconciliation.failed_record(invoice_path, 'extraction_failed', extraction['error'])
+        return {'invoice_path': invoice_path, 'status': 'matched'}
+
+    monkeypatch.setattr(reconciliation, 'get_extracted_data', get_extracted_data)
+    monkeypatch.setattr(reconciliation, 'reconcile_invoice', reconcile_invoice)
+    pipeline = reconciliation.reconciliation_pipeline('statement.csv', load_workers=1, extraction_workers=2, match_workers=1)
+
+    records = {record['invoice_path']: record for record in pipeline.run(invoices + [missing])}
+
+    assert records[invoices[0]]['status'] == 'matched'
+    assert records[invoices[1]]['status'] == 'extraction_failed'
+    assert records[invoices[1]]['error'] == 'extraction crashed'
+    assert records[invoices[2]]['status'] == 'matching_failed'
+    assert records[invoices[2]]['error'] == 'matching crashed'
+    assert records[invoices[2]]['confusion']['counts']['false_negative'] == 1
+    # The load stage failed: the extraction got the path alone, and reported the error
+    assert records[missing]['status'] == 'extraction_failed'
+    assert records[missing]['error'] == 'No such file'
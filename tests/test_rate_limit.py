@@ -0,0 +1,64 @@
+import time
+import threading
+
+from src.server.api.rate_limit import TokenBucket
+
+
+def timed(bucket, calls):
+    started = time.monotonic()
+    for _ in range(calls):
+        bucket.acquire()
+    return time.monotonic() - started
+
+
+def test_burst_is_served_at_once():
+    assert timed(TokenBucket(rate=1, capacity=3), 3) < 0.1
+
+
+def test_tokens_refill_at_rate():
+    bucket = TokenBucket(rate=20, capacity=1)
+
+    # The first token is there from the start, the next ten come one every 50ms
+    elapsed = timed(bucket, 11)
+
+    assert 0.45 <= elapsed < 1.0
+    assert bucket.stats()['acquired'] == 11
+    assert bucket.stats()['waited_seconds'] > 0.4
+
+
+def test_idle_bucket_holds_at_most_capacity():
+    bucket = TokenBucket(rate=10, capacity=2)
+    time.sleep(0.3)  # long enough for three tokens, only two are kept
+
+    assert timed(bucket, 2) < 0.05
+    assert timed(bucket, 1) >= 0.08
+
+
+def test_threads_share_the_quota():
+    bucket = TokenBucket(rate=20, capacity=1)
+    arrivals = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(3):
+            bucket.acquire()
+            with lock:
+                arrivals.append(time.monotonic())
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 12 calls from 4 threads still get one token every 50ms
+    assert len(arrivals) == 12
+    assert max(arrivals) - started >= 0.5
+
+
+def test_zero_rate_disables_the_limit():
+    bucket = TokenBucket(rate=0)
+
+    assert timed(bucket, 1000) < 0.1
+    assert bucket.stats()['acquired'] == 0
@@ -0,0 +1,55 @@
+import pytest
+
+from src.server.api.receipt_parser import parse_receipt_text
+from src.server.config.settings import HEURISTIC_CONFIDENCE_THRESHOLD
+
+RECEIPT = """{vendor}
+{date}
+Coffee 3.50
+Croissant 2.00
+TOTAL {currency}5.50
+"""
+
+
+def parse(vendor='Cafe Lumiere', date='15/03/2024', currency='EUR '):
+    return parse_receipt_text(RECEIPT.format(vendor=vendor, date=date, currency=currency))
+
+
+def test_unambiguous_receipt_is_accepted():
+    fields, confidence = parse()
+    assert fields == {'date': '2024-03-15', 'amount': 5.5, 'currency': 'EUR', 'vendor': 'Cafe Lumiere'}
+    assert confidence >= HEURISTIC_CONFIDENCE_THRESHOLD
+
+
+@pytest.mark.parametrize('currency, expected', [('EUR ', '2024-04-03'), ('€', '2024-04-03'), ('USD ', '2024-03-04')])
+def test_currency_settles_ambiguous_dates(currency, expected):
+    fields, confidence = parse(date='03/04/2024', currency=currency)
+    assert fields['date'] == expected
+    assert confidence >= HEURISTIC_CONFIDENCE_THRESHOLD
+
+
+def test_ambiguous_date_without_currency_goes_to_the_llm():
+    fields, confidence = parse(date='03/04/2024', currency='')
+    assert fields['date'] == '2024-03-04'
+    assert confidence < HEURISTIC_CONFIDENCE_THRESHOLD
+
+
+def test_bare_dollar_goes_to_the_llm():
+    fields, confidence = parse(date='2024-03-04', currency='$')
+    assert fields['currency'] == 'USD'
+    assert confidence < HEURISTIC_CONFIDENCE_THRESHOLD
+
+
+def test_same_day_and_month_is_not_ambiguous():
+    fields, _ = parse(date='04/04/2024', currency='')
+    assert fields['date'] == '2024-04-04'
+
+
+def test_vendor_includes_the_address():
+    fields, _ = parse(vendor='Cafe Lumiere\n12 rue de la Paix\n75002 Paris')
+    assert fields['vendor'] == 'Cafe Lumiere, 12 rue de la Paix, 75002 Paris'
+
+
+def test_vendor_stops_before_non_address_lines():
+    fields, _ = parse(vendor='Cafe Lumiere\nTel: 01 23 45 67 89')
+    assert fields['vendor'] == 'Cafe Lumiere'
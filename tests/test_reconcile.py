@@ -0,0 +1,25 @@
+import os
+
+import reconcile
+
+
+def test_statement_upload_never_overwrites_another_statement(tmp_path, monkeypatch):
+    csv_dir = tmp_path / 'csv'
+    csv_dir.mkdir()
+    monkeypatch.setattr(reconcile, 'CSV_DIR', str(csv_dir))
+    statement = tmp_path / 'releve.csv'
+    statement.write_text('date,amount,currency,vendor\n2024-01-02,12.50,USD,Walmart\n')
+
+    # Nothing uploaded under that name yet
+    assert reconcile.statement_upload_path(str(statement)) == str(csv_dir / 'releve.csv')
+
+    # Same content already uploaded: same path
+    (csv_dir / 'releve.csv').write_bytes(statement.read_bytes())
+    assert reconcile.statement_upload_path(str(statement)) == str(csv_dir / 'releve.csv')
+
+    # Another statement uploaded from the UI under the same name: a name of its own
+    (csv_dir / 'releve.csv').write_text('date,amount,currency,vendor\n2023-05-01,3.20,EUR,Carrefour\n')
+    path = reconcile.statement_upload_path(str(statement))
+    assert path != str(csv_dir / 'releve.csv')
+    assert os.path.basename(path).startswith('releve-') and path.endswith('.csv')
+    assert reconcile.statement_upload_path(str(statement)) == path
@@ -0,0 +1,74 @@
+import math
+
+import pandas as pd
+import pytest
+
+from src.server.api.result_store import ResultStore
+
+NAN = math.nan
+
+ROWS = {
+    'int_then_float': [{'amount': 1}, {'amount': 2.5}, {'amount': 3}],
+    'float_then_int': [{'amount': 2.5}, {'amount': 1}],
+    'int_then_missing': [{'amount': 1}, {'amount': None}, {'amount': 3}],
+    'missing_then_int': [{'amount': NAN}, {'amount': None}, {'amount': 2}],
+    'text_after_missing': [{'vendor': None}, {'vendor': NAN}, {'vendor': 'Acme'}, {'vendor': 'Walmart'}, {'vendor': None}],
+    'repeated_text': [{'vendor': 'Acme'}, {'vendor': 'Walmart'}, {'vendor': 'Acme'}],
+    'int_then_text': [{'amount': 1}, {'amount': 'N/A'}, {'amount': None}],
+    'text_then_float': [{'amount': 'N/A'}, {'amount': 2.5}],
+    'all_missing': [{'vendor': None}, {'vendor': None}],
+    'late_columns': [
+        {'invoice': 'a.png'},
+        {'invoice': 'b.png', 'vendor': 'Acme', 'amount': 1.5, 'count': 7},
+        {'invoice': 'c.png', 'count': 2},
+    ],
+    'result_rows': [
+        {'Invoice': 'a.png', 'Date': '2024-01-02', 'Amount': 10.0, 'Score': 100, 'Source': 't1.png.json'},
+        {'Invoice': 'b.png', 'Date': None, 'Amount': None, 'Score': None, 'Source': None},
+        {'Invoice': 'c.png', 'Date': '2024-01-03', 'Amount': 12, 'Score': 85, 'Source': 't2.png.json'},
+    ],
+}
+
+
+def normalized(frame):
+    """Text columns as plain objects, with None for every missing value in object columns."""
+    columns = {}
+    for name, column in frame.items():
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            column = column.astype(object)
+        if column.dtype == object:
+            column = column.where(column.notna(), None)
+        columns[name] = column
+    return pd.DataFrame(columns, index=frame.index)
+
+
+@pytest.mark.parametrize('rows', ROWS.values(), ids=list(ROWS))
+def test_to_dataframe_matches_pandas(rows):
+    frame = ResultStore(rows).to_dataframe()
+
+    pd.testing.assert_frame_equal(normalized(frame), normalized(pd.DataFrame(rows)))
+
+
+def test_text_columns_are_categoricals():
+    frame = ResultStore(ROWS['text_after_missing']).to_dataframe()
+
+    assert isinstance(frame['vendor'].dtype, pd.CategoricalDtype)
+    assert list(frame['vendor'].cat.categories) == ['Acme', 'Walmart']
+
+
+def test_rows_fill_late_columns_with_none():
+    store = ResultStore(ROWS['late_columns'])
+
+    assert store.columns == ['invoice', 'vendor', 'amount', 'count']
+    assert list(store.rows(2)) == [{'invoice': 'c.png', 'vendor': None, 'amount': None, 'count': 2}]
+
+
+def test_append_invalidates_the_dataframe():
+    store = ResultStore(ROWS['int_then_float'])
+    frame = store.to_dataframe()
+    assert store.to_dataframe() is frame
+
+    store.append({'amount': None})
+
+    assert len(store.to_dataframe()) == 4
+    assert math.isnan(store.to_dataframe()['amount'].iloc[-1])
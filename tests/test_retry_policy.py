@@ -0,0 +1,239 @@
+import json
+import time
+import importlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.server.api.http_transport import HTTPTransport
+from src.server.api.rate_limit import TokenBucket
+from src.server.api.retry_policy import RetryPolicy, CircuitBreaker, CircuitOpenError
+
+extract_data = importlib.import_module('src.server.api.extract_data')
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+class FakeMistral:
+    """
+    Local HTTP server answering /chat/completions from a script of (status, headers, content,
+    delay) entries, one per request; the last entry is repeated once the script is exhausted.
+    Records the arrival time of every request.
+    """
+
+    def __init__(self, script, on_request=None):
+        self.script = list(script)
+        self.on_request = on_request
+        self.arrivals = []
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                status, headers, content, delay = fake._next()
+                time.sleep(delay)
+                body = json.dumps({"choices": [{"message": {"content": content}}]}).encode('utf-8')
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def _next(self):
+        with self._lock:
+            self.arrivals.append(time.monotonic())
+            if self.on_request is not None:
+                self.on_request()
+            return self.script.pop(0) if len(self.script) > 1 else self.script[0]
+
+    @property
+    def requests(self):
+        with self._lock:
+            return len(self.arrivals)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def ok(content='ok', delay=0.0):
+    return 200, {}, content, delay
+
+
+def error(status, headers=None):
+    return status, headers or {}, 'error', 0.0
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limit(monkeypatch):
+    monkeypatch.setattr(extract_data, 'mistral_rate_limiter', TokenBucket(0))
+
+
+@pytest.fixture
+def servers():
+    started = []
+    yield started
+    for server in started:
+        server.close()
+
+
+def make_client(server, policy, breaker=None):
+    client = extract_data.MistralClient(
+        api_key='test',
+        transport=HTTPTransport(pool_size=2, connect_timeout=1, read_timeout=5, http2=False),
+        retry_policy=policy,
+        circuit_breaker=breaker or CircuitBreaker(failure_threshold=0)
+    )
+    client.base_url = server.url
+    return client
+
+
+def test_429_waits_for_retry_after(servers):
+    server = FakeMistral([error(429, {'Retry-After': '0.3'}), error(429, {'Retry-After': '0.3'}), ok()])
+    servers.append(server)
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+    client = make_client(server, RetryPolicy(max_attempts=5, base_delay=0.01, max_delay=0.01, hedge_delay=0), breaker)
+
+    assert client.send_message(MESSAGES) == 'ok'
+
+    assert server.requests == 3
+    assert client.stats()['retries'] == 2
+    # Retry-After overrides the (much shorter) jittered delay
+    gaps = [later - earlier for earlier, later in zip(server.arrivals, server.arrivals[1:])]
+    assert all(gap >= 0.3 for gap in gaps)
+    # Rate limiting is not an outage: the breaker stays closed even with a threshold of 1
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_5xx_then_success(servers):
+    server = FakeMistral([error(503), error(502), ok()])
+    servers.append(server)
+    breaker = CircuitBreaker(failure_threshold=5, reset_seconds=60)
+    client = make_client(server, RetryPolicy(max_attempts=3, base_delay=0.01, max_delay=0.05, hedge_delay=0), breaker)
+
+    assert client.send_message(MESSAGES) == 'ok'
+
+    assert server.requests == 3
+    assert client.stats()['retries'] == 2
+    assert breaker.stats() == {"state": CircuitBreaker.CLOSED, "consecutive_failures": 0, "rejected": 0}
+
+
+def test_retries_stop_at_max_attempts(servers):
+    server = FakeMistral([error(500)])
+    servers.append(server)
+    client = make_client(server, RetryPolicy(max_attempts=3, base_delay=0.01, max_delay=0.01, hedge_delay=0))
+
+    with pytest.raises(Exception, match='Status: 500'):
+        client.send_message(MESSAGES)
+    assert server.requests == 3
+    assert client.stats()['retries'] == 2
+
+
+def test_breaker_opens_then_half_opens(servers):
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.3)
+    states = []
+    server = FakeMistral([error(503)], on_request=lambda: states.append(breaker.state))
+    servers.append(server)
+    client = make_client(server, RetryPolicy(max_attempts=2, base_delay=0.01, max_delay=0.01, hedge_delay=0), breaker)
+
+    with pytest.raises(Exception, match='Status: 503'):
+        client.send_message(MESSAGES)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert server.requests == 2
+
+    # Open: rejected without touching the network
+    with pytest.raises(CircuitOpenError):
+        client.send_message(MESSAGES)
+    assert server.requests == 2
+    assert breaker.stats()['rejected'] == 1
+
+    # After reset_seconds a single trial call goes through; its failure opens the circuit again
+    time.sleep(0.35)
+    with pytest.raises(CircuitOpenError):
+        client.send_message(MESSAGES)
+    assert server.requests == 3
+    assert states[-1] == CircuitBreaker.HALF_OPEN
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # A successful trial closes it
+    time.sleep(0.35)
+    server.script = [ok('recovered')]
+    assert client.send_message(MESSAGES) == 'recovered'
+    assert states[-1] == CircuitBreaker.HALF_OPEN
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert server.requests == 4
+
+
+def test_hedged_request_uses_the_first_answer_only(servers):
+    server = FakeMistral([ok('slow', delay=0.6), ok('fast')])
+    servers.append(server)
+    breaker = CircuitBreaker(failure_threshold=5, reset_seconds=60)
+    client = make_client(server, RetryPolicy(max_attempts=3, base_delay=0.01, max_delay=0.01, hedge_delay=0.1), breaker)
+
+    started = time.monotonic()
+    assert client.send_message(MESSAGES) == 'fast'
+    assert time.monotonic() - started < 0.6
+
+    # The slow answer arriving later is dropped: no third request, no retry, one success recorded
+    time.sleep(0.7)
+    assert server.requests == 2
+    assert client.stats()['hedges'] == 1
+    assert client.stats()['retries'] == 0
+    assert breaker.stats()['consecutive_failures'] == 0
+
+
+def concurrent_posts(transport, server, count):
+    threads = [threading.Thread(target=transport.post, args=(f"{server.url}/chat/completions",), kwargs={'json': {}})
+               for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+@pytest.mark.parametrize('reserved, opened', [(None, 7), (4, 4)])
+def test_pool_sized_for_the_workers_reuses_connections(servers, reserved, opened):
+    server = FakeMistral([ok(delay=0.2)])
+    servers.append(server)
+    transport = HTTPTransport(pool_size=1, connect_timeout=1, read_timeout=5, http2=False)
+    if reserved:
+        transport.reserve(reserved)
+
+    # Four workers, twice: a one-connection pool keeps a single connection and reopens the others
+    concurrent_posts(transport, server, 4)
+    concurrent_posts(transport, server, 4)
+
+    assert transport.connections_opened() == opened
+
+
+def test_reserve_never_shrinks_the_pool():
+    transport = HTTPTransport(pool_size=4, http2=False)
+    transport.reserve(2)
+    assert transport.stats()['pool_size'] == 4
+    transport.reserve(8)
+    assert transport.stats()['pool_size'] == 8
+
+
+def test_shared_client_is_sized_for_the_workers(monkeypatch):
+    monkeypatch.setattr(extract_data, 'MISTRAL_API_KEY', 'test')
+    monkeypatch.setattr(extract_data, '_mistral_client', None)
+    monkeypatch.setattr(extract_data, '_mistral_pool_size', 2)
+
+    extract_data.reserve_mistral_connections(6)
+    client = extract_data.get_mistral_client()
+    assert client.transport.pool_size == 6
+
+    extract_data.reserve_mistral_connections(10)
+    assert client.transport.pool_size == 10
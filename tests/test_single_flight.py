@@ -0,0 +1,92 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.server.api.single_flight import SingleFlight
+
+CALLERS = 8
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+class BlockingCall:
+    """A function that blocks until release(), counting its calls."""
+
+    def __init__(self, result='extracted', error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self._release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self._release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def release(self):
+        self._release.set()
+
+
+def run_concurrently(flight, key, function):
+    """Starts CALLERS calls of flight.do(key, function) and releases function once they all wait."""
+    pool = ThreadPoolExecutor(max_workers=CALLERS)
+    futures = [pool.submit(flight.do, key, function) for _ in range(CALLERS)]
+    wait_for(lambda: flight.stats()['shared'] == CALLERS - 1)
+    function.release()
+    pool.shutdown(wait=True)
+    return futures
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    function = BlockingCall()
+
+    results = [future.result() for future in run_concurrently(flight, 'key', function)]
+
+    assert function.calls == 1
+    assert sorted(results) == [('extracted', False)] + [('extracted', True)] * (CALLERS - 1)
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "shared": CALLERS - 1}
+
+
+def test_leader_exception_reaches_every_caller():
+    flight = SingleFlight()
+    function = BlockingCall(error=RuntimeError('API down'))
+
+    futures = run_concurrently(flight, 'key', function)
+
+    assert function.calls == 1
+    for future in futures:
+        with pytest.raises(RuntimeError, match='API down'):
+            future.result()
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_other_keys_are_not_coalesced():
+    flight = SingleFlight()
+    calls = []
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda key: flight.do(key, lambda: calls.append(key) or key), ['a', 'b', 'c', 'd']))
+
+    assert sorted(calls) == ['a', 'b', 'c', 'd']
+    assert results == [('a', False), ('b', False), ('c', False), ('d', False)]
+
+
+def test_finished_call_is_not_kept():
+    flight = SingleFlight()
+    calls = []
+
+    flight.do('key', lambda: calls.append(1))
+    flight.do('key', lambda: calls.append(2))
+
+    assert calls == [1, 2]
+    assert flight.stats()['leaders'] == 2
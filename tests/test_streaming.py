@@ -0,0 +1,64 @@
+import importlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.server.api import columnar
+from src.server.api.matching import get_matching_rows
+from src.server.api.statement_cache import StatementCache
+from src.server.api.streaming import stream_matching_rows
+
+# The package re-exports the APIService names, statement_cache among them: import the module itself
+statement_cache_module = importlib.import_module('src.server.api.statement_cache')
+matching_module = importlib.import_module('src.server.api.matching')
+
+INVOICES = [
+    {'date': '2024-01-02', 'amount': 12.5, 'currency': 'USD', 'vendor': 'Walmart'},
+    {'date': '2024-01-02', 'amount': 0, 'currency': 'USD', 'vendor': 'Walmart'},
+    {'date': '2024-01-03', 'currency': 'USD', 'vendor': 'Target'},  # no amount: defaults to 0
+    {'date': '1970-01-01', 'amount': 0, 'currency': 'USD', 'vendor': 'Walmart'},
+    {'date': '2024-01-05', 'amount': 7.0, 'currency': 'USD', 'vendor': 'Target Store'},
+]
+
+
+@pytest.fixture
+def statement(tmp_path, monkeypatch):
+    monkeypatch.setattr(columnar, 'COLUMNAR_DIR', str(tmp_path / 'columnar'))
+    monkeypatch.setattr(statement_cache_module, 'statement_cache', StatementCache())
+    matching_module.match_candidates_cache.clear()
+    rng = np.random.default_rng(3)
+    rows = 400
+    amounts = rng.choice([12.5, 7.0, 3.2, np.nan], rows)
+    dates = rng.choice(['2024-01-02', '2024-01-03', '2024-01-05', '1970-01-01', 'not a date', None], rows)
+    path = tmp_path / 'statement.csv'
+    pd.DataFrame({
+        'date': dates,
+        'amount': amounts,
+        'currency': 'USD',
+        'vendor': rng.choice(['Walmart', 'Target', 'Target Store', 'Walmart Inc'], rows),
+        'source': [f'image{i}.png.json' for i in range(rows)],
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def ranked(matches):
+    return sorted((match['source'], match['match_score']) for match in matches)
+
+
+@pytest.mark.parametrize('sidecar', [False, True])
+def test_streaming_matches_in_memory(statement, sidecar):
+    if sidecar:
+        statement_cache_module.ingest_statement(statement)
+    streamed = stream_matching_rows(statement, INVOICES, threshold=50, top_k=1000, chunksize=64)
+
+    for invoice, matches in zip(INVOICES, streamed):
+        expected = get_matching_rows(statement, invoice, threshold=50)
+        assert ranked(matches) == ranked(expected)
+        assert all(not np.isnan(match['amount']) for match in matches)
+    assert any(streamed)
+
+
+def test_missing_amounts_never_match_a_zero_amount(statement):
+    streamed = stream_matching_rows(statement, INVOICES[1:3], threshold=0, top_k=1000, chunksize=64)
+    assert streamed == [[], []]
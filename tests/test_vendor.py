@@ -0,0 +1,64 @@
+import re
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.server.api import matching
+from src.server.api.statement_cache import clean_statement
+from src.server.api.vendor import normalize_vendor
+
+
+def baseline_normalize_vendor(name):
+    """normalize_vendor as it was before the LRU cache (reference implementation)."""
+    if not isinstance(name, str):
+        return ""
+    name = name.lower()
+    suffixes = ['inc', 'llc', 'ltd', 'corp', 'co', 'gmbh', 'bv', 'pty', 'sa', 'sas', 'sarl']
+    for suffix in suffixes:
+        name = re.sub(r'\b' + suffix + r'\.?$', '', name).strip()
+    name = re.sub(r'[^\w\s]', '', name)
+    name = re.sub(r'\s+', ' ', name).strip()
+    return name
+
+
+NAMES = ['Walmart', 'Foo', 'Acme Trading', 'Café du Port', 'sas', 'Co']
+SUFFIXES = ['', ' Inc', ' Inc.', ' LLC', ' Ltd', ' Co', ' Corp.', ' GmbH', ' SA', ' SAS', ' SARL', ' sas sarl',
+            ' Ltd Co', ' Co Ltd', ' inc ', ' Pty Ltd', '  S.A.', ', Inc.']
+
+
+def statement(rows=3000, seed=7):
+    rng = random.Random(seed)
+    vendors = [rng.choice(NAMES) + rng.choice(SUFFIXES) for _ in range(rows)]
+    days = pd.Timestamp('2024-01-01') + pd.to_timedelta([rng.randrange(60) for _ in range(rows)], unit='D')
+    return pd.DataFrame({
+        'date': days.strftime('%Y-%m-%d'),
+        'amount': [round(rng.uniform(1, 200), 2) for _ in range(rows)],
+        'currency': [rng.choice(['USD', 'EUR']) for _ in range(rows)],
+        'vendor': vendors,
+    })
+
+
+@pytest.mark.parametrize('name', [name + suffix for name in NAMES for suffix in SUFFIXES] + [None, '', 42])
+def test_normalize_vendor_matches_baseline(name):
+    assert normalize_vendor(name) == baseline_normalize_vendor(name)
+
+
+def test_single_pass_suffix_removal():
+    assert normalize_vendor('sas sarl') == 'sas'
+    assert normalize_vendor('Foo Ltd Co') == 'foo ltd'
+
+
+@pytest.mark.parametrize('invoice_vendor', ['Foo Ltd', 'Walmart Inc.', 'SAS', 'Acme Trading Co Ltd'])
+def test_match_scores_match_baseline(monkeypatch, invoice_vendor):
+    invoice = {'date': '2024-01-15', 'amount': 42.0, 'currency': 'USD', 'vendor': invoice_vendor}
+    df = clean_statement(statement())
+
+    scores = matching.find_matching_rows(df.copy(), invoice, threshold=0)['match_score'].sort_index()
+
+    # Row-wise scorer with the baseline normalization
+    monkeypatch.setattr(matching, 'normalize_vendor', baseline_normalize_vendor)
+    expected = df.apply(lambda row: matching.calculate_match_score(row, invoice), axis=1)
+
+    np.testing.assert_array_equal(scores.to_numpy(), expected.to_numpy())